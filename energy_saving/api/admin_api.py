@@ -11,6 +11,7 @@ from flask_admin.model.fields import AjaxSelectField
 from energy_saving.api import admin
 from energy_saving.db import database
 from energy_saving.db import models
+from energy_saving.db import timeseries
 from energy_saving.models import base_model_type_builder
 
 
@@ -67,6 +68,12 @@ class BaseModelView(ModelView):
         self.column_export_list = model.__table__.columns.keys()
         super(BaseModelView, self).__init__(model, session, *args, **kwargs)
 
+    def after_model_change(self, form, model, is_created):
+        timeseries.invalidate_metadata_cache()
+
+    def after_model_delete(self, model):
+        timeseries.invalidate_metadata_cache()
+
 
 def init():
     models = sorted(MODELS.keys())
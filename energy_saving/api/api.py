@@ -1,9 +1,23 @@
 """Define all the RestfulAPI entry points."""
 import csv
+import io
 from io import StringIO
+import itertools
 import logging
+import numpy as np
+import pandas as pd
+import shutil
 import simplejson as json
 import six
+import tempfile
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
 
 from oslo_config import cfg
 
@@ -43,6 +57,11 @@ opts = [
         help='adding seconds for the same timestamp record when importing',
         default=settings.DEFAULT_IMPORT_ADD_SECONDS_SAME_TIMESTAMP
     ),
+    cfg.IntOpt(
+        'timeseries_import_chunk_size',
+        help='rows per chunk parsed and written when importing',
+        default=settings.DEFAULT_IMPORT_CHUNK_SIZE
+    ),
     cfg.StrOpt(
         'timeseries_time_precision',
         help='timeseries time precision',
@@ -250,6 +269,13 @@ def health():
     )
 
 
+@app.route("/info/timeseries/cache", methods=['GET'])
+def show_timeseries_cache():
+    return utils.make_json_response(
+        200, timeseries.get_result_cache_stats()
+    )
+
+
 @app.route("/metadata/database/models", methods=['GET'])
 def list_database_models():
     models = {}
@@ -702,6 +728,7 @@ def upload_model(model_name):
                 result = model(**row_data)
                 session.add(result)
         session.flush()
+    timeseries.invalidate_metadata_cache()
     return utils.make_json_response(
         200, 'OK'
     )
@@ -871,8 +898,13 @@ def list_measurement_timeseries(datacenter, device_type, measurement):
         device_type_metadata = timeseries.get_datacenter_device_type_metadata(
             session, datacenter, device_type
         )
+        metadata_index = timeseries.get_datacenter_metadata_index(
+            session, datacenter
+        )
     assert measurement in device_type_metadata
-    measurement_metadata = device_type_metadata[measurement]
+    measurement_devices = metadata_index[device_type][
+        'measurement_devices'
+    ][measurement]
     device_types = {
         device_type: {
             measurement: data.get('device')
@@ -904,7 +936,7 @@ def list_measurement_timeseries(datacenter, device_type, measurement):
     outputs = {}
     for key, tag_response in six.iteritems(response):
         _, _, device = key
-        if device not in measurement_metadata['devices']:
+        if device not in measurement_devices:
             continue
         outputs[device] = tag_response
     return utils.make_json_response(
@@ -929,9 +961,14 @@ def list_device_timeseries(datacenter, device_type, measurement, device):
         device_type_metadata = timeseries.get_datacenter_device_type_metadata(
             session, datacenter, device_type
         )
+        metadata_index = timeseries.get_datacenter_metadata_index(
+            session, datacenter
+        )
     assert measurement in device_type_metadata
-    measurement_metadata = device_type_metadata[measurement]
-    assert device in measurement_metadata['devices']
+    measurement_devices = metadata_index[device_type][
+        'measurement_devices'
+    ][measurement]
+    assert device in measurement_devices
     device_types = {
         device_type: {
             measurement: [device]
@@ -968,24 +1005,359 @@ def list_device_timeseries(datacenter, device_type, measurement, device):
     )
 
 
+EXPORT_TAGS = ('device_type', 'measurement', 'device')
+
+
+def _iter_csv_chunks(rows_iter):
+    """Iterate CSV text of each block of rows in rows_iter."""
+    string_buffer = StringIO()
+    writer = csv.writer(string_buffer)
+    for rows in rows_iter:
+        writer.writerows(rows)
+        yield string_buffer.getvalue()
+        string_buffer.seek(0)
+        string_buffer.truncate(0)
+
+
+def _get_export_columns(keys, timestamp_column, row_columns, column_keys):
+    """Get column names and {key: column index} of exported keys.
+
+    row_columns are [(column name, tag)] of tags exported as rows and
+    the tags in column_keys are joined by '.' to name the value column
+    of each (device_type, measurement, device) key.
+    """
+    column_names = [timestamp_column]
+    column_names.extend([column_name for column_name, _ in row_columns])
+    column_indexes = {}
+    name_indexes = {}
+    for key in keys:
+        tags = dict(zip(EXPORT_TAGS, key))
+        column_name = '.'.join([tags[tag] for tag in column_keys])
+        if column_name not in name_indexes:
+            name_indexes[column_name] = len(column_names)
+            column_names.append(column_name)
+        column_indexes[key] = name_indexes[column_name]
+    return column_names, column_indexes
+
+
+def _pivot_timeseries(
+    response, row_tags, column_indexes, columns,
+    timestamp_formatter=None, default_value=None
+):
+    """Pivot {key: {timestamp: value}} into a matrix of export rows.
+
+    Each row is a distinct (timestamp, row tags) in ascending order.
+    The points of all keys are laid out as flat arrays and scattered
+    into their (row, column) cell in one assignment. Timestamps are
+    kept as they are if timestamp_formatter is None.
+    """
+    keys = [
+        key for key, values in six.iteritems(response)
+        if values and key in column_indexes
+    ]
+    if not keys:
+        return np.empty((0, columns), dtype=object)
+    key_tags = [
+        tuple(dict(zip(EXPORT_TAGS, key))[tag] for tag in row_tags)
+        for key in keys
+    ]
+    tag_values = sorted(set(key_tags))
+    tag_codes = dict((tags, i) for i, tags in enumerate(tag_values))
+    lengths = [len(response[key]) for key in keys]
+    timestamps = []
+    values = []
+    for key in keys:
+        timestamps.extend(six.iterkeys(response[key]))
+        values.extend(six.itervalues(response[key]))
+    timestamp_codes, timestamp_values = pd.Index(timestamps).factorize(
+        sort=True
+    )
+    row_codes = timestamp_codes * len(tag_values) + np.repeat(
+        [tag_codes[tags] for tags in key_tags], lengths
+    )
+    row_codes, row_indexes = np.unique(row_codes, return_inverse=True)
+    matrix = np.full(
+        (len(row_codes), columns), default_value, dtype=object
+    )
+    formatted_timestamps = np.empty(len(timestamp_values), dtype=object)
+    if timestamp_formatter:
+        formatted_timestamps[:] = [
+            timestamp_formatter(timestamp)
+            for timestamp in timestamp_values
+        ]
+    else:
+        formatted_timestamps[:] = list(timestamp_values)
+    matrix[:, 0] = formatted_timestamps[row_codes // len(tag_values)]
+    if row_tags:
+        tag_matrix = np.empty((len(tag_values), len(row_tags)), dtype=object)
+        tag_matrix[:] = tag_values
+        matrix[:, 1:len(row_tags) + 1] = tag_matrix[
+            row_codes % len(tag_values)
+        ]
+    value_array = np.empty(len(values), dtype=object)
+    value_array[:] = values
+    matrix[
+        row_indexes.ravel(),
+        np.repeat([column_indexes[key] for key in keys], lengths)
+    ] = value_array
+    return matrix
+
+
+# file format: (file extension, mimetype)
+EXPORT_FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'feather': ('feather', 'application/vnd.apache.arrow.file'),
+    'arrow': ('arrow', 'application/vnd.apache.arrow.stream')
+}
+
+
+def _get_file_format(file_format):
+    """Check file_format is a supported export/import format."""
+    file_format = (file_format or 'csv').lower()
+    if file_format not in EXPORT_FORMATS:
+        raise exception_handler.BadRequest(
+            'unsupported file format %s' % file_format
+        )
+    if file_format != 'csv' and pa is None:
+        raise exception_handler.NotAcceptable(
+            'pyarrow is required for file format %s' % file_format
+        )
+    return file_format
+
+
+class _StreamSink(io.RawIOBase):
+    """Writable file whose written bytes are drained chunk by chunk."""
+
+    def __init__(self):
+        super(_StreamSink, self).__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _get_arrow_type(measurement_types):
+    """Get the arrow type of a column of measurement_types values."""
+    if measurement_types == set(['binary']):
+        return pa.bool_()
+    if measurement_types == set(['integer']):
+        return pa.int64()
+    return pa.float64()
+
+
+def _get_arrow_schema(
+    column_names, row_columns, column_indexes,
+    datacenter_metadata, time_precision
+):
+    """Get the arrow schema of an export laid out by column_names."""
+    if time_precision:
+        timestamp_type = pa.int64()
+    else:
+        timestamp_type = pa.timestamp('ns', tz='UTC')
+    column_types = {}
+    for key, column_index in six.iteritems(column_indexes):
+        device_type, measurement, _ = key
+        measurement_metadata = datacenter_metadata[
+            'device_types'
+        ][device_type][measurement]
+        column_types.setdefault(column_index, set()).add(
+            measurement_metadata['attribute']['type']
+        )
+    fields = [pa.field(column_names[0], timestamp_type)]
+    fields.extend([
+        pa.field(column_name, pa.string())
+        for column_name, _ in row_columns
+    ])
+    for column_index in range(len(row_columns) + 1, len(column_names)):
+        fields.append(pa.field(
+            column_names[column_index],
+            _get_arrow_type(column_types.get(column_index, set()))
+        ))
+    return pa.schema(fields)
+
+
+def _to_arrow_array(values, arrow_type):
+    """Convert an object array of exported values to arrow_type."""
+    if pa.types.is_timestamp(arrow_type):
+        timestamps = pd.DatetimeIndex(values)
+        if timestamps.tz is None:
+            timestamps = timestamps.tz_localize('UTC')
+        return pa.array(timestamps.tz_convert('UTC'), type=arrow_type)
+    if pa.types.is_string(arrow_type):
+        return pa.array(values, type=arrow_type)
+    values = pd.to_numeric(
+        pd.Series(values), errors='coerce'
+    ).to_numpy(dtype=np.float64)
+    mask = np.isnan(values)
+    if pa.types.is_boolean(arrow_type):
+        return pa.array(values != 0, mask=mask, type=arrow_type)
+    if pa.types.is_integer(arrow_type):
+        return pa.array(
+            np.where(mask, 0, np.round(values)).astype(np.int64),
+            mask=mask, type=arrow_type
+        )
+    return pa.array(values, mask=mask, type=arrow_type)
+
+
+def _iter_arrow_chunks(file_format, schema, matrices):
+    """Iterate bytes of file_format written from each matrix of rows."""
+    sink = _StreamSink()
+    if file_format == 'parquet':
+        writer = pq.ParquetWriter(sink, schema)
+    elif file_format == 'feather':
+        writer = pa.ipc.new_file(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    for matrix in matrices:
+        if not len(matrix):
+            continue
+        writer.write_table(pa.Table.from_arrays([
+            _to_arrow_array(matrix[:, i], field.type)
+            for i, field in enumerate(schema)
+        ], schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def _export_timeseries(
+    datacenter, data, device_types, device_type_units,
+    row_columns, column_keys, fname, where={}
+):
+    """Stream timeseries of device_types as an export file.
+
+    The rows of each time window are pivoted by _pivot_timeseries and
+    written as they are read, as CSV or as the parquet, feather or
+    arrow (IPC stream) file format given by format. The first window
+    is read before the response starts, so a failing query is reported
+    as an error response instead of a truncated file.
+
+    Only series with points in the time range get a column, which
+    counts the points of each series first. If full_header, every
+    device of metadata gets a column instead.
+    """
+    file_format = _get_file_format(data.get('format'))
+    export_where = dict(where)
+    export_where.update({
+        'starttime': data.get('starttime'),
+        'endtime': data.get('endtime')
+    })
+    with database.session() as session:
+        datacenter_metadata = timeseries.get_datacenter_metadata(
+            session, datacenter
+        )
+        keys = timeseries.list_timeseries_keys(
+            session, datacenter, device_types
+        )
+    if not data.get('full_header'):
+        with database.influx_session() as session:
+            present_keys = timeseries.list_present_timeseries_keys(
+                session, datacenter, device_types, export_where
+            )
+        keys = [key for key in keys if key in present_keys]
+    timestamp_column = data.get(
+        'timestamp_column'
+    ) or CONF.timeseries_export_timestamp_column
+    assert timestamp_column
+    column_names, column_indexes = _get_export_columns(
+        keys, timestamp_column, row_columns, column_keys
+    )
+    row_tags = [tag for _, tag in row_columns]
+    logger.debug('file format: %s', file_format)
+    logger.debug('row tags: %s', row_tags)
+    logger.debug('column keys: %s', column_keys)
+    logger.debug('column names: %s', column_names)
+    logger.debug('column indexes: %s', column_indexes)
+    time_precision = data.get(
+        'time_precision',
+        CONF.timeseries_time_precision
+    ) or None
+    if file_format == 'csv':
+        timestamp_formatter = timeseries.get_timestamp_formatter(
+            time_precision
+        )
+        default_value = CONF.timeseries_default_value
+    else:
+        timestamp_formatter = None
+        if time_precision:
+            timestamp_formatter = timeseries.get_timestamp_formatter(
+                time_precision
+            )
+        default_value = None
+
+    def iter_matrices():
+        with database.influx_session() as session:
+            for response in timeseries.iter_timeseries_windows(
+                session, {
+                    'where': export_where,
+                    'group_by': data.get('group_by'),
+                    'order_by': data.get('order_by'),
+                    'fill': data.get('fill'),
+                    'aggregation': data.get('aggregation'),
+                    'limit': data.get('limit'),
+                    'offset': data.get('offset'),
+                    'datacenter': datacenter,
+                    'device_type': device_types
+                },
+                time_precision=time_precision,
+                convert_timestamp=True,
+                format_timestamp=False,
+                device_type_units=device_type_units
+            ):
+                yield _pivot_timeseries(
+                    response, row_tags, column_indexes,
+                    len(column_names), timestamp_formatter,
+                    default_value
+                )
+
+    matrices = iter_matrices()
+    matrices = itertools.chain([next(matrices)], matrices)
+    extension, mimetype = EXPORT_FORMATS[file_format]
+    fname = '%s.%s' % (fname, extension)
+    if file_format == 'csv':
+        rows_iter = itertools.chain(
+            [[column_names]],
+            (matrix.tolist() for matrix in matrices)
+        )
+        return utils.make_csv_stream_response(
+            200, _iter_csv_chunks(rows_iter), fname
+        )
+    schema = _get_arrow_schema(
+        column_names, row_columns, column_indexes,
+        datacenter_metadata, time_precision
+    )
+    return utils.make_stream_response(
+        200, _iter_arrow_chunks(file_format, schema, matrices),
+        fname, mimetype=mimetype
+    )
+
+
 @app.route(
     "/export/timeseries/<datacenter>",
     methods=['POST']
 )
 def export_timeseries(datacenter):
     data = _get_request_data()
-    with database.session() as session:
-        timeseries.get_datacenter_metadata(
-            session, datacenter
-        )
     logger.debug(
         'download timeseries datacenter=%s: %s',
         datacenter, data
     )
-    timestamp_column = data.get(
-        'timestamp_column'
-    ) or CONF.timeseries_export_timestamp_column
-    assert timestamp_column
     device_type_column = data.get(
         'device_type_column',
         CONF.timeseries_export_device_type_column
@@ -998,133 +1370,24 @@ def export_timeseries(datacenter):
         'measurement_column',
         CONF.timeseries_export_measurement_column
     )
-    logger.debug('timestamp_column: %s', timestamp_column)
     logger.debug('device_type_column: %s', device_type_column)
     logger.debug('device_column: %s', device_column)
     logger.debug('measurement_column: %s', measurement_column)
     assert not all([device_column, measurement_column])
-    time_precision = data.get(
-        'time_precision',
-        CONF.timeseries_time_precision
-    ) or None
-    timestamp_formatter = timeseries.get_timestamp_formatter(
-        time_precision
-    )
-    with database.influx_session() as session:
-        response = timeseries.list_timeseries(
-            session, {
-                'where': {
-                    'starttime': data.get('starttime'),
-                    'endtime': data.get('endtime')
-                },
-                'group_by': data.get('group_by'),
-                'order_by': data.get('order_by'),
-                'fill': data.get('fill'),
-                'aggregation': data.get('aggregation'),
-                'limit': data.get('limit'),
-                'offset': data.get('offset'),
-                'datacenter': datacenter,
-                'device_type': data.get('device_type')
-            },
-            time_precision=time_precision,
-            convert_timestamp=True,
-            format_timestamp=False,
-            device_type_units=data.get('device_type_units')
-        )
-    row_keys = []
+    row_columns = []
     column_keys = []
-    column_names = []
-    column_indexes = {}
-    column_names.append(timestamp_column)
-    timestamps = set()
-    exports = {}
-    if device_type_column:
-        column_names.append(device_type_column)
-        row_keys.append('device_type')
-    if not device_type_column:
-        column_keys.append('device_type')
-    if device_column:
-        column_names.append(device_column)
-        row_keys.append('device')
-    if not device_column:
-        column_keys.append('device')
-    if measurement_column:
-        column_names.append(measurement_column)
-        row_keys.append('measurement')
-    if not measurement_column:
-        column_keys.append('measurement')
-    column_mapping = {}
-    for key, tag_response in six.iteritems(
-        response
-    ):
-        device_type, measurement, device = key
-        tags = {
-            'device_type': device_type,
-            'device': device,
-            'measurement': measurement
-        }
-        column_name = '.'.join(
-            [tags[key] for key in column_keys]
-        )
-        column_mapping.setdefault(column_name, set()).add(
-            (device_type, measurement, device)
-        )
-        if column_name not in column_names:
-            column_names.append(column_name)
-        exports[(device_type, measurement, device)] = tag_response
-        for timestamp in six.iterkeys(tag_response):
-            timestamps.add(timestamp)
-    for i, column_name in enumerate(column_names):
-        if column_name in column_mapping:
-            for key in column_mapping[column_name]:
-                column_indexes[key] = i
-    logger.debug('row keys: %s', row_keys)
-    logger.debug('column keys: %s', column_keys)
-    logger.debug('column names: %s', column_names)
-    logger.debug('column indexes: %s', column_indexes)
-    columns = len(column_names)
-    timestamps = list(timestamps)
-    timestamps = sorted(timestamps)
-    logger.debug('timestamps: %s', timestamps)
-    rows = {}
-    default_row = columns * [CONF.timeseries_default_value]
-    for key, values in six.iteritems(exports):
-        device_type, measurement, device = key
-        tags = {
-            'device_type': device_type,
-            'measurement': measurement,
-            'device': device
-        }
-        for timestamp, value in six.iteritems(values):
-            row_name = [timestamp]
-            for row_key in row_keys:
-                row_name.append(tags[row_key])
-            row_name = tuple(row_name)
-            if row_name not in rows:
-                row = default_row[:]
-                column_index = 0
-                row[column_index] = timestamp_formatter(timestamp)
-                column_index += 1
-                for row_key in row_keys:
-                    row[column_index] = tags[row_key]
-                    column_index += 1
-                rows[row_name] = row
-            else:
-                row = rows[row_name]
-            row[column_indexes[(device_type, measurement, device)]] = value
-    export_keys = rows.keys()
-    export_keys = sorted(export_keys)
-    output = []
-    output.append(column_names)
-    for keys in export_keys:
-        row = rows[keys]
-        output.append(row)
-    string_buffer = StringIO()
-    writer = csv.writer(string_buffer)
-    writer.writerows(output)
-    return utils.make_csv_response(
-        200, string_buffer.getvalue(),
-        '%s-%s.csv' % (datacenter, device_type)
+    for column_name, tag in [
+        (device_type_column, 'device_type'), (device_column, 'device'),
+        (measurement_column, 'measurement')
+    ]:
+        if column_name:
+            row_columns.append((column_name, tag))
+        else:
+            column_keys.append(tag)
+    return _export_timeseries(
+        datacenter, data, data.get('device_type'),
+        data.get('device_type_units'), row_columns, column_keys,
+        datacenter
     )
 
 
@@ -1134,10 +1397,6 @@ def export_timeseries(datacenter):
 )
 def export_device_type_timeseries(datacenter, device_type):
     data = _get_request_data()
-    with database.session() as session:
-        timeseries.get_datacenter_device_type_metadata(
-            session, datacenter, device_type
-        )
     device_types = {
         device_type: data.get('measurement')
     }
@@ -1145,10 +1404,6 @@ def export_device_type_timeseries(datacenter, device_type):
         'download timeseries datacenter=%s device_type=%s',
         datacenter, device_types
     )
-    timestamp_column = data.get(
-        'timestamp_column'
-    ) or CONF.timeseries_export_timestamp_column
-    assert timestamp_column
     device_column = data.get(
         'device_column',
         CONF.timeseries_export_device_column
@@ -1157,122 +1412,23 @@ def export_device_type_timeseries(datacenter, device_type):
         'measurement_column',
         CONF.timeseries_export_measurement_column
     )
-    logger.debug('timestamp_column: %s', timestamp_column)
     logger.debug('device_column: %s', device_column)
     logger.debug('measurement_column: %s', measurement_column)
     assert not all([device_column, measurement_column])
-    time_precision = data.get(
-        'time_precision',
-        CONF.timeseries_time_precision
-    ) or None
-    timestamp_formatter = timeseries.get_timestamp_formatter(
-        time_precision
-    )
-    with database.influx_session() as session:
-        response = timeseries.list_timeseries(
-            session, {
-                'where': {
-                    'starttime': data.get('starttime'),
-                    'endtime': data.get('endtime')
-                },
-                'group_by': data.get('group_by'),
-                'order_by': data.get('order_by'),
-                'fill': data.get('fill'),
-                'aggregation': data.get('aggregation'),
-                'limit': data.get('limit'),
-                'offset': data.get('offset'),
-                'datacenter': datacenter,
-                'device_type': device_types
-            },
-            time_precision=time_precision,
-            convert_timestamp=True,
-            format_timestamp=False,
-            device_type_units={
-                device_type: data.get('measurement_units')
-            }
-        )
-    row_keys = []
+    row_columns = []
     column_keys = []
-    column_names = []
-    column_indexes = {}
-    exports = {}
-    timestamps = set()
-    column_mapping = {}
-    column_names.append(timestamp_column)
-    if device_column:
-        column_names.append(device_column)
-        row_keys.append('device')
-    if not device_column:
-        column_keys.append('device')
-    if measurement_column:
-        column_names.append(measurement_column)
-        row_keys.append('measurement')
-    if not measurement_column:
-        column_keys.append('measurement')
-    for key, tag_response in six.iteritems(response):
-        _, measurement, device = key
-        tags = {'device': device, 'measurement': measurement}
-        column_name = '.'.join([tags[key] for key in column_keys])
-        column_mapping.setdefault(column_name, set()).add(
-            (measurement, device)
-        )
-        if column_name not in column_names:
-            column_names.append(column_name)
-        exports[(measurement, device)] = tag_response
-        for timestamp in six.iterkeys(tag_response):
-            timestamps.add(timestamp)
-    for i, column_name in enumerate(column_names):
-        if column_name in column_mapping:
-            for key in column_mapping[column_name]:
-                column_indexes[key] = i
-    logger.debug('row keys: %s', row_keys)
-    logger.debug('column keys: %s', column_keys)
-    logger.debug('column names: %s', column_names)
-    logger.debug('column mapping: %s', column_mapping)
-    logger.debug('column indexes: %s', column_indexes)
-    columns = len(column_names)
-    timestamps = list(timestamps)
-    timestamps = sorted(timestamps)
-    logger.debug('timestamps: %s', timestamps)
-    rows = {}
-    default_row = columns * [CONF.timeseries_default_value]
-    for key, values in six.iteritems(exports):
-        measurement, device = key
-        tags = {
-            'measurement': measurement,
-            'device': device
-        }
-        for timestamp, value in six.iteritems(values):
-            row_name = [timestamp]
-            for row_key in row_keys:
-                row_name.append(tags[row_key])
-            row_name = tuple(row_name)
-            if row_name not in rows:
-                row = default_row[:]
-                column_index = 0
-                row[column_index] = timestamp_formatter(timestamp)
-                column_index += 1
-                for row_key in row_keys:
-                    row[column_index] = tags[row_key]
-                    column_index += 1
-                rows[row_name] = row
-            else:
-                row = rows[row_name]
-            column_index = column_indexes[(measurement, device)]
-            row[column_indexes[(measurement, device)]] = value
-    export_keys = rows.keys()
-    export_keys = sorted(export_keys)
-    output = []
-    output.append(column_names)
-    for keys in export_keys:
-        row = rows[keys]
-        output.append(row)
-    string_buffer = StringIO()
-    writer = csv.writer(string_buffer)
-    writer.writerows(output)
-    return utils.make_csv_response(
-        200, string_buffer.getvalue(),
-        '%s-%s.csv' % (datacenter, device_type)
+    for column_name, tag in [
+        (device_column, 'device'), (measurement_column, 'measurement')
+    ]:
+        if column_name:
+            row_columns.append((column_name, tag))
+        else:
+            column_keys.append(tag)
+    return _export_timeseries(
+        datacenter, data, device_types,
+        {device_type: data.get('measurement_units')},
+        row_columns, column_keys,
+        '%s-%s' % (datacenter, device_type)
     )
 
 
@@ -1296,107 +1452,260 @@ def export_measurement_timeseries(datacenter, device_type, measurement):
         'download timeseries datacenter=%s device_type=%s ',
         datacenter, device_types
     )
-    timestamp_column = data.get(
-        'timestamp_column'
-    ) or CONF.timeseries_export_timestamp_column
-    assert timestamp_column
-    logger.debug('timestamp_column: %s', timestamp_column)
-    time_precision = data.get(
+    return _export_timeseries(
+        datacenter, data, device_types,
+        {device_type: {measurement: data.get('unit')}},
+        [], ['device'],
+        '%s-%s-%s' % (datacenter, device_type, measurement),
+        where={'device': data.get('device')}
+    )
+
+
+def _iter_arrow_batches(file_format, upload, chunk_size):
+    """Iterate record batches of an uploaded file of file_format.
+
+    Arrow streams are read from the upload stream as they arrive.
+    Parquet and feather files need random access, so an upload stream
+    which is not seekable is spooled to a temporary file first.
+    """
+    stream = upload.stream
+    if file_format not in ['parquet', 'feather']:
+        for batch in pa.ipc.open_stream(stream):
+            yield batch
+        return
+    seekable = getattr(stream, 'seekable', None)
+    if seekable is not None and seekable():
+        for batch in _iter_arrow_file_batches(
+            file_format, stream, chunk_size
+        ):
+            yield batch
+        return
+    with tempfile.TemporaryFile() as spool:
+        shutil.copyfileobj(stream, spool)
+        spool.seek(0)
+        for batch in _iter_arrow_file_batches(
+            file_format, spool, chunk_size
+        ):
+            yield batch
+
+
+def _iter_arrow_file_batches(file_format, source, chunk_size):
+    if file_format == 'parquet':
+        for batch in pq.ParquetFile(source).iter_batches(
+            batch_size=chunk_size
+        ):
+            yield batch
+    else:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+
+
+def _iter_upload_frames(file_format, chunk_size):
+    """Iterate rows of the uploaded files in frames of chunk_size rows.
+
+    Cells of csv files are read as strings and missing cells are
+    the default value. Parquet, feather and arrow files keep their
+    types.
+    """
+    request_files = list(request.files.items(multi=True))
+    if not request_files:
+        raise exception_handler.NotAcceptable(
+            'no %s file to upload' % file_format
+        )
+    logger.debug('upload %s files: %s', file_format, request_files)
+    for filename, upload in request_files:
+        logger.debug('read %s file %s', file_format, filename)
+        if file_format == 'csv':
+            for frame in pd.read_csv(
+                upload, dtype=str, keep_default_na=False,
+                chunksize=chunk_size
+            ):
+                yield frame.fillna(CONF.timeseries_default_value)
+        else:
+            for batch in _iter_arrow_batches(
+                file_format, upload, chunk_size
+            ):
+                yield batch.to_pandas()
+    logger.debug('%s files are uploaded', file_format)
+
+
+def _get_ignorable_mask(values):
+    return values.isna() | values.isin(CONF.timeseries_ignorable_values)
+
+
+def _add_import_series(
+    inputs, key, timestamps, values, time_precision,
+    import_add_seconds_same_timestamp, series_timestamps
+):
+    if import_add_seconds_same_timestamp:
+        timestamps, series_timestamps[key] = (
+            timeseries.shift_same_timestamps(
+                timestamps, import_add_seconds_same_timestamp,
+                time_precision, series_timestamps.get(key)
+            )
+        )
+    inputs.setdefault(key, {}).update(zip(timestamps, values))
+
+
+def _get_import_inputs(
+    frame, timestamp_column, row_columns, column_keys, fixed_tags,
+    timestamps_converter, time_precision,
+    import_add_seconds_same_timestamp, series_timestamps
+):
+    """Convert a frame of uploaded rows to timeseries inputs.
+
+    Return {(device_type, measurement, device): {timestamp: value}}.
+    Rows with an ignorable timestamp or row tag and ignorable values
+    are masked out for all columns at once. series_timestamps holds
+    the timestamps taken by each series which later rows may collide
+    with, see timeseries.shift_same_timestamps; a timestamp already
+    taken is shifted by import_add_seconds_same_timestamp until free.
+    """
+    inputs = {}
+    if timestamp_column not in frame.columns:
+        return inputs
+    frame = frame[~_get_ignorable_mask(frame[timestamp_column]).values]
+    if frame.empty:
+        return inputs
+    timestamps = np.asarray(
+        timestamps_converter(frame[timestamp_column].values), dtype=object
+    )
+    valid = np.ones(len(frame), dtype=bool)
+    row_tags = []
+    row_tag_values = []
+    for column_name, tag in row_columns:
+        if column_name not in frame.columns:
+            logger.debug('missing %s column %s', tag, column_name)
+            return inputs
+        valid &= ~_get_ignorable_mask(frame[column_name]).values
+        row_tags.append(tag)
+        row_tag_values.append(frame[column_name].values)
+    excluded_columns = set([timestamp_column])
+    excluded_columns.update([column_name for column_name, _ in row_columns])
+    for column in frame.columns:
+        if column in excluded_columns:
+            continue
+        if column in CONF.timeseries_ignorable_values:
+            continue
+        column_tags = dict(zip(column_keys, str(column).split('.')))
+        if len(column_tags) < len(column_keys):
+            logger.debug('ignore column %s', column)
+            continue
+        column_tags.update(fixed_tags)
+        column_values = frame[column]
+        rows = np.flatnonzero(
+            valid & ~_get_ignorable_mask(column_values).values
+        )
+        if not len(rows):
+            continue
+        column_values = column_values.values[rows]
+        column_timestamps = timestamps[rows]
+        if not row_tags:
+            groups = [((), np.arange(len(rows)))]
+        else:
+            codes, uniques = pd.MultiIndex.from_arrays([
+                tag_values[rows] for tag_values in row_tag_values
+            ]).factorize()
+            order = np.argsort(codes, kind='stable')
+            groups = zip(uniques, np.split(
+                order, np.cumsum(np.bincount(codes))[:-1]
+            ))
+        for group_tags, positions in groups:
+            tags = dict(column_tags)
+            tags.update(zip(row_tags, group_tags))
+            _add_import_series(
+                inputs,
+                (tags['device_type'], tags['measurement'], tags['device']),
+                column_timestamps[positions], column_values[positions],
+                time_precision, import_add_seconds_same_timestamp,
+                series_timestamps
+            )
+    return inputs
+
+
+def _import_timeseries(
+    datacenter, args, tags, device_type_units,
+    row_columns, column_keys, fixed_tags={}
+):
+    """Import the uploaded files chunk by chunk.
+
+    Each chunk of chunk_size rows is converted by _get_import_inputs
+    and written to influx while the next chunk is parsed. Return the
+    rows and points imported and their rates.
+    """
+    file_format = _get_file_format(args.get('format'))
+    chunk_size = int(
+        args.get('chunk_size') or CONF.timeseries_import_chunk_size
+    )
+    time_precision = args.get(
         'time_precision',
         CONF.timeseries_time_precision
     ) or None
-    timestamp_formatter = timeseries.get_timestamp_formatter(
+    logger.debug('time precision: %s', time_precision)
+    import_add_seconds_same_timestamp = args.get(
+        'import_add_seconds_same_timestamp'
+    ) or CONF.timeseries_import_add_seconds_same_timestamp
+    if import_add_seconds_same_timestamp:
+        import_add_seconds_same_timestamp = int(
+            import_add_seconds_same_timestamp
+        )
+    timestamps_converter = timeseries.get_timestamps_converter(
         time_precision
     )
+    timestamp_column = args.get(
+        'timestamp_column'
+    ) or CONF.timeseries_export_timestamp_column
+    assert timestamp_column
+    logger.debug('timestamp_column: %s', timestamp_column)
+    logger.debug('row columns: %s', row_columns)
+    logger.debug('column keys: %s', column_keys)
+    logger.debug('ignorable values: %s', CONF.timeseries_ignorable_values)
+    series_timestamps = {}
+    stats = {'rows': 0, 'points': 0}
+
+    def iter_inputs():
+        for frame in _iter_upload_frames(file_format, chunk_size):
+            inputs = _get_import_inputs(
+                frame, timestamp_column, row_columns, column_keys,
+                fixed_tags, timestamps_converter, time_precision,
+                import_add_seconds_same_timestamp, series_timestamps
+            )
+            points = sum([len(values) for values in six.itervalues(inputs)])
+            stats['rows'] += len(frame)
+            stats['points'] += points
+            logger.debug(
+                'parsed %s rows into %s points', len(frame), points
+            )
+            if inputs:
+                yield inputs
+
+    starttime = time.time()
     with database.influx_session() as session:
-        response = timeseries.list_timeseries(
-            session, {
-                'where': {
-                    'device': data.get('device'),
-                    'starttime': data.get('starttime'),
-                    'endtime': data.get('endtime')
-                },
-                'group_by': data.get('group_by'),
-                'order_by': data.get('order_by'),
-                'fill': data.get('fill'),
-                'aggregation': data.get('aggregation'),
-                'limit': data.get('limit'),
-                'offset': data.get('offset'),
-                'datacenter': datacenter,
-                'device_type': device_types
-            },
+        status = timeseries.create_timeseries_stream(
+            session, iter_inputs(),
+            tags,
             time_precision=time_precision,
-            convert_timestamp=True,
-            format_timestamp=False,
-            device_type_units={
-                device_type: {measurement: data.get('unit')}
-            }
+            convert_timestamp=False,
+            device_type_units=device_type_units
         )
-    column_names = [timestamp_column]
-    column_indexes = {}
-    timestamps = set()
-    exports = {}
-    for key, tag_response in six.iteritems(response):
-        _, _, device = key
-        column_names.append(device)
-        exports[device] = tag_response
-        for timestamp in six.iterkeys(tag_response):
-            timestamps.add(timestamp)
-
-    for i, column_name in enumerate(column_names):
-        column_indexes[column_name] = i
-    columns = len(column_names)
-    logger.debug('column names: %s', column_names)
-    logger.debug('column_indexes: %s', column_indexes)
-    timestamps = list(timestamps)
-    timestamps = sorted(timestamps)
-    logger.debug('timestamps: %s', timestamps)
-    rows = {}
-    default_row = columns * [CONF.timeseries_default_value]
-    for device, values in six.iteritems(exports):
-        for timestamp, value in six.iteritems(values):
-            if timestamp not in rows:
-                row = default_row[:]
-                row[0] = timestamp_formatter(timestamp)
-                rows[timestamp] = row
-            else:
-                row = rows[timestamp]
-            row[column_indexes[device]] = value
-    output = []
-    output.append(column_names)
-    for timestamp in timestamps:
-        row = rows[timestamp]
-        output.append(row)
-    string_buffer = StringIO()
-    writer = csv.writer(string_buffer)
-    writer.writerows(output)
-    return utils.make_csv_response(
-        200, string_buffer.getvalue(),
-        '%s-%s-%s.csv' % (datacenter, device_type, measurement)
-    )
-
-
-def read_csv_files():
-    request_files = request.files.items(multi=True)
-    if not request_files:
+    stats['seconds'] = time.time() - starttime
+    if not status:
         raise exception_handler.NotAcceptable(
-            'no csv file to upload'
+            'data import for datacenter %s tags %s '
+            'is not acceptable' % (datacenter, tags)
         )
-    logger.debug('upload csv files: %s', request_files)
-    data = []
-    for filename, upload in request_files:
-        logger.debug('read csv file %s', filename)
-        fields = None
-        reader = csv.reader(upload)
-        for row in reader:
-            if not row:
-                continue
-            if not fields:
-                fields = row
-            else:
-                data.append(dict(zip(fields, row)))
-    logger.debug('csv files are uploaded')
-    return data
+    seconds = stats['seconds'] or 1
+    stats['rows_per_second'] = stats['rows'] / seconds
+    stats['points_per_second'] = stats['points'] / seconds
+    logger.info(
+        'imported %s rows %s points to %s in %.3f seconds: '
+        '%.1f rows/s %.1f points/s',
+        stats['rows'], stats['points'], datacenter, stats['seconds'],
+        stats['rows_per_second'], stats['points_per_second']
+    )
+    stats['status'] = True
+    return utils.make_json_response(200, stats)
 
 
 @app.route(
@@ -1413,24 +1722,6 @@ def import_timeseries(datacenter):
         datacenter_metadata = timeseries.get_datacenter_metadata(
             session, datacenter
         )
-    time_precision = args.get(
-        'time_precision',
-        CONF.timeseries_time_precision
-    ) or None
-    logger.debug('time precision: %s', time_precision)
-    import_add_seconds_same_timestamp = args.get(
-        'import_add_seconds_same_timestamp'
-    ) or CONF.timeseries_import_add_seconds_same_timestamp
-    if import_add_seconds_same_timestamp:
-        import_add_seconds_same_timestamp = int(
-            import_add_seconds_same_timestamp
-        )
-    import_add_seconds_same_timestamp = timeseries.get_timedelta(
-        time_precision, import_add_seconds_same_timestamp
-    )
-    timestamp_converter = timeseries.get_timestamp_converter(time_precision)
-    ignorable_values = CONF.timeseries_ignorable_values
-    logger.debug('ignorable values: %s', ignorable_values)
     device_type_units = {
     }
     for device_type, device_type_metadata in six.iteritems(
@@ -1445,10 +1736,6 @@ def import_timeseries(datacenter):
             )
             if measurement_unit:
                 measurement_units[measurement] = measurement_unit
-    timestamp_column = args.get(
-        'timestamp_column'
-    ) or CONF.timeseries_export_timestamp_column
-    assert timestamp_column
     device_type_column = args.get(
         'device_type_column', CONF.timeseries_export_device_type_column
     )
@@ -1460,85 +1747,26 @@ def import_timeseries(datacenter):
         'measurement_column',
         CONF.timeseries_export_measurement_column
     )
-    logger.debug('timestamp_column: %s', timestamp_column)
     logger.debug('device_type_column: %s', device_type_column)
     logger.debug('device_column: %s', device_column)
     logger.debug('measurement_column: %s', measurement_column)
     assert not all([device_type_column, device_column, measurement_column])
-    column_name_map = {}
-    row_keys = []
+    row_columns = []
     column_keys = []
-    column_name_map[timestamp_column] = 'time'
-    if device_type_column:
-        column_name_map[device_type_column] = 'device_type'
-        row_keys.append('device_type')
-    if not device_type_column:
-        column_keys.append('device_type')
-    if device_column:
-        column_name_map[device_column] = 'device'
-        row_keys.append('device')
-    if not device_column:
-        column_keys.append('device')
-    if measurement_column:
-        column_name_map[measurement_column] = 'measurement'
-        row_keys.append('measurement')
-    if not measurement_column:
-        column_keys.append('measurement')
-    logger.debug('column_name_map: %s', column_name_map)
-    data = read_csv_files()
-    logger.debug('generate influx data')
-    inputs = {}
-    for item in data:
-        tags = {}
-        for key, value in six.iteritems(column_name_map):
-            tag_value = item.pop(
-                key, CONF.timeseries_default_value
-            )
-            if tag_value in CONF.timeseries_ignorable_values:
-                continue
-            tags[value] = tag_value
-        timestamp = timestamp_converter(tags['time'])
-        for key, value in six.iteritems(item):
-            if key in CONF.timeseries_ignorable_values:
-                continue
-            tags.update(dict(zip(column_keys, key.split('.'))))
-            if value in CONF.timeseries_ignorable_values:
-                continue
-            device_type = tags['device_type']
-            measurement = tags['measurement']
-            device = tags['device']
-            tag_timestamps = inputs.setdefault(
-                (device_type, measurement, device), {}
-            )
-            if import_add_seconds_same_timestamp:
-                while timestamp in tag_timestamps:
-                    timestamp += import_add_seconds_same_timestamp
-            tag_timestamps[timestamp] = value
-    logger.debug('influx data is generated')
-    tags = {
-        'datacenter': datacenter,
-        'device_type': args.get('device_type')
-    }
-    status = True
-    logger.debug('write data to influx')
-    with database.influx_session() as session:
-        status &= timeseries.create_timeseries(
-            session, inputs,
-            tags=tags,
-            time_precision=time_precision,
-            convert_timestamp=False,
-            device_type_units=device_type_units
-        )
-    logger.debug('influx data is written')
-    if not status:
-        raise exception_handler.NotAccept(
-            'data import for datacenter %s device type %s '
-            'is not acceptable' % (
-                datacenter, device_type
-            )
-        )
-    return utils.make_json_response(
-        200, {'status': True}
+    for column_name, tag in [
+        (device_type_column, 'device_type'), (device_column, 'device'),
+        (measurement_column, 'measurement')
+    ]:
+        if column_name:
+            row_columns.append((column_name, tag))
+        else:
+            column_keys.append(tag)
+    return _import_timeseries(
+        datacenter, args, {
+            'datacenter': datacenter,
+            'device_type': args.get('device_type')
+        },
+        device_type_units, row_columns, column_keys
     )
 
 
@@ -1556,24 +1784,6 @@ def import_device_type_timeseries(datacenter, device_type):
         device_type_metadata = timeseries.get_datacenter_device_type_metadata(
             session, datacenter, device_type
         )
-    time_precision = args.get(
-        'time_precision',
-        CONF.timeseries_time_precision
-    ) or None
-    logger.debug('time precision: %s', time_precision)
-    import_add_seconds_same_timestamp = args.get(
-        'import_add_seconds_same_timestamp'
-    ) or CONF.timeseries_import_add_seconds_same_timestamp
-    if import_add_seconds_same_timestamp:
-        import_add_seconds_same_timestamp = int(
-            import_add_seconds_same_timestamp
-        )
-    import_add_seconds_same_timestamp = timeseries.get_timedelta(
-        time_precision, import_add_seconds_same_timestamp
-    )
-    timestamp_converter = timeseries.get_timestamp_converter(time_precision)
-    ignorable_values = CONF.timeseries_ignorable_values
-    logger.debug('ignorable values: %s', ignorable_values)
     measurement_units = {
     }
     device_type_units = {
@@ -1583,10 +1793,6 @@ def import_device_type_timeseries(datacenter, device_type):
         measurement_unit = args.get('%s_unit' % measurement)
         if measurement_unit:
             measurement_units[measurement] = measurement_unit
-    timestamp_column = args.get(
-        'timestamp_column'
-    ) or CONF.timeseries_export_timestamp_column
-    assert timestamp_column
     device_column = args.get(
         'device_column',
         CONF.timeseries_export_device_column
@@ -1595,78 +1801,25 @@ def import_device_type_timeseries(datacenter, device_type):
         'measurement_column',
         CONF.timeseries_export_measurement_column
     )
-    logger.debug('timestamp_column: %s', timestamp_column)
     logger.debug('device_column: %s', device_column)
     logger.debug('measurement_column: %s', measurement_column)
     assert not all([device_column, measurement_column])
-    column_name_map = {}
-    row_keys = []
+    row_columns = []
     column_keys = []
-    column_name_map[timestamp_column] = 'time'
-    if device_column:
-        column_name_map[device_column] = 'device'
-        row_keys.append('device')
-    if not device_column:
-        column_keys.append('device')
-    if measurement_column:
-        column_name_map[measurement_column] = 'measurement'
-        row_keys.append('measurement')
-    if not measurement_column:
-        column_keys.append('measurement')
-    logger.debug('column_name_map: %s', column_name_map)
-    data = read_csv_files()
-    logger.debug('generate influx data')
-    inputs = {}
-    for item in data:
-        tags = {}
-        for key, value in six.iteritems(column_name_map):
-            tag_value = item.pop(
-                key, CONF.timeseries_default_value
-            )
-            if tag_value in CONF.timeseries_ignorable_values:
-                continue
-            tags[value] = tag_value
-        timestamp = timestamp_converter(tags['time'])
-        for key, value in six.iteritems(item):
-            if key in CONF.timeseries_ignorable_values:
-                continue
-            tags.update(dict(zip(column_keys, key.split('.'))))
-            if value in CONF.timeseries_ignorable_values:
-                continue
-            measurement = tags['measurement']
-            device = tags['device']
-            tag_timestamps = inputs.setdefault(
-                (device_type, measurement, device), {}
-            )
-            if import_add_seconds_same_timestamp:
-                while timestamp in tag_timestamps:
-                    timestamp += import_add_seconds_same_timestamp
-            tag_timestamps[timestamp] = value
-    logger.debug('influx data is generated')
-    tags = {
-        'datacenter': datacenter,
-        'device_type': {device_type: args.get('measurement')}
-    }
-    status = True
-    logger.debug('write data to influx')
-    with database.influx_session() as session:
-        status &= timeseries.create_timeseries(
-            session, inputs,
-            tags=tags,
-            time_precision=time_precision,
-            convert_timestamp=False,
-            device_type_units=device_type_units
-        )
-    logger.debug('influx data is written')
-    if not status:
-        raise exception_handler.NotAccept(
-            'data import for datacenter %s device type %s '
-            'is not acceptable' % (
-                datacenter, device_type
-            )
-        )
-    return utils.make_json_response(
-        200, {'status': True}
+    for column_name, tag in [
+        (device_column, 'device'), (measurement_column, 'measurement')
+    ]:
+        if column_name:
+            row_columns.append((column_name, tag))
+        else:
+            column_keys.append(tag)
+    return _import_timeseries(
+        datacenter, args, {
+            'datacenter': datacenter,
+            'device_type': {device_type: args.get('measurement')}
+        },
+        device_type_units, row_columns, column_keys,
+        fixed_tags={'device_type': device_type}
     )
 
 
@@ -1691,81 +1844,16 @@ def import_measurement_timeseries(datacenter, device_type, measurement):
                 measurement, datacenter, device_type
             )
         )
-    import_add_seconds_same_timestamp = args.get(
-        'import_add_seconds_same_timestamp'
-    ) or CONF.timeseries_import_add_seconds_same_timestamp
-    if import_add_seconds_same_timestamp:
-        import_add_seconds_same_timestamp = int(
-            import_add_seconds_same_timestamp
-        )
-    timestamp_column = args.get(
-        'timestamp_column'
-    ) or CONF.timeseries_export_timestamp_column
-    assert timestamp_column
-    logger.debug('timestamp_column: %s', timestamp_column)
-    time_precision = args.get(
-        'time_precision',
-        CONF.timeseries_time_precision
-    ) or None
-    timestamp_converter = timeseries.get_timestamp_converter(time_precision)
-    logger.debug('time precision: %s', time_precision)
-    import_add_seconds_same_timestamp = timeseries.get_timedelta(
-        time_precision, import_add_seconds_same_timestamp
-    )
-    measurement_unit = args.get('unit')
-    device_type_units = {
-        device_type: {measurement: measurement_unit}
-    }
-    data = read_csv_files()
-    logger.debug('generate influx data')
-    logger.debug('ignorable values: %s', CONF.timeseries_ignorable_values)
-    inputs = {}
-    for item in data:
-        tag_value = item.pop(
-            timestamp_column, CONF.timeseries_default_value
-        )
-        if tag_value in CONF.timeseries_ignorable_values:
-            continue
-        timestamp = timestamp_converter(tag_value)
-        for device, value in six.iteritems(item):
-            if device in CONF.timeseries_ignorable_values:
-                continue
-            if value in CONF.timeseries_ignorable_values:
-                continue
-            tag_timestamps = inputs.setdefault(
-                (device_type, measurement, device), {}
-            )
-            if import_add_seconds_same_timestamp:
-                while timestamp in tag_timestamps:
-                    timestamp += import_add_seconds_same_timestamp
-            tag_timestamps[timestamp] = value
-    logger.debug('influx data is generated')
-    tags = {
-        'datacenter': datacenter,
-        'device_type': {
-            device_type: {measurement: args.get('device')}
-        }
-    }
-    status = True
-    logger.debug('write data to influx')
-    with database.influx_session() as session:
-        status &= timeseries.create_timeseries(
-            session, inputs,
-            tags=tags,
-            time_precision=time_precision,
-            convert_timestamp=False,
-            device_type_units=device_type_units
-        )
-    logger.debug('influx data is written')
-    if not status:
-        raise exception_handler.NotAccept(
-            'data import for datacenter %s device type %s measurement %s'
-            'is not acceptable' % (
-                datacenter, device_type, measurement
-            )
-        )
-    return utils.make_json_response(
-        200, {'status': True}
+    return _import_timeseries(
+        datacenter, args, {
+            'datacenter': datacenter,
+            'device_type': {
+                device_type: {measurement: args.get('device')}
+            }
+        },
+        {device_type: {measurement: args.get('unit')}},
+        [], ['device'],
+        fixed_tags={'device_type': device_type, 'measurement': measurement}
     )
 
 
@@ -1926,9 +2014,14 @@ def create_device_timeseries(datacenter, device_type, measurement, device):
         device_type_metadata = timeseries.get_datacenter_device_type_metadata(
             session, datacenter, device_type
         )
+        metadata_index = timeseries.get_datacenter_metadata_index(
+            session, datacenter
+        )
     assert measurement in device_type_metadata
-    measurement_metadata = device_type_metadata[measurement]
-    assert device in measurement_metadata['devices']
+    measurement_devices = metadata_index[device_type][
+        'measurement_devices'
+    ][measurement]
+    assert device in measurement_devices
     write_data = {}
     for device, device_data in six.iteritems(data):
         write_data[(device_type, measurement, device)] = device_data
@@ -1956,16 +2049,23 @@ def delete_timeseries(
         datacenter
 ):
     data = _get_request_data()
+    dry_run = _get_request_args(
+        dry_run=_bool_converter
+    ).get('dry_run', False)
     with database.session() as session:
         timeseries.get_datacenter_metadata(
             session, datacenter
         )
     with database.influx_session() as session:
-        timeseries.delete_timeseries(
+        cardinality = timeseries.delete_timeseries(
             session, {
                 'datacenter': datacenter,
                 'device_type': data.get('device_type')
-            }
+            }, dry_run=dry_run
+        )
+    if dry_run:
+        return utils.make_json_response(
+            200, {'status': True, 'series': cardinality}
         )
     return utils.make_json_response(
         200, {'status': True}
@@ -1980,16 +2080,23 @@ def delete_device_type_timeseries(
         datacenter, device_type
 ):
     data = _get_request_data()
+    dry_run = _get_request_args(
+        dry_run=_bool_converter
+    ).get('dry_run', False)
     with database.session() as session:
         timeseries.get_datacenter_device_type_metadata(
             session, datacenter, device_type
         )
     with database.influx_session() as session:
-        timeseries.delete_timeseries(
+        cardinality = timeseries.delete_timeseries(
             session, {
                 'datacenter': datacenter,
-                'device_type': {'device_type': data.get('measurement')}
-            }
+                'device_type': {device_type: data.get('measurement')}
+            }, dry_run=dry_run
+        )
+    if dry_run:
+        return utils.make_json_response(
+            200, {'status': True, 'series': cardinality}
         )
     return utils.make_json_response(
         200, {'status': True}
@@ -2002,19 +2109,26 @@ def delete_device_type_timeseries(
 )
 def delete_measurement_timeseries(datacenter, device_type, measurement):
     data = _get_request_data()
+    dry_run = _get_request_args(
+        dry_run=_bool_converter
+    ).get('dry_run', False)
     with database.session() as session:
         device_type_metadata = timeseries.get_datacenter_device_type_metadata(
             session, datacenter, device_type
         )
     assert measurement in device_type_metadata
     with database.influx_session() as session:
-        timeseries.delete_timeseries(
+        cardinality = timeseries.delete_timeseries(
             session, {
                 'datacenter': datacenter,
                 'device_type': {
                     device_type: {measurement: data.get('device')}
                 }
-            }
+            }, dry_run=dry_run
+        )
+    if dry_run:
+        return utils.make_json_response(
+            200, {'status': True, 'series': cardinality}
         )
     return utils.make_json_response(
         200, {'status': True}
@@ -2030,9 +2144,14 @@ def delete_device_timeseries(datacenter, device_type, device, measurement):
         device_type_metadata = timeseries.get_datacenter_device_type_metadata(
             session, datacenter, device_type
         )
+        metadata_index = timeseries.get_datacenter_metadata_index(
+            session, datacenter
+        )
     assert measurement in device_type_metadata
-    measurement_metadata = device_type_metadata[measurement]
-    assert device in measurement_metadata['devices']
+    measurement_devices = metadata_index[device_type][
+        'measurement_devices'
+    ][measurement]
+    assert device in measurement_devices
     with database.influx_session() as session:
         timeseries.delete_timeseries(
             session, {
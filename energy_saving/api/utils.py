@@ -5,6 +5,8 @@ import os.path
 
 from flask import make_response
 from flask import render_template
+from flask import Response
+from flask import stream_with_context
 import simplejson as json
 
 
@@ -41,6 +43,30 @@ def make_csv_response(status_code, csv_data, fname=None, **kwargs):
     return resp
 
 
+def make_stream_response(
+    status_code, chunks, fname, mimetype='application/octet-stream',
+    **kwargs
+):
+    """Stream chunks of a generator as an attached file."""
+    resp = Response(
+        stream_with_context(chunks), status=status_code,
+        mimetype=mimetype
+    )
+    resp.headers['Content-Disposition'] = 'attachment; filename="%s"' % fname
+    return resp
+
+
+def make_csv_stream_response(status_code, csv_chunks, fname=None, **kwargs):
+    """Stream CSV chunks of a generator as the response."""
+    if not fname:
+        fname = 'download.csv'
+    if not fname.endswith('.csv'):
+        fname = '.'.join((fname, 'csv'))
+    return make_stream_response(
+        status_code, csv_chunks, fname, mimetype='text/csv'
+    )
+
+
 def make_file_response(status_code, pathname, **kwargs):
     filename = os.path.basename(pathname)
     mime_type, encoding = mimetypes.guess_type(filename)
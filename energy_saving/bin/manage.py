@@ -229,14 +229,29 @@ def generate_controller_power_supply_attribute_data(
 
 @app_manager.command
 def update_timeseries_metadata(
-    datacenter, starttime, endtime
+    datacenter, starttime, endtime, incremental=False
 ):
     with database.influx_session(dataframe=True) as session:
         timeseries.update_timeseries_metadata(
-            session, datacenter, starttime, endtime
+            session, datacenter, starttime, endtime,
+            incremental=incremental or None
         )
 
 
+@app_manager.command
+def create_timeseries_rollups(starttime=None, endtime=None):
+    with database.influx_session() as session:
+        timeseries.create_timeseries_rollups(
+            session, starttime=starttime, endtime=endtime
+        )
+
+
+@app_manager.command
+def drop_timeseries_rollups():
+    with database.influx_session() as session:
+        timeseries.drop_timeseries_rollups(session)
+
+
 def main():
     logsetting.init()
     database.init()
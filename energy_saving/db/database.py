@@ -1,11 +1,13 @@
 """Provider interface to manipulate database."""
 import logging
+import os
 from oslo_config import cfg
 
 from contextlib import contextmanager
 from influxdb import DataFrameClient
 from influxdb import InfluxDBClient
 from sqlalchemy import create_engine
+from sqlalchemy import event
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import scoped_session
@@ -17,6 +19,7 @@ from sqlalchemy.pool import StaticPool
 from sqlalchemy_utils import create_database
 from sqlalchemy_utils import database_exists
 from threading import local
+from threading import Lock
 
 from energy_saving.db import exception
 from energy_saving.db import models
@@ -45,6 +48,21 @@ opts = [
         'influx_timeout',
         help='influx timeout',
         default=settings.INFLUX_TIMEOUT
+    ),
+    cfg.IntOpt(
+        'influx_pool_size',
+        help='max idle influx clients kept per process',
+        default=settings.INFLUX_POOL_SIZE
+    ),
+    cfg.IntOpt(
+        'influx_connection_pool_size',
+        help='max keep-alive http connections of each influx client',
+        default=settings.INFLUX_CONNECTION_POOL_SIZE
+    ),
+    cfg.IntOpt(
+        'influx_retries',
+        help='retries of each influx request, 0 means retry forever',
+        default=settings.INFLUX_RETRIES
     )
 ]
 CONF = util.CONF
@@ -61,29 +79,123 @@ POOL_MAPPING = {
     'thread_single': SingletonThreadPool
 }
 INFLUX_SESSION = None
+QUERY_COUNTER = local()
 logger = logging.getLogger(__name__)
 
 
 class InfluxSession(object):
-    def __init__(self, influx_url, timeout=None):
+    """Process wide pool of long lived influx clients.
+
+    Each client keeps its own keep-alive http connection pool and is
+    used by one thread at a time between acquire and release. When the
+    pool is empty a new client is created, and at most pool_size idle
+    clients are kept. The pool is dropped when the process is forked,
+    so the child never shares sockets with its parent.
+    """
+    def __init__(
+        self, influx_url, timeout=None, pool_size=None,
+        connection_pool_size=None, retries=None
+    ):
         self.influx_url = influx_url
         self.timeout = timeout
+        self.pool_size = pool_size or 0
+        self.connection_pool_size = connection_pool_size
+        self.retries = retries
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = Lock()
+        self._idle_clients = {False: [], True: []}
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            logger.debug(
+                'influx session forked from %s in %s',
+                self._pid, os.getpid()
+            )
+            self._reset()
+
+    def _get_client_kwargs(self):
+        kwargs = {'timeout': self.timeout}
+        if self.connection_pool_size:
+            kwargs['pool_size'] = self.connection_pool_size
+        if self.retries is not None:
+            kwargs['retries'] = self.retries
+        return kwargs
 
     def get_client(self):
         return InfluxDBClient.from_DSN(
-            self.influx_url, timeout=self.timeout
+            self.influx_url, **self._get_client_kwargs()
         )
 
     def get_dataframe_client(self):
         return DataFrameClient.from_DSN(
-            self.influx_url, timeout=self.timeout
+            self.influx_url, **self._get_client_kwargs()
         )
 
+    def acquire(self, dataframe=False):
+        """Get an idle client from the pool or create a new one."""
+        self._check_pid()
+        with self._lock:
+            clients = self._idle_clients[dataframe]
+            if clients:
+                return clients.pop()
+        if dataframe:
+            return self.get_dataframe_client()
+        else:
+            return self.get_client()
+
+    def release(self, client, dataframe=False, discard=False):
+        """Return the client to the pool.
+
+        The client is closed instead if discard, the pool is full or
+        the client was created before the process forked.
+        """
+        if self._pid == os.getpid() and not discard:
+            with self._lock:
+                clients = self._idle_clients[dataframe]
+                if len(clients) < self.pool_size:
+                    clients.append(client)
+                    return
+        self._close_client(client)
+
+    def _close_client(self, client):
+        try:
+            client.close()
+        except Exception as error:
+            logger.debug('failed to close influx client: %s', error)
+
+    def dispose(self):
+        """Close all idle clients."""
+        self._check_pid()
+        with self._lock:
+            clients = (
+                self._idle_clients[False] + self._idle_clients[True]
+            )
+            self._idle_clients = {False: [], True: []}
+        for client in clients:
+            self._close_client(client)
+
 
 def is_dataframe_session(session):
     return isinstance(session, DataFrameClient)
 
 
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    QUERY_COUNTER.count = get_query_count() + 1
+
+
+def get_query_count():
+    """Get the number of sql statements executed in current thread."""
+    return getattr(QUERY_COUNTER, 'count', 0)
+
+
+def reset_query_count():
+    """Reset the sql statements counter of current thread."""
+    QUERY_COUNTER.count = 0
+
+
 def init(database_url=None, influx_url=None):
     """Initialize database.
 
@@ -122,9 +234,17 @@ def init(database_url=None, influx_url=None):
         database_url, convert_unicode=True,
         poolclass=poolclass
     )
+    event.listen(ENGINE, 'before_cursor_execute', _count_query)
     SESSION.configure(bind=ENGINE)
     SCOPED_SESSION = scoped_session(SESSION)
-    INFLUX_SESSION = InfluxSession(influx_url, influx_timeout)
+    if INFLUX_SESSION:
+        INFLUX_SESSION.dispose()
+    INFLUX_SESSION = InfluxSession(
+        influx_url, influx_timeout,
+        pool_size=CONF.influx_pool_size,
+        connection_pool_size=CONF.influx_connection_pool_size,
+        retries=CONF.influx_retries
+    )
 
 
 def in_session():
@@ -136,17 +256,17 @@ def in_session():
 def influx_session(dataframe=False):
     if not INFLUX_SESSION:
         init()
-    if dataframe:
-        client = INFLUX_SESSION.get_dataframe_client()
-    else:
-        client = INFLUX_SESSION.get_client()
+    client = INFLUX_SESSION.acquire(dataframe)
     logger.debug('influx session %s enter', client)
+    discard = False
     try:
         yield client
     except Exception as error:
+        discard = True
         logger.exception(error)
         raise exception.DatabaseException(str(error))
     finally:
+        INFLUX_SESSION.release(client, dataframe, discard=discard)
         logger.debug('influx session %s exit', client)
 
 
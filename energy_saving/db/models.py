@@ -5,6 +5,7 @@ import simplejson as json
 import sys
 
 from sqlalchemy import Column
+from sqlalchemy import DateTime
 from sqlalchemy import Enum
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import Float
@@ -114,18 +115,43 @@ class LocationMixin(object):
     location = Column(JSON)
 
 
-class AttrMixin(object):
+class MomentsMixin(object):
+    """Running moments of the timeseries values.
+
+    Values are time_interval bucket means. moments_m2 is the sum of
+    squared differences from the mean. moments_watermark is the end of
+    the time range the moments cover.
+    """
+    moments_count = Column(Integer, default=0, server_default='0')
+    moments_sum = Column(Float(), default=0.0, server_default='0')
+    moments_m2 = Column(Float(), default=0.0, server_default='0')
+    differentiation_moments_count = Column(
+        Integer, default=0, server_default='0'
+    )
+    differentiation_moments_sum = Column(
+        Float(), default=0.0, server_default='0'
+    )
+    differentiation_moments_m2 = Column(
+        Float(), default=0.0, server_default='0'
+    )
+    moments_watermark = Column(DateTime)
+
+
+class StatisticsMixin(MomentsMixin):
+    mean = Column(Float())
+    deviation = Column(Float())
+    differentiation_mean = Column(Float())
+    differentiation_deviation = Column(Float())
+
+
+class AttrMixin(StatisticsMixin):
     type = Column(
         Enum('binary', 'continuous', 'integer', 'discrete'),
         default='continuous', server_default='continuous'
     )
     unit = Column(String(36))
-    mean = Column(Float())
-    deviation = Column(Float())
     max = Column(Float())
     min = Column(Float())
-    differentiation_mean = Column(Float())
-    differentiation_deviation = Column(Float())
     differentiation_max = Column(Float())
     differentiation_min = Column(Float())
     possible_values = Column(JSON)
@@ -158,6 +184,7 @@ class Datacenter(BASE, LocationMixin, HelperMixin):
     properties = Column(JSON)
     models = Column(JSON)
     time_interval = Column(Integer)
+    rollups = Column(JSON)
     sensors = relationship(
         'Sensor',
         foreign_keys='[Sensor.datacenter_name]',
@@ -310,7 +337,7 @@ class PowerSupplyAttr(BASE, AttrMixin, HelperMixin):
         )
 
 
-class PowerSupplyAttrData(BASE, HelperMixin):
+class PowerSupplyAttrData(BASE, StatisticsMixin, HelperMixin):
     """power supply attribute data table."""
     __tablename__ = 'power_supply_attribute_data'
     datacenter_name = Column(
@@ -416,7 +443,7 @@ class ControllerPowerSupplyAttr(BASE, AttrMixin, HelperMixin):
         )
 
 
-class ControllerPowerSupplyAttrData(BASE, HelperMixin):
+class ControllerPowerSupplyAttrData(BASE, StatisticsMixin, HelperMixin):
     """controller power supply attribute data table."""
     __tablename__ = 'controller_power_supply_attribute_data'
     datacenter_name = Column(
@@ -526,7 +553,7 @@ class SensorAttr(BASE, AttrMixin, HelperMixin):
         )
 
 
-class SensorAttrData(BASE, HelperMixin):
+class SensorAttrData(BASE, StatisticsMixin, HelperMixin):
     """Sensor attribute data table."""
     __tablename__ = 'sensor_attribute_data'
     datacenter_name = Column(
@@ -641,7 +668,7 @@ class ControllerAttr(BASE, AttrMixin, HelperMixin):
         )
 
 
-class ControllerAttrData(BASE, HelperMixin):
+class ControllerAttrData(BASE, StatisticsMixin, HelperMixin):
     """controller attribute data table."""
     __tablename__ = 'controller_attribute_data'
     datacenter_name = Column(
@@ -826,7 +853,7 @@ class EnvironmentSensorAttr(BASE, AttrMixin, HelperMixin):
         )
 
 
-class EnvironmentSensorAttrData(BASE, HelperMixin):
+class EnvironmentSensorAttrData(BASE, StatisticsMixin, HelperMixin):
     """Environment sensor attribute data table."""
     __tablename__ = 'environment_sensor_attribute_data'
     datacenter_name = Column(
@@ -1,19 +1,155 @@
+import collections
+import copy
 import datetime
 from dateutil import parser
+from dateutil.tz import tzutc
 import functools
+import gzip
+import io
+import json
 import logging
+from multiprocessing.pool import ThreadPool
 import numpy as np
 import pandas as pd
 import re
 import six
 import sys
+import threading
+import time
+
+from influxdb.resultset import ResultSet
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:
+    guess_datetime_format = None
+from oslo_config import cfg
+from sqlalchemy.orm import selectinload
 
 from energy_saving.db import database
 from energy_saving.db import exception
 from energy_saving.db import models
+from energy_saving.utils import settings
+from energy_saving.utils import util
+
 
+opts = [
+    cfg.BoolOpt(
+        'timeseries_metadata_cache',
+        help='cache datacenter metadata in process',
+        default=settings.DEFAULT_METADATA_CACHE
+    ),
+    cfg.IntOpt(
+        'timeseries_metadata_cache_expire',
+        help=(
+            'seconds the cached datacenter metadata is valid, '
+            '0 means never expire'
+        ),
+        default=settings.DEFAULT_METADATA_CACHE_EXPIRE
+    ),
+    cfg.IntOpt(
+        'timeseries_chunk_size',
+        help=(
+            'points per chunk when streaming timeseries, '
+            '0 means reading each response at once'
+        ),
+        default=settings.DEFAULT_TIMESERIES_CHUNK_SIZE
+    ),
+    cfg.IntOpt(
+        'timeseries_shards',
+        help=(
+            'split the time range of a timeseries listing into '
+            'that many sub ranges fetched concurrently'
+        ),
+        default=settings.DEFAULT_TIMESERIES_SHARDS
+    ),
+    cfg.IntOpt(
+        'timeseries_shard_workers',
+        help='max threads to fetch timeseries sub ranges',
+        default=settings.DEFAULT_TIMESERIES_SHARD_WORKERS
+    ),
+    cfg.IntOpt(
+        'timeseries_window',
+        help=(
+            'seconds of each time window when walking timeseries '
+            'window by window, e.g. when exporting'
+        ),
+        default=settings.DEFAULT_TIMESERIES_WINDOW
+    ),
+    cfg.IntOpt(
+        'timeseries_write_batch_size',
+        help='points per influx write request',
+        default=settings.DEFAULT_TIMESERIES_WRITE_BATCH_SIZE
+    ),
+    cfg.BoolOpt(
+        'timeseries_write_gzip',
+        help='gzip influx write requests',
+        default=settings.DEFAULT_TIMESERIES_WRITE_GZIP
+    ),
+    cfg.BoolOpt(
+        'timeseries_result_cache',
+        help=(
+            'cache timeseries listings of time ranges in the past in '
+            'each process, other processes see writes after it expires'
+        ),
+        default=settings.DEFAULT_TIMESERIES_RESULT_CACHE
+    ),
+    cfg.IntOpt(
+        'timeseries_result_cache_size',
+        help='max bytes of cached timeseries listings',
+        default=settings.DEFAULT_TIMESERIES_RESULT_CACHE_SIZE
+    ),
+    cfg.IntOpt(
+        'timeseries_result_cache_margin',
+        help=(
+            'seconds before now the endtime of a timeseries listing '
+            'should be to cache it'
+        ),
+        default=settings.DEFAULT_TIMESERIES_RESULT_CACHE_MARGIN
+    ),
+    cfg.IntOpt(
+        'timeseries_result_cache_expire',
+        help=(
+            'seconds a cached timeseries listing is valid, '
+            '0 means never expire'
+        ),
+        default=settings.DEFAULT_TIMESERIES_RESULT_CACHE_EXPIRE
+    ),
+    cfg.BoolOpt(
+        'timeseries_statistics_in_influx',
+        help='compute timeseries metadata statistics in influx',
+        default=settings.DEFAULT_TIMESERIES_STATISTICS_IN_INFLUX
+    ),
+    cfg.BoolOpt(
+        'timeseries_statistics_incremental',
+        help=(
+            'update timeseries metadata statistics from the moments '
+            'kept in database with timeseries after the last update'
+        ),
+        default=settings.DEFAULT_TIMESERIES_STATISTICS_INCREMENTAL
+    ),
+    cfg.BoolOpt(
+        'timeseries_rollup',
+        help='read aggregated timeseries from rollup tiers if possible',
+        default=settings.DEFAULT_TIMESERIES_ROLLUP
+    ),
+    cfg.ListOpt(
+        'timeseries_rollup_intervals',
+        help='group by time intervals of timeseries rollup tiers',
+        default=settings.DEFAULT_TIMESERIES_ROLLUP_INTERVALS
+    )
+]
+CONF = util.CONF
+CONF.register_cli_opts(opts)
 
 logger = logging.getLogger(__name__)
+METADATA_CACHE = {}
+METADATA_CACHE_VERSIONS = {}
+METADATA_CACHE_GENERATION = 0
+METADATA_CACHE_LOCK = threading.Lock()
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=tzutc())
+RESULT_CACHE = None
+RESULT_CACHE_LOCK = threading.Lock()
+INVALIDATE_CALLBACKS = []
 if sys.version_info > (3,):
     long = int
     basestring = str
@@ -27,6 +163,7 @@ def _get_attribute_dict(attribute):
         'devices': [],
         'properties': {},
         'device_properties': {},
+        'device_statistics': {},
         'attribute': {
             'type': attribute.type,
             'unit': attribute.unit,
@@ -43,7 +180,29 @@ def _get_attribute_dict(attribute):
     }
 
 
-def _set_attribute_dict(attribute, data):
+def _get_attribute_data_statistics(data):
+    return {
+        'mean': data.mean,
+        'deviation': data.deviation,
+        'differentiation_mean': data.differentiation_mean,
+        'differentiation_deviation': data.differentiation_deviation
+    }
+
+
+def _set_attribute_data_statistics(data, statistics):
+    for key in [
+        'mean', 'deviation',
+        'differentiation_mean', 'differentiation_deviation'
+    ]:
+        if key in statistics:
+            setattr(data, key, statistics[key])
+
+
+def _set_attribute_dict(attribute, data, device_data={}):
+    device_statistics = data.get('device_statistics') or {}
+    for device, statistics in six.iteritems(device_statistics):
+        if device in device_data:
+            _set_attribute_data_statistics(device_data[device], statistics)
     attribute_data = data['attribute']
     if 'mean' in attribute_data:
         attribute.mean = attribute_data['mean']
@@ -64,6 +223,7 @@ def _get_parameter_dict(parameter):
         'devices': [],
         'properties': {},
         'device_properties': {},
+        'device_statistics': {},
         'attribute': {
             'type': parameter.type,
             'unit': parameter.unit,
@@ -89,6 +249,7 @@ def get_sensor_attributes(datacenter):
     for attribute in datacenter.sensor_attributes:
         result[attribute.name] = _get_attribute_dict(attribute)
         devices = result[attribute.name]['devices']
+        device_statistics = result[attribute.name]['device_statistics']
         properties = result[attribute.name]['properties']
         properties.update(attribute.properties or {})
         device_properties = result[attribute.name]['device_properties']
@@ -98,13 +259,17 @@ def get_sensor_attributes(datacenter):
             device_properties[device] = {}
             device_properties[device].update(data.sensor.properties or {})
             device_properties[device].update(data.properties or {})
+            device_statistics[device] = _get_attribute_data_statistics(data)
     return result
 
 
 def set_sensor_attributes(datacenter, data):
     for attribute in datacenter.sensor_attributes:
         if attribute.name in data:
-            _set_attribute_dict(attribute, data[attribute.name])
+            _set_attribute_dict(attribute, data[attribute.name], dict([
+                (device_data.sensor_name, device_data)
+                for device_data in attribute.attribute_data
+            ]))
 
 
 def get_controller_attributes(datacenter):
@@ -112,6 +277,7 @@ def get_controller_attributes(datacenter):
     for attribute in datacenter.controller_attributes:
         result[attribute.name] = _get_attribute_dict(attribute)
         devices = result[attribute.name]['devices']
+        device_statistics = result[attribute.name]['device_statistics']
         properties = result[attribute.name]['properties']
         properties.update(attribute.properties or {})
         device_properties = result[attribute.name]['device_properties']
@@ -121,13 +287,17 @@ def get_controller_attributes(datacenter):
             device_properties[device] = {}
             device_properties[device].update(data.controller.properties or {})
             device_properties[device].update(data.properties or {})
+            device_statistics[device] = _get_attribute_data_statistics(data)
     return result
 
 
 def set_controller_attributes(datacenter, data):
     for attribute in datacenter.controller_attributes:
         if attribute.name in data:
-            _set_attribute_dict(attribute, data[attribute.name])
+            _set_attribute_dict(attribute, data[attribute.name], dict([
+                (device_data.controller_name, device_data)
+                for device_data in attribute.attribute_data
+            ]))
 
 
 def get_power_supply_attributes(datacenter):
@@ -135,6 +305,7 @@ def get_power_supply_attributes(datacenter):
     for attribute in datacenter.power_supply_attributes:
         result[attribute.name] = _get_attribute_dict(attribute)
         devices = result[attribute.name]['devices']
+        device_statistics = result[attribute.name]['device_statistics']
         properties = result[attribute.name]['properties']
         properties.update(attribute.properties or {})
         device_properties = result[attribute.name]['device_properties']
@@ -146,13 +317,17 @@ def get_power_supply_attributes(datacenter):
                 data.power_supply.properties or {}
             )
             device_properties[device].update(data.properties or {})
+            device_statistics[device] = _get_attribute_data_statistics(data)
     return result
 
 
 def set_power_supply_attributes(datacenter, data):
     for attribute in datacenter.power_supply_attributes:
         if attribute.name in data:
-            _set_attribute_dict(attribute, data[attribute.name])
+            _set_attribute_dict(attribute, data[attribute.name], dict([
+                (device_data.power_supply_name, device_data)
+                for device_data in attribute.attribute_data
+            ]))
 
 
 def get_controller_power_supply_attributes(datacenter):
@@ -160,6 +335,7 @@ def get_controller_power_supply_attributes(datacenter):
     for attribute in datacenter.controller_power_supply_attributes:
         result[attribute.name] = _get_attribute_dict(attribute)
         devices = result[attribute.name]['devices']
+        device_statistics = result[attribute.name]['device_statistics']
         properties = result[attribute.name]['properties']
         properties.update(attribute.properties or {})
         device_properties = result[attribute.name]['device_properties']
@@ -171,13 +347,17 @@ def get_controller_power_supply_attributes(datacenter):
                 data.controller_power_supply.properties or {}
             )
             device_properties[device].update(data.properties or {})
+            device_statistics[device] = _get_attribute_data_statistics(data)
     return result
 
 
 def set_controller_power_supply_attributes(datacenter, data):
     for attribute in datacenter.controller_power_supply_attributes:
         if attribute.name in data:
-            _set_attribute_dict(attribute, data[attribute.name])
+            _set_attribute_dict(attribute, data[attribute.name], dict([
+                (device_data.controller_power_supply_name, device_data)
+                for device_data in attribute.attribute_data
+            ]))
 
 
 def get_environment_sensor_attributes(datacenter):
@@ -185,6 +365,7 @@ def get_environment_sensor_attributes(datacenter):
     for attribute in datacenter.environment_sensor_attributes:
         result[attribute.name] = _get_attribute_dict(attribute)
         devices = result[attribute.name]['devices']
+        device_statistics = result[attribute.name]['device_statistics']
         properties = result[attribute.name]['properties']
         properties.update(attribute.properties or {})
         device_properties = result[attribute.name]['device_properties']
@@ -196,13 +377,17 @@ def get_environment_sensor_attributes(datacenter):
                 data.environment_sensor.properties or {}
             )
             device_properties[device].update(data.properties or {})
+            device_statistics[device] = _get_attribute_data_statistics(data)
     return result
 
 
 def set_environment_sensor_attributes(datacenter, data):
     for attribute in datacenter.environment_sensor_attributes:
         if attribute.name in data:
-            _set_attribute_dict(attribute, data[attribute.name])
+            _set_attribute_dict(attribute, data[attribute.name], dict([
+                (device_data.environment_sensor_name, device_data)
+                for device_data in attribute.attribute_data
+            ]))
 
 
 def get_controller_parameters(datacenter):
@@ -254,12 +439,48 @@ DEVICE_TYPE_METADATA_SETTERS = {
 }
 
 
-def _get_datacenter_device_type_metadata(datacenter, device_type):
-    if device_type not in DEVICE_TYPE_METADATA_GETTERS:
-        raise exception.RecordNotExists(
-            'device type %s does not exist' % device_type
+# relationships walked by the metadata getters as
+# (datacenter attributes, attribute data, device).
+DEVICE_TYPE_METADATA_RELATIONSHIPS = {
+    'sensor_attribute': (
+        'sensor_attributes', 'attribute_data', 'sensor'
+    ),
+    'controller_attribute': (
+        'controller_attributes', 'attribute_data', 'controller'
+    ),
+    'controller_parameter': (
+        'controller_parameters', 'parameter_data', 'controller'
+    ),
+    'power_supply_attribute': (
+        'power_supply_attributes', 'attribute_data', 'power_supply'
+    ),
+    'controller_power_supply_attribute': (
+        'controller_power_supply_attributes', 'attribute_data',
+        'controller_power_supply'
+    ),
+    'environment_sensor_attribute': (
+        'environment_sensor_attributes', 'attribute_data',
+        'environment_sensor'
+    )
+}
+
+
+def _get_datacenter_query(session):
+    """Get datacenter query eager loading the whole metadata graph.
+
+    Each device type costs two statements no matter how many
+    attributes and devices the datacenter has.
+    """
+    options = []
+    for attributes, attribute_data, device in six.itervalues(
+        DEVICE_TYPE_METADATA_RELATIONSHIPS
+    ):
+        options.append(
+            selectinload(attributes).selectinload(
+                attribute_data
+            ).joinedload(device)
         )
-    return DEVICE_TYPE_METADATA_GETTERS[device_type](datacenter)
+    return session.query(models.Datacenter).options(*options)
 
 
 def _set_datacenter_device_type_metadata(datacenter, device_type, data):
@@ -273,21 +494,12 @@ def _set_datacenter_device_type_metadata(datacenter, device_type, data):
 def get_datacenter_device_type_metadata(
     session, datacenter_name, device_type
 ):
-    datacenter = session.query(
-        models.Datacenter
-    ).filter_by(name=datacenter_name).first()
-    if not datacenter:
+    datacenter_metadata = get_datacenter_metadata(session, datacenter_name)
+    if device_type not in datacenter_metadata['device_types']:
         raise exception.RecordNotExists(
-            'datacener %s does not exist' % datacenter_name
+            'device type %s does not exist' % device_type
         )
-    device_type_metadata = _get_datacenter_device_type_metadata(
-        datacenter, device_type
-    )
-    logger.debug(
-        'datacenter %s device type %s metadata: %s',
-        datacenter_name, device_type, device_type_metadata
-    )
-    return device_type_metadata
+    return datacenter_metadata['device_types'][device_type]
 
 
 def set_datacenter_device_type_metadata(
@@ -307,6 +519,7 @@ def set_datacenter_device_type_metadata(
     _set_datacenter_device_type_metadata(
         datacenter, device_type, data
     )
+    invalidate_metadata_cache(datacenter_name)
 
 
 def get_device_type_metadata_from_datacenter_metadata(
@@ -334,9 +547,164 @@ def _set_datacenter_metadata(datacenter, data):
             value(datacenter, device_type_data[key])
 
 
-def get_datacenter_metadata(session, datacenter_name):
-    datacenter = session.query(
-        models.Datacenter
+def _get_metadata_cache_version(datacenter_name):
+    return (
+        METADATA_CACHE_GENERATION,
+        METADATA_CACHE_VERSIONS.get(datacenter_name, 0)
+    )
+
+
+class MeasurementMatcher(object):
+    """Resolve raw measurement names to measurements by their patterns.
+
+    All patterns are compiled into one alternation, so a name is
+    resolved in one pass to the first measurement whose pattern matches
+    it. Resolved names are memoized.
+    """
+    MAX_CACHED_NAMES = 100000
+
+    def __init__(self, measurement_patterns):
+        self.measurements = []
+        self.patterns = collections.OrderedDict()
+        alternatives = []
+        for measurement, pattern in six.iteritems(measurement_patterns):
+            group = '_m%d' % len(self.measurements)
+            self.measurements.append(measurement)
+            self.patterns[measurement] = re.compile(r'^%s$' % pattern)
+            alternatives.append('(?P<%s>%s)' % (group, pattern))
+        self.groups = dict(zip(
+            ['_m%d' % index for index in range(len(self.measurements))],
+            self.measurements
+        ))
+        self.pattern = None
+        if alternatives:
+            self.pattern = re.compile(r'^(?:%s)$' % '|'.join(alternatives))
+        self.names = {}
+
+    def _match(self, name):
+        if self.pattern is None:
+            return None
+        matched = self.pattern.match(name)
+        if not matched:
+            return None
+        return self.groups[matched.lastgroup]
+
+    def match(self, name, measurements=None):
+        """Get the measurement of name, None if no pattern matches.
+
+        Only patterns of measurements are tried if it is given.
+        """
+        if name in self.names:
+            measurement = self.names[name]
+        else:
+            measurement = self._match(name)
+            if len(self.names) < self.MAX_CACHED_NAMES:
+                self.names[name] = measurement
+        if (
+            measurements is None or measurement is None or
+            measurement in measurements
+        ):
+            return measurement
+        for measurement, pattern in six.iteritems(self.patterns):
+            if measurement in measurements and pattern.match(name):
+                return measurement
+        return None
+
+
+def build_metadata_index(datacenter_metadata):
+    """Build lookup indexes of datacenter metadata.
+
+    For each device type, measurement_devices maps a measurement to the
+    set of its devices, device_measurements maps a device to the set of
+    its measurements and measurement_matcher resolves raw measurement
+    names by measurement patterns.
+    """
+    metadata_index = {}
+    for device_type, device_type_metadata in six.iteritems(
+        datacenter_metadata['device_types']
+    ):
+        measurement_devices = {}
+        device_measurements = {}
+        measurement_patterns = {}
+        for measurement, measurement_metadata in six.iteritems(
+            device_type_metadata
+        ):
+            devices = frozenset(measurement_metadata['devices'])
+            measurement_devices[measurement] = devices
+            for device in devices:
+                device_measurements.setdefault(device, set()).add(
+                    measurement
+                )
+            pattern = measurement_metadata['attribute']['pattern']
+            if pattern:
+                measurement_patterns[measurement] = pattern
+        metadata_index[device_type] = {
+            'measurement_devices': measurement_devices,
+            'device_measurements': device_measurements,
+            'measurement_matcher': MeasurementMatcher(measurement_patterns)
+        }
+    return metadata_index
+
+
+def _get_cached_datacenter_metadata(datacenter_name):
+    """Get cached (datacenter metadata, metadata index)."""
+    if not CONF.timeseries_metadata_cache:
+        return None
+    cached = METADATA_CACHE.get(datacenter_name)
+    if not cached:
+        return None
+    version, expire_at, datacenter_metadata, metadata_index = cached
+    if version != _get_metadata_cache_version(datacenter_name):
+        return None
+    if expire_at is not None and expire_at < time.time():
+        return None
+    return datacenter_metadata, metadata_index
+
+
+def _set_cached_datacenter_metadata(
+    datacenter_name, version, datacenter_metadata, metadata_index
+):
+    if not CONF.timeseries_metadata_cache:
+        return
+    expire = CONF.timeseries_metadata_cache_expire
+    if expire:
+        expire_at = time.time() + expire
+    else:
+        expire_at = None
+    with METADATA_CACHE_LOCK:
+        if version == _get_metadata_cache_version(datacenter_name):
+            METADATA_CACHE[datacenter_name] = (
+                version, expire_at, datacenter_metadata, metadata_index
+            )
+
+
+def invalidate_metadata_cache(datacenter_name=None):
+    """Bump the cached metadata version.
+
+    Invalidate the given datacenter, or all datacenters when
+    datacenter_name is None.
+    """
+    global METADATA_CACHE_GENERATION
+    logger.debug('invalidate datacenter %s metadata cache', datacenter_name)
+    with METADATA_CACHE_LOCK:
+        if datacenter_name is None:
+            METADATA_CACHE_GENERATION += 1
+            METADATA_CACHE.clear()
+        else:
+            METADATA_CACHE_VERSIONS[datacenter_name] = (
+                METADATA_CACHE_VERSIONS.get(datacenter_name, 0) + 1
+            )
+            METADATA_CACHE.pop(datacenter_name, None)
+
+
+def _load_datacenter_metadata(session, datacenter_name):
+    cached = _get_cached_datacenter_metadata(datacenter_name)
+    if cached is not None:
+        logger.debug('datacenter %s metadata is cached', datacenter_name)
+        return cached
+    version = _get_metadata_cache_version(datacenter_name)
+    datacenter = _get_datacenter_query(
+        session
     ).filter_by(name=datacenter_name).first()
     if not datacenter:
         raise exception.RecordNotExists(
@@ -347,7 +715,29 @@ def get_datacenter_metadata(session, datacenter_name):
         'datacenter %s metadata: %s',
         datacenter_name, datacenter_metadata
     )
-    return datacenter_metadata
+    metadata_index = build_metadata_index(datacenter_metadata)
+    metadata_index['rollup_starts'] = _get_rollup_starts(datacenter)
+    _set_cached_datacenter_metadata(
+        datacenter_name, version, datacenter_metadata, metadata_index
+    )
+    return datacenter_metadata, metadata_index
+
+
+def get_datacenter_metadata(session, datacenter_name):
+    """Get datacenter metadata.
+
+    The result is cached per datacenter and shared between callers,
+    so it should be deep copied before being modified.
+    """
+    return _load_datacenter_metadata(session, datacenter_name)[0]
+
+
+def get_datacenter_metadata_index(session, datacenter_name):
+    """Get the indexes of datacenter metadata.
+
+    It is built by build_metadata_index and cached with the metadata.
+    """
+    return _load_datacenter_metadata(session, datacenter_name)[1]
 
 
 def set_datacenter_metadata(session, datacenter_name, data):
@@ -363,6 +753,7 @@ def set_datacenter_metadata(session, datacenter_name, data):
             'datacener %s does not exist' % datacenter_name
         )
     _set_datacenter_metadata(datacenter, data)
+    invalidate_metadata_cache(datacenter_name)
 
 
 def get_datacenter_metadata_from_metadata(metadata, datacenter_name):
@@ -371,10 +762,10 @@ def get_datacenter_metadata_from_metadata(metadata, datacenter_name):
 
 def get_metadata(session):
     result = {}
-    datacenters = session.query(models.Datacenter)
-    for datacenter in datacenters:
-        result[datacenter.name] = (
-            _get_datacenter_metadata(datacenter)
+    datacenters = session.query(models.Datacenter.name)
+    for datacenter_name, in datacenters:
+        result[datacenter_name] = get_datacenter_metadata(
+            session, datacenter_name
         )
     return result
 
@@ -384,6 +775,7 @@ def set_metadata(session, data):
     for datacenter in datacenters:
         if datacenter.name in data:
             _set_datacenter_metadata(datacenter, data[datacenter.name])
+    invalidate_metadata_cache()
 
 
 TIMESERIES_VALUE_CONVERTERS = {
@@ -393,19 +785,409 @@ TIMESERIES_VALUE_CONVERTERS = {
 }
 
 
-def update_timeseries_metadata(
-    session, datacenter,
+def merge_moments(moments):
+    """Merge (count, mean, m2) moments of disjoint samples.
+
+    m2 is the sum of squared differences from the mean. It is the
+    pairwise update of Welford's algorithm by Chan et al.
+    """
+    count, mean, m2 = 0, 0.0, 0.0
+    for other_count, other_mean, other_m2 in moments:
+        if not other_count:
+            continue
+        total = count + other_count
+        delta = other_mean - mean
+        mean += delta * other_count / total
+        m2 += other_m2 + delta * delta * count * other_count / total
+        count = total
+    return count, mean, m2
+
+
+def get_tag_regex(values):
+    """Get the influx regex matching exactly one of tag values."""
+    return '/^(%s)$/' % '|'.join([
+        re.escape(value).replace('/', '\\/') for value in values
+    ])
+
+
+def get_statistics_queries(
+    datacenter, device_type, measurement, devices,
+    starttime, endtime, time_interval,
+    group_by_device=False, differentiation_starttime=None
+):
+    """Get queries of the moments of values and their differentiations.
+
+    Values are averaged per device in time_interval buckets first. Each
+    query returns count, mean and (sample) deviation of the buckets,
+    per device if group_by_device. The differentiations start from
+    differentiation_starttime if it is given.
+    """
+    device_where = ''
+    if devices:
+        device_where = ' and device =~ %s' % get_tag_regex(devices)
+    where = get_where(
+        starttime=starttime, endtime=endtime,
+        datacenter=datacenter, device_type=device_type
+    ) + device_where
+    differentiation_where = get_where(
+        starttime=differentiation_starttime or starttime, endtime=endtime,
+        datacenter=datacenter, device_type=device_type
+    ) + device_where
+    group_by = 'group by time(%ss), device' % time_interval
+    statistics = (
+        'select count(value) as count, mean(value) as mean, '
+        'stddev(value) as deviation from (%s)'
+    )
+    if group_by_device:
+        statistics += ' group by device'
+    return [
+        statistics % (
+            'select mean(value) as value from %s where %s %s' % (
+                measurement, where, group_by
+            )
+        ),
+        statistics % (
+            'select difference(mean(value)) as value '
+            'from %s where %s %s' % (
+                measurement, differentiation_where, group_by
+            )
+        )
+    ]
+
+
+def _get_statistics_rows(result, dataframe=False):
+    if dataframe:
+        for key, frame in six.iteritems(result):
+            device = None
+            if isinstance(key, tuple):
+                device = dict(key[1]).get('device')
+            for count, mean, deviation in frame[
+                ['count', 'mean', 'deviation']
+            ].values.tolist():
+                yield device, count, mean, deviation
+    else:
+        for series in result.raw.get('series', []):
+            device = (series.get('tags') or {}).get('device')
+            columns = series['columns']
+            for row in series.get('values') or []:
+                row = dict(zip(columns, row))
+                yield device, row['count'], row['mean'], row['deviation']
+
+
+def _get_statistics_moments(result, dataframe=False, by_device=False):
+    """Get (count, mean, m2) moments of a statistics query result.
+
+    Return {device: moments} if by_device.
+    """
+    device_moments = {}
+    for device, count, mean, deviation in _get_statistics_rows(
+        result, dataframe
+    ):
+        if not count or mean is None or np.isnan(mean):
+            continue
+        if deviation is None or np.isnan(deviation):
+            deviation = 0.0
+        if not by_device:
+            device = None
+        device_moments.setdefault(device, []).append(
+            (int(count), mean, deviation * deviation * (count - 1))
+        )
+    device_moments = dict([
+        (device, merge_moments(moments))
+        for device, moments in six.iteritems(device_moments)
+    ])
+    if by_device:
+        return device_moments
+    return device_moments.get(None, (0, 0.0, 0.0))
+
+
+def _get_moments_statistics(moments, unit_converter=None, difference=False):
+    count, mean, m2 = moments
+    assert count
+    deviation = np.sqrt(m2 / count)
+    if unit_converter:
+        scale = unit_converter(1.0) - unit_converter(0.0)
+        if difference:
+            mean = mean * scale
+        else:
+            mean = unit_converter(mean)
+        deviation = deviation * abs(scale)
+    return mean, deviation
+
+
+def _update_timeseries_statistics_in_influx(
+    session, datacenter, datacenter_metadata,
     starttime, endtime,
     device_type_units={}
 ):
+    dataframe = database.is_dataframe_session(session)
+    time_interval = datacenter_metadata['time_interval']
     with database.session() as db_session:
-        datacenter_metadata = get_datacenter_metadata(
-            db_session, datacenter
+        (
+            device_type_mapping, _, device_type_patterns,
+            device_type_unit_converters
+        ) = get_device_type_infos(
+            db_session, datacenter, {}, device_type_units
         )
-    logger.debug(
-        'update_timeseries_metadata original metadata: %s',
-        datacenter_metadata
+    for device_type, measurement_mapping in six.iteritems(
+        device_type_mapping
+    ):
+        measurement_patterns = device_type_patterns.get(device_type) or {}
+        measurement_unit_converters = device_type_unit_converters.get(
+            device_type
+        ) or {}
+        queries = []
+        measurements = []
+        for measurement, devices in six.iteritems(measurement_mapping):
+            measurement_pattern = measurement_patterns.get(measurement)
+            if measurement_pattern:
+                pattern = r'/^%s$/' % measurement_pattern
+            else:
+                pattern = measurement
+            queries.extend(get_statistics_queries(
+                datacenter, device_type, pattern, devices,
+                starttime, endtime, time_interval,
+                group_by_device=True
+            ))
+            measurements.append(measurement)
+        results = query_timeseries(session, queries)
+        for index, measurement in enumerate(measurements):
+            unit_converter = None
+            if measurement in measurement_unit_converters:
+                unit_converter = get_unit_converter(tuple(reversed(
+                    measurement_unit_converters[measurement]
+                )))
+            device_moments = _get_statistics_moments(
+                results[2 * index], dataframe, by_device=True
+            )
+            device_differentiation_moments = _get_statistics_moments(
+                results[2 * index + 1], dataframe, by_device=True
+            )
+            measurement_metadata = datacenter_metadata['device_types'][
+                device_type
+            ][measurement]
+            device_statistics = measurement_metadata['device_statistics']
+            for device, moments in six.iteritems(device_moments):
+                statistics = device_statistics.setdefault(device, {})
+                (
+                    statistics['mean'], statistics['deviation']
+                ) = _get_moments_statistics(moments, unit_converter)
+                if device in device_differentiation_moments:
+                    (
+                        statistics['differentiation_mean'],
+                        statistics['differentiation_deviation']
+                    ) = _get_moments_statistics(
+                        device_differentiation_moments[device],
+                        unit_converter, difference=True
+                    )
+            mean, deviation = _get_moments_statistics(
+                merge_moments(device_moments.values()), unit_converter
+            )
+            (
+                differentiation_mean, differentiation_deviation
+            ) = _get_moments_statistics(
+                merge_moments(device_differentiation_moments.values()),
+                unit_converter, difference=True
+            )
+            attribute = measurement_metadata['attribute']
+            attribute['mean'] = mean
+            attribute['deviation'] = deviation
+            attribute['differentiation_mean'] = differentiation_mean
+            attribute['differentiation_deviation'] = (
+                differentiation_deviation
+            )
+
+
+def _get_record_moments(record, prefix='moments'):
+    count = getattr(record, '%s_count' % prefix) or 0
+    if not count:
+        return 0, 0.0, 0.0
+    return (
+        count, getattr(record, '%s_sum' % prefix) / count,
+        getattr(record, '%s_m2' % prefix) or 0.0
     )
+
+
+def _set_record_moments(record, moments, prefix='moments'):
+    count, mean, m2 = moments
+    setattr(record, '%s_count' % prefix, count)
+    setattr(record, '%s_sum' % prefix, mean * count)
+    setattr(record, '%s_m2' % prefix, m2)
+
+
+def _fold_record_moments(record, moments, differentiation_moments):
+    _set_record_moments(record, merge_moments([
+        _get_record_moments(record), moments or (0, 0.0, 0.0)
+    ]))
+    _set_record_moments(record, merge_moments([
+        _get_record_moments(record, 'differentiation_moments'),
+        differentiation_moments or (0, 0.0, 0.0)
+    ]), 'differentiation_moments')
+
+
+def _reset_record_moments(record):
+    _set_record_moments(record, (0, 0.0, 0.0))
+    _set_record_moments(record, (0, 0.0, 0.0), 'differentiation_moments')
+    record.moments_watermark = None
+
+
+def _set_record_statistics(record, unit_converter=None):
+    moments = _get_record_moments(record)
+    if moments[0]:
+        record.mean, record.deviation = _get_moments_statistics(
+            moments, unit_converter
+        )
+    moments = _get_record_moments(record, 'differentiation_moments')
+    if moments[0]:
+        (
+            record.differentiation_mean, record.differentiation_deviation
+        ) = _get_moments_statistics(
+            moments, unit_converter, difference=True
+        )
+
+
+def _update_timeseries_moments(
+    session, datacenter,
+    starttime, endtime,
+    device_type_units={}
+):
+    """Fold timeseries after the moments watermark into the moments.
+
+    The moments of each attribute and each attribute data (device) in
+    the sql database are merged with the moments of the time range from
+    the watermark (or starttime for the first time) to endtime, which is
+    aligned down to time_interval so no bucket is counted twice. An
+    attribute is rescanned from starttime when its devices do not share
+    its watermark, or when an absolute starttime or endtime is before
+    the watermark, so points backfilled before the watermark are
+    counted. A relative or empty starttime continues from the watermark.
+    """
+    dataframe = database.is_dataframe_session(session)
+    with database.session() as db_session:
+        datacenter_record = _get_datacenter_query(db_session).filter_by(
+            name=datacenter
+        ).first()
+        if not datacenter_record:
+            raise exception.RecordNotExists(
+                'datacener %s does not exist' % datacenter
+            )
+        time_interval = datacenter_record.time_interval
+        end_seconds = _get_epoch_seconds(endtime)
+        if end_seconds is None:
+            end_seconds = time.time()
+        end_seconds = long(end_seconds) // time_interval * time_interval
+        endtime = _get_epoch_timestamp(end_seconds)
+        start_seconds = _get_epoch_seconds(starttime)
+        watermark = (
+            EPOCH + datetime.timedelta(seconds=end_seconds)
+        ).replace(tzinfo=None)
+        for device_type, relationships in six.iteritems(
+            DEVICE_TYPE_METADATA_RELATIONSHIPS
+        ):
+            attributes_name, attribute_data_name, device_name = (
+                relationships
+            )
+            measurement_units = device_type_units.get(device_type) or {}
+            queries = []
+            plans = []
+            for attribute in getattr(datacenter_record, attributes_name):
+                if not isinstance(attribute, models.MomentsMixin):
+                    continue
+                attribute_data = dict([
+                    (getattr(data, device_name).name, data)
+                    for data in getattr(attribute, attribute_data_name)
+                ])
+                attribute_watermark = attribute.moments_watermark
+                if attribute_watermark and any([
+                    data.moments_watermark != attribute_watermark
+                    for data in six.itervalues(attribute_data)
+                ]):
+                    logger.debug(
+                        'rescan %s %s moments for changed devices',
+                        device_type, attribute.name
+                    )
+                    attribute_watermark = None
+                elif attribute_watermark and (
+                    attribute_watermark > watermark or (
+                        start_seconds is not None and
+                        start_seconds < _get_epoch_seconds(
+                            attribute_watermark
+                        )
+                    )
+                ):
+                    logger.debug(
+                        'rescan %s %s moments from %s before watermark %s',
+                        device_type, attribute.name, starttime,
+                        attribute_watermark
+                    )
+                    attribute_watermark = None
+                if attribute_watermark is None:
+                    _reset_record_moments(attribute)
+                    for data in six.itervalues(attribute_data):
+                        _reset_record_moments(data)
+                    scan_starttime = starttime
+                    differentiation_starttime = None
+                elif attribute_watermark >= watermark:
+                    continue
+                else:
+                    watermark_seconds = _get_epoch_seconds(
+                        attribute_watermark
+                    )
+                    scan_starttime = _get_epoch_timestamp(watermark_seconds)
+                    differentiation_starttime = _get_epoch_timestamp(
+                        watermark_seconds - time_interval
+                    )
+                if attribute.measurement_pattern:
+                    measurement = r'/^%s$/' % attribute.measurement_pattern
+                else:
+                    measurement = attribute.name
+                queries.extend(get_statistics_queries(
+                    datacenter, device_type, measurement,
+                    sorted(attribute_data.keys()),
+                    scan_starttime, endtime, time_interval,
+                    group_by_device=True,
+                    differentiation_starttime=differentiation_starttime
+                ))
+                plans.append((attribute, attribute_data))
+            results = query_timeseries(session, queries)
+            for index, (attribute, attribute_data) in enumerate(plans):
+                device_moments = _get_statistics_moments(
+                    results[2 * index], dataframe, by_device=True
+                )
+                device_differentiation_moments = _get_statistics_moments(
+                    results[2 * index + 1], dataframe, by_device=True
+                )
+                unit_converter = None
+                if measurement_units.get(attribute.name):
+                    unit_converter = get_unit_converter((
+                        attribute.unit, measurement_units[attribute.name]
+                    ))
+                for device, data in six.iteritems(attribute_data):
+                    _fold_record_moments(
+                        data, device_moments.get(device),
+                        device_differentiation_moments.get(device)
+                    )
+                    data.moments_watermark = watermark
+                    _set_record_statistics(data, unit_converter)
+                _fold_record_moments(
+                    attribute,
+                    merge_moments(device_moments.values()),
+                    merge_moments(device_differentiation_moments.values())
+                )
+                attribute.moments_watermark = watermark
+                _set_record_statistics(attribute, unit_converter)
+                logger.debug(
+                    'update %s %s moments to %s',
+                    device_type, attribute.name, watermark
+                )
+    invalidate_metadata_cache(datacenter)
+
+
+def _update_timeseries_statistics_in_pandas(
+    session, datacenter, datacenter_metadata,
+    starttime, endtime,
+    device_type_units={}
+):
     time_interval = datacenter_metadata['time_interval']
     for device_type, device_type_metadata in six.iteritems(
         datacenter_metadata['device_types']
@@ -450,6 +1232,18 @@ def update_timeseries_metadata(
             differentiation_deviation = differentiation_result.std()
             assert not np.isnan(differentiation_mean)
             assert not np.isnan(differentiation_deviation)
+            device_statistics = measurement_metadata['device_statistics']
+            for column in response.columns:
+                device = column[-1]
+                statistics = device_statistics.setdefault(device, {})
+                statistics['mean'] = response[column].values.mean()
+                statistics['deviation'] = response[column].values.std()
+                statistics['differentiation_mean'] = (
+                    differentiation_response[column].values.mean()
+                )
+                statistics['differentiation_deviation'] = (
+                    differentiation_response[column].values.std()
+                )
             measurement_metadata['attribute']['mean'] = mean
             measurement_metadata['attribute']['deviation'] = deviation
             measurement_metadata['attribute']['differentiation_mean'] = (
@@ -458,9 +1252,56 @@ def update_timeseries_metadata(
             measurement_metadata['attribute']['differentiation_deviation'] = (
                 differentiation_deviation
             )
+
+
+def update_timeseries_metadata(
+    session, datacenter,
+    starttime, endtime,
+    device_type_units={},
+    in_influx=None, incremental=None
+):
+    """Update mean and deviation of values and differentiations.
+
+    If incremental (default CONF.timeseries_statistics_incremental,
+    off), only timeseries after the moments watermark are scanned and
+    folded into the moments kept in the sql database, see
+    _update_timeseries_moments for when they are rescanned from
+    starttime. Otherwise if in_influx
+    (default CONF.timeseries_statistics_in_influx), the statistics are
+    computed by influx with one request per device type, else the
+    timeseries are fetched and computed in pandas.
+    """
+    if incremental is None:
+        incremental = CONF.timeseries_statistics_incremental
+    if incremental:
+        return _update_timeseries_moments(
+            session, datacenter, starttime, endtime,
+            device_type_units=device_type_units
+        )
+    if in_influx is None:
+        in_influx = CONF.timeseries_statistics_in_influx
+    with database.session() as db_session:
+        datacenter_metadata = copy.deepcopy(get_datacenter_metadata(
+            db_session, datacenter
+        ))
+    logger.debug(
+        'update_timeseries_metadata original metadata: %s',
+        datacenter_metadata
+    )
+    if in_influx:
+        _update_timeseries_statistics_in_influx(
+            session, datacenter, datacenter_metadata,
+            starttime, endtime, device_type_units=device_type_units
+        )
+    else:
+        _update_timeseries_statistics_in_pandas(
+            session, datacenter, datacenter_metadata,
+            starttime, endtime, device_type_units=device_type_units
+        )
     logger.debug('updated datacenter metadata: %s', datacenter_metadata)
     with database.session() as db_session:
         set_datacenter_metadata(db_session, datacenter, datacenter_metadata)
+    invalidate_metadata_cache(datacenter)
 
 
 def convert_timeseries_value(
@@ -483,6 +1324,50 @@ def convert_timeseries_value(
             return default_value
 
 
+def _to_floats(values):
+    return pd.to_numeric(values, errors='coerce').astype(float)
+
+
+def _to_ints(values):
+    values = pd.to_numeric(values, errors='coerce').dropna()
+    return values.astype(np.int64)
+
+
+def _to_bools(values):
+    return values.astype(bool)
+
+
+TIMESERIES_VALUES_CONVERTERS = {
+    'binary': _to_bools,
+    'continuous': _to_floats,
+    'integer': _to_ints
+}
+
+
+def convert_timeseries_values(values, value_type, raise_exception=False):
+    """Convert a pandas series of values to value_type.
+
+    Values which can not be converted are dropped.
+    """
+    try:
+        if value_type in TIMESERIES_VALUES_CONVERTERS:
+            values = TIMESERIES_VALUES_CONVERTERS[value_type](values)
+        values = values.dropna()
+        if values.dtype == object:
+            values = values.infer_objects()
+        return values
+    except Exception as error:
+        logger.exception(error)
+        logger.error(
+            'failed to convert values to %s: %s',
+            value_type, error
+        )
+        if raise_exception:
+            raise error
+        else:
+            return values.iloc[0:0]
+
+
 def continuous_format(value, base_value):
     return round(value, 2) + (base_value or 0)
 
@@ -524,23 +1409,197 @@ def format_timeseries_value(
             return default_value
 
 
-def get_timestamp(timestamp_str):
-    if not timestamp_str:
-        return None
-    if timestamp_str[0] in ['+', '-']:
-        timestamp_str = 'now()' + timestamp_str
-    if re.match(
-        r'^(now\(\))?\s*[+-]?\s*\d+(u|ms|s|m|h|d|w)'
-        r'(\s*[+-]\s*\d+(u|ms|s|m|h|d|w))*$',
-        timestamp_str
-    ):
-        timestamp_str = re.sub(r'\s*?([+-])\s*?', r' \1 ', timestamp_str)
-    else:
-        timestamp_str = "'%s'" % parser.parse(timestamp_str)
-    return timestamp_str
+def continuous_values_format(values):
+    return values.round(2)
 
 
-def _get_group_by(group_by):
+def binary_values_format(values):
+    return values
+
+
+def int_values_format(values):
+    return values
+
+
+TIMESERIES_VALUES_FORMATTERS = {
+    'binary': binary_values_format,
+    'integer': int_values_format,
+    'continuous': continuous_values_format,
+}
+TIMESERIES_VALUES_AGGREGATORS = {
+    'integer': 'sum',
+    'continuous': 'sum',
+}
+
+
+def format_timeseries_values(values, value_type, raise_exception=False):
+    """Format a pandas series of timeseries values of value_type."""
+    try:
+        if value_type in TIMESERIES_VALUES_FORMATTERS:
+            return TIMESERIES_VALUES_FORMATTERS[value_type](values)
+        return values
+    except Exception as error:
+        logger.exception(error)
+        logger.error(
+            'failed to format values in %s: %s',
+            value_type, error
+        )
+        if raise_exception:
+            raise error
+        else:
+            return values
+
+
+def get_timestamp(timestamp_str):
+    if not timestamp_str:
+        return None
+    if timestamp_str[0] in ['+', '-']:
+        timestamp_str = 'now()' + timestamp_str
+    if re.match(
+        r'^(now\(\))?\s*[+-]?\s*\d+(u|ms|s|m|h|d|w)'
+        r'(\s*[+-]\s*\d+(u|ms|s|m|h|d|w))*$',
+        timestamp_str
+    ):
+        timestamp_str = re.sub(r'\s*?([+-])\s*?', r' \1 ', timestamp_str)
+    else:
+        timestamp_str = "'%s'" % parser.parse(timestamp_str)
+    return timestamp_str
+
+
+def _get_epoch_seconds(timestamp):
+    """Get seconds since epoch of an absolute timestamp.
+
+    Return None for relative timestamps like now() - 1d.
+    """
+    if isinstance(timestamp, datetime.datetime):
+        timestamp_dt = timestamp
+    elif isinstance(timestamp, string_types):
+        try:
+            timestamp_str = get_timestamp(timestamp)
+        except (ValueError, OverflowError):
+            return None
+        if not timestamp_str or not timestamp_str.startswith("'"):
+            return None
+        timestamp_dt = parser.parse(timestamp_str.strip("'"))
+    else:
+        return None
+    if timestamp_dt.tzinfo is None:
+        timestamp_dt = timestamp_dt.replace(tzinfo=tzutc())
+    return (timestamp_dt - EPOCH).total_seconds()
+
+
+def _get_epoch_timestamp(seconds):
+    timestamp_dt = EPOCH + datetime.timedelta(seconds=seconds)
+    return timestamp_dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+INTERVAL_SECONDS = {
+    's': 1,
+    'm': 60,
+    'h': 3600,
+    'd': 86400,
+    'w': 604800
+}
+
+
+def get_interval_seconds(interval):
+    """Get the seconds of an influx duration like 5m."""
+    matched = re.match(r'^\s*(\d+)(s|m|h|d|w)?\s*$', interval)
+    if not matched:
+        raise exception.InvalidParameter('invalid interval %s' % interval)
+    return int(matched.group(1)) * INTERVAL_SECONDS[matched.group(2) or 's']
+
+
+def get_group_by_interval(group_by):
+    """Get the seconds of time(...) in group_by."""
+    if isinstance(group_by, string_types):
+        group_by = [group_by]
+    for item in group_by or []:
+        matched = re.match(r'^\s*time\(\s*(\d+(s|m|h|d|w))\s*\)', item)
+        if matched:
+            return get_interval_seconds(matched.group(1))
+    return None
+
+
+def plan_time_ranges(starttime, endtime, time_interval=None, shards=None):
+    """Split [starttime, endtime) into at most shards sub ranges.
+
+    The boundaries between sub ranges are multiples of time_interval
+    seconds since epoch, the same way influxdb aligns group by time
+    buckets, so no bucket is split across sub ranges. Relative or
+    missing times, or a missing time_interval, are not split.
+    """
+    if shards is None:
+        shards = CONF.timeseries_shards
+    time_ranges = [(starttime, endtime)]
+    if not shards or shards <= 1 or not time_interval:
+        return time_ranges
+    start_seconds = _get_epoch_seconds(starttime)
+    end_seconds = _get_epoch_seconds(endtime)
+    if start_seconds is None or end_seconds is None:
+        logger.debug(
+            'not split relative time range %s %s', starttime, endtime
+        )
+        return time_ranges
+    intervals = int(np.ceil((end_seconds - start_seconds) / time_interval))
+    step = int(np.ceil(float(intervals) / shards)) * time_interval
+    if step <= 0:
+        return time_ranges
+    aligned_seconds = long(start_seconds // time_interval) * time_interval
+    boundaries = []
+    for shard in range(1, shards):
+        boundary = aligned_seconds + shard * step
+        if start_seconds < boundary < end_seconds:
+            boundaries.append(_get_epoch_timestamp(boundary))
+    boundaries = [starttime] + boundaries + [endtime]
+    time_ranges = list(zip(boundaries[:-1], boundaries[1:]))
+    logger.debug(
+        'plan time range %s %s into %s', starttime, endtime, time_ranges
+    )
+    return time_ranges
+
+
+def get_split_interval(data):
+    """Get the group by time interval to split the time range of data.
+
+    Return None if the results of sub ranges can not be concatenated:
+    there is no group by time(), so aggregations are over the whole
+    range, or limit, offset or fill(previous/linear) depend on the
+    points before in the range.
+    """
+    if data.get('limit') or data.get('offset'):
+        return None
+    fill = data.get('fill')
+    if fill and str(fill).strip().lower() in ['previous', 'linear']:
+        return None
+    return get_group_by_interval(data.get('group_by'))
+
+
+def get_window_interval(data):
+    """Get the interval to align the windows of data to.
+
+    Unlike get_split_interval, raw points without aggregation are
+    split at any second as well. Return None if data can only be read
+    in one window: it is a raw query, it is aggregated over the whole
+    range or its points depend on the points before in the range, or
+    it is ordered by descending time.
+    """
+    if data.get('query'):
+        return None
+    order_by = data.get('order_by') or []
+    if isinstance(order_by, string_types):
+        order_by = [order_by]
+    if any('desc' in str(item).lower() for item in order_by):
+        return None
+    split_interval = get_split_interval(data)
+    if split_interval:
+        return split_interval
+    if data.get('limit') or data.get('offset') or data.get('aggregation'):
+        return None
+    return 1
+
+
+def _get_group_by(group_by):
     return ', '.join(group_by)
 
 
@@ -578,7 +1637,8 @@ def get_where(
 
 def get_query(
     measurement, where=None, group_by=None, order_by=None,
-    fill=None, aggregation=None, limit=None, offset=None
+    fill=None, aggregation=None, limit=None, offset=None,
+    value=None
 ):
     if where:
         where = get_where(**where)
@@ -586,7 +1646,9 @@ def get_query(
         where_clause = ' where %s' % where
     else:
         where_clause = ''
-    if aggregation:
+    if value:
+        value = '%s as value' % value
+    elif aggregation:
         value = '%s(value) as value' % aggregation
     else:
         value = 'value'
@@ -640,9 +1702,367 @@ def get_timestamp_formatter(time_precision, dataframe=False):
         return long
 
 
+def _guess_datetime_format(timestamps):
+    if guess_datetime_format is None or not len(timestamps):
+        return None
+    if not isinstance(timestamps[0], string_types):
+        return None
+    return guess_datetime_format(timestamps[0])
+
+
+def _to_datetimes(timestamps, unit=None):
+    """Convert timestamps to a DatetimeIndex in bulk.
+
+    The format of timestamp strings is guessed from the first one and
+    repeated strings are converted once. Timestamps in mixed formats
+    fall back to parse each distinct timestamp. Timestamps with mixed
+    utc offsets (e.g. across a DST change) are converted to UTC.
+    """
+    if isinstance(timestamps, pd.DatetimeIndex):
+        return timestamps
+    if unit:
+        return pd.DatetimeIndex(
+            pd.to_datetime(timestamps, unit=unit, cache=True)
+        )
+    timestamps = pd.Index(timestamps)
+    datetime_format = _guess_datetime_format(timestamps)
+    for utc in [False, True]:
+        try:
+            return pd.DatetimeIndex(pd.to_datetime(
+                timestamps, format=datetime_format, cache=True, utc=utc
+            ))
+        except (ValueError, TypeError):
+            pass
+    # timestamps in mixed formats.
+    codes, uniques = pd.factorize(timestamps)
+    parsed = [parser.parse(timestamp) for timestamp in uniques]
+    try:
+        parsed = pd.DatetimeIndex(pd.to_datetime(parsed))
+    except (ValueError, TypeError):
+        # mixed utc offsets.
+        parsed = pd.DatetimeIndex(pd.to_datetime(parsed, utc=True))
+    return parsed[codes]
+
+
+def _to_longs(timestamps):
+    return pd.Index(timestamps).astype(np.int64)
+
+
+def _to_strs(timestamps):
+    return pd.Index(timestamps).astype(str)
+
+
+def get_timestamps_converter(time_precision, dataframe=False):
+    """Get the whole index version of get_timestamp_converter."""
+    if not time_precision:
+        return _to_datetimes
+    if dataframe:
+        return functools.partial(_to_datetimes, unit=time_precision)
+    else:
+        return _to_longs
+
+
+def get_timestamps_formatter(time_precision, dataframe=False):
+    """Get the whole index version of get_timestamp_formatter."""
+    if dataframe:
+        return _to_strs
+    if not time_precision:
+        return _to_strs
+    else:
+        return _to_longs
+
+
+# (field, aggregation to merge the field of finer buckets)
+ROLLUP_FIELDS = [
+    ('sum', 'sum'),
+    ('count', 'sum'),
+    ('min', 'min'),
+    ('max', 'max'),
+    ('first', 'first'),
+    ('last', 'last')
+]
+ROLLUP_AGGREGATIONS = dict([
+    (field, '%s("%s")' % (aggregation, field))
+    for field, aggregation in ROLLUP_FIELDS
+])
+ROLLUP_AGGREGATIONS['mean'] = 'sum("sum") / sum("count")'
+ROLLUP_MEASUREMENT_TYPES = ['continuous', 'integer']
+
+
+def get_rollup_intervals():
+    return sorted([
+        get_interval_seconds(interval)
+        for interval in CONF.timeseries_rollup_intervals
+    ])
+
+
+def get_rollup_retention_policy(interval):
+    return 'rollup_%ss' % interval
+
+
+def _get_rollup_starts(datacenter):
+    return dict([
+        (int(interval), start)
+        for interval, start in six.iteritems(datacenter.rollups or {})
+    ])
+
+
+def get_rollup_starts(datacenter_name):
+    """Get {tier interval: epoch seconds} rollup tiers are complete from.
+
+    A tier is only read for time ranges starting at or after its start,
+    which create_timeseries_rollups records and writes into rolled up
+    intervals move forward. It is cached with the datacenter metadata.
+    """
+    with database.session(exception_when_in_session=False) as session:
+        metadata_index = get_datacenter_metadata_index(
+            session, datacenter_name
+        )
+        return metadata_index['rollup_starts']
+
+
+def _set_rollup_starts(session, datacenter, rollup_starts):
+    datacenter.rollups = dict([
+        (str(interval), start)
+        for interval, start in six.iteritems(rollup_starts)
+    ])
+    session.flush()
+    invalidate_metadata_cache(datacenter.name)
+
+
+def get_rollup_interval(
+    where, group_by, aggregation, measurement_type=None,
+    rollup_starts=None
+):
+    """Get the coarsest rollup tier interval a query can read from.
+
+    The tier interval should divide the group by time interval and
+    both ends of the absolute time range, which should end an interval
+    before now so the continuous query has rolled it up, and start at
+    or after the start of the tier in rollup_starts. Return None if
+    the query should read the raw timeseries.
+    """
+    if not CONF.timeseries_rollup:
+        return None
+    if measurement_type not in ROLLUP_MEASUREMENT_TYPES:
+        return None
+    if aggregation not in ROLLUP_AGGREGATIONS:
+        return None
+    group_by_interval = get_group_by_interval(group_by)
+    if not group_by_interval:
+        return None
+    starttime = where.get('starttime')
+    endtime = where.get('endtime')
+    start_seconds = _get_epoch_seconds(starttime)
+    end_seconds = _get_epoch_seconds(endtime)
+    if start_seconds is None or end_seconds is None:
+        return None
+    rollup_starts = rollup_starts or {}
+    for interval in reversed(get_rollup_intervals()):
+        if group_by_interval % interval:
+            continue
+        rollup_start = rollup_starts.get(interval)
+        if rollup_start is None or start_seconds < rollup_start:
+            continue
+        if start_seconds % interval or end_seconds % interval:
+            continue
+        if not is_past_time_range(starttime, endtime, margin=interval):
+            continue
+        return interval
+    return None
+
+
+def get_rollup_measurements(session):
+    """Get measurements of all datacenters to roll up."""
+    measurements = set()
+    datacenters = session.query(models.Datacenter.name)
+    for datacenter, in datacenters:
+        datacenter_metadata = get_datacenter_metadata(session, datacenter)
+        for device_type, device_type_metadata in six.iteritems(
+            datacenter_metadata['device_types']
+        ):
+            for measurement, measurement_metadata in six.iteritems(
+                device_type_metadata
+            ):
+                attribute = measurement_metadata['attribute']
+                if attribute['type'] not in ROLLUP_MEASUREMENT_TYPES:
+                    continue
+                if attribute['pattern']:
+                    measurements.add(r'/^%s$/' % attribute['pattern'])
+                else:
+                    measurements.add(measurement)
+    return sorted(measurements)
+
+
+def get_rollup_select(measurement, interval, source_interval=None):
+    """Get the select into statement of a rollup tier.
+
+    It aggregates the raw timeseries of measurement, or the rollup tier
+    of source_interval, in interval buckets keeping all tags.
+    """
+    if source_interval:
+        fields = [
+            '%s("%s") as %s' % (aggregation, field, field)
+            for field, aggregation in ROLLUP_FIELDS
+        ]
+        measurement = '"%s".%s' % (
+            get_rollup_retention_policy(source_interval), measurement
+        )
+    else:
+        fields = [
+            '%s(value) as %s' % (field, field)
+            for field, _ in ROLLUP_FIELDS
+        ]
+    return 'select %s into "%s".:MEASUREMENT from %s' % (
+        ', '.join(fields), get_rollup_retention_policy(interval),
+        measurement
+    )
+
+
+def _get_rollup_query_name(measurement, interval):
+    return '%s_%s' % (
+        get_rollup_retention_policy(interval),
+        re.sub(r'\W+', '_', measurement).strip('_')
+    )
+
+
+def execute_timeseries_statements(session, statements):
+    """Run statements which change influx as one request."""
+    if not statements:
+        return []
+    logger.debug('execute %s statements in one request', len(statements))
+    response = session.request(
+        url='query', method='POST', params={
+            'q': '; '.join(statements),
+            'db': session._database
+        }, expected_response_code=200
+    )
+    results = response.json().get('results', [])
+    for result in results:
+        if 'error' in result:
+            raise exception.InvalidResponse(result['error'])
+    return results
+
+
+def _get_rollup_query_names(session):
+    response = session.request(
+        url='query', method='GET', params={
+            'q': 'show continuous queries'
+        }, expected_response_code=200
+    )
+    names = []
+    for result in response.json().get('results', []):
+        for series in result.get('series', []):
+            if series.get('name') != session._database:
+                continue
+            for row in series.get('values') or []:
+                if row[0].startswith('rollup_'):
+                    names.append(row[0])
+    return names
+
+
+def drop_timeseries_rollups(session):
+    """Drop continuous queries and retention policies of rollup tiers."""
+    with database.session() as db_session:
+        for datacenter in db_session.query(models.Datacenter):
+            _set_rollup_starts(db_session, datacenter, {})
+    statements = [
+        'drop continuous query "%s" on "%s"' % (name, session._database)
+        for name in _get_rollup_query_names(session)
+    ]
+    statements.extend([
+        'drop retention policy "%s" on "%s"' % (
+            get_rollup_retention_policy(interval), session._database
+        )
+        for interval in get_rollup_intervals()
+    ])
+    execute_timeseries_statements(session, statements)
+
+
+def create_timeseries_rollups(session, starttime=None, endtime=None):
+    """Create rollup tiers of CONF.timeseries_rollup_intervals.
+
+    Each tier is a retention policy filled by one continuous query per
+    continuous or integer measurement. Existing rollup continuous
+    queries are replaced, so it should run again after measurements
+    are added. If starttime is given, [starttime, endtime) is rolled up
+    as well, coarser tiers from finer ones.
+
+    Each tier is recorded complete from the first interval its
+    continuous query rolls up, or from the first whole interval after
+    an absolute starttime if the backfill reaches that interval.
+    Queries before it read the raw timeseries.
+    """
+    with database.session() as db_session:
+        measurements = get_rollup_measurements(db_session)
+    database_name = session._database
+    statements = [
+        'drop continuous query "%s" on "%s"' % (name, database_name)
+        for name in _get_rollup_query_names(session)
+    ]
+    intervals = get_rollup_intervals()
+    for index, interval in enumerate(intervals):
+        statements.append(
+            'create retention policy "%s" on "%s" '
+            'duration INF replication 1' % (
+                get_rollup_retention_policy(interval), database_name
+            )
+        )
+        group_by = 'group by time(%ss), *' % interval
+        source_interval = None
+        if index and interval % intervals[index - 1] == 0:
+            source_interval = intervals[index - 1]
+        for measurement in measurements:
+            statements.append(
+                'create continuous query "%s" on "%s" begin %s %s end' % (
+                    _get_rollup_query_name(measurement, interval),
+                    database_name,
+                    get_rollup_select(measurement, interval), group_by
+                )
+            )
+            if starttime:
+                statements.append('%s where %s %s' % (
+                    get_rollup_select(
+                        measurement, interval, source_interval
+                    ),
+                    get_where(starttime=starttime, endtime=endtime),
+                    group_by
+                ))
+    logger.debug(
+        'create rollups of %s measurements in %s tiers',
+        len(measurements), len(intervals)
+    )
+    execute_timeseries_statements(session, statements)
+    now = time.time()
+    start_seconds = _get_epoch_seconds(starttime)
+    end_seconds = _get_epoch_seconds(endtime)
+    rollup_starts = {}
+    for interval in intervals:
+        rollup_start = now // interval * interval
+        if start_seconds is not None and (
+            not endtime or
+            end_seconds is not None and end_seconds >= rollup_start
+        ):
+            rollup_start = min(
+                rollup_start, -(-start_seconds // interval) * interval
+            )
+        rollup_starts[interval] = rollup_start
+    logger.debug('rollup tiers start from %s', rollup_starts)
+    with database.session() as db_session:
+        for datacenter in db_session.query(models.Datacenter):
+            _set_rollup_starts(db_session, datacenter, rollup_starts)
+
+
 def get_query_from_data(
-    datacenter, device_type, measurement, data
+    datacenter, device_type, measurement, data,
+    measurement_type=None, rollup_starts=None
 ):
+    """Get the query of a measurement of device_type.
+
+    Aggregated queries read from the coarsest rollup tier which gives
+    the same result if CONF.timeseries_rollup. rollup_starts are
+    loaded by get_rollup_starts if not given.
+    """
     query = data.get('query')
     where = data.get('where') or {}
     where['device_type'] = device_type
@@ -664,11 +2084,29 @@ def get_query_from_data(
     if offset:
         offset = int(offset)
     if not query:
+        value = None
+        if (
+            rollup_starts is None and CONF.timeseries_rollup and
+            aggregation in ROLLUP_AGGREGATIONS
+        ):
+            rollup_starts = get_rollup_starts(datacenter)
+        rollup_interval = get_rollup_interval(
+            where, group_by, aggregation, measurement_type,
+            rollup_starts=rollup_starts
+        )
+        if rollup_interval:
+            logger.debug(
+                'read %s from rollup tier %ss', measurement, rollup_interval
+            )
+            measurement = '"%s".%s' % (
+                get_rollup_retention_policy(rollup_interval), measurement
+            )
+            value = ROLLUP_AGGREGATIONS[aggregation]
         query = get_query(
             measurement, where=where,
             group_by=group_by, order_by=order_by,
             fill=fill, aggregation=aggregation, limit=limit,
-            offset=offset
+            offset=offset, value=value
         )
     logger.debug(
         'timeseries %s %s query: %s',
@@ -680,14 +2118,21 @@ def get_query_from_data(
 def get_device_type_mapping(
     device_types,
     datacenter_metadata,
-    raise_exception=True
+    raise_exception=True,
+    metadata_index=None
 ):
+    """Get {device_type: {measurement: devices}} of device_types.
+
+    metadata_index is built from datacenter_metadata if not given.
+    """
     logger.debug(
         'get_device_type_mapping device_types %s '
         'datacenter_metadata %s raise exception %s',
         device_types, datacenter_metadata,
         raise_exception
     )
+    if metadata_index is None:
+        metadata_index = build_metadata_index(datacenter_metadata)
     device_type_mapping = {}
     device_type_measurements = {}
     if not device_types:
@@ -742,12 +2187,18 @@ def get_device_type_mapping(
                 continue
             measurement_metadata = device_type_metadata[measurement]
             if not devices:
-                devices = measurement_metadata['devices']
+                measurement_mapping[measurement] = list(
+                    measurement_metadata['devices']
+                )
+                continue
             elif isinstance(devices, string_types):
                 devices = [devices]
+            measurement_devices = metadata_index[device_type][
+                'measurement_devices'
+            ][measurement]
             real_devices = []
             for device in devices:
-                if device not in measurement_metadata['devices']:
+                if device not in measurement_devices:
                     logger.debug(
                         'unknown device_type %s '
                         'measurement %s device %s',
@@ -771,9 +2222,12 @@ def get_device_type_infos(
     device_type_units={},
     raise_exception=True
 ):
-    datacenter_metadata = get_datacenter_metadata(session, datacenter)
+    datacenter_metadata, metadata_index = _load_datacenter_metadata(
+        session, datacenter
+    )
     device_type_mapping = get_device_type_mapping(
-        device_types, datacenter_metadata, raise_exception=raise_exception
+        device_types, datacenter_metadata, raise_exception=raise_exception,
+        metadata_index=metadata_index
     )
     device_type_types = {}
     device_type_patterns = {}
@@ -817,32 +2271,73 @@ def get_device_type_infos(
     )
 
 
-def list_timeseries_internal(
-    session, data, datacenter,
-    time_precision=None,
-    convert_timestamp=False, format_timestamp=True,
+def query_timeseries(session, queries, time_precision=None):
+    """Run queries as one multi statement request.
+
+    Return the result of each query in the same order as queries.
+    """
+    if not queries:
+        return []
+    dataframe = database.is_dataframe_session(session)
+    query = '; '.join(queries)
+    logger.debug('query %s statements in one request', len(queries))
+    if dataframe:
+        results = session.query(query)
+        if isinstance(results, dict):
+            results = [results]
+        else:
+            results = list(results)
+    else:
+        results = session.query(query, epoch=time_precision)
+        if not isinstance(results, list):
+            results = [results]
+    if len(results) != len(queries):
+        raise exception.InvalidResponse(
+            'got %s results for %s queries' % (len(results), len(queries))
+        )
+    return results
+
+
+def query_timeseries_chunked(
+    session, queries, time_precision=None, chunk_size=None
+):
+    """Run queries as one chunked request like query_timeseries.
+
+    The response is read chunk by chunk by stream_timeseries instead of
+    as one json document, and the consecutive chunks of each series are
+    joined. Return a ResultSet per query, also for dataframe sessions.
+    """
+    series_lists = [[] for _ in queries]
+    for statement_id, series in stream_timeseries(
+        session, queries, time_precision=time_precision,
+        chunk_size=chunk_size
+    ):
+        series_list = series_lists[statement_id]
+        if series_list and (
+            series_list[-1].get('name'), series_list[-1].get('tags')
+        ) == (series.get('name'), series.get('tags')):
+            series_list[-1]['values'].extend(series.get('values') or [])
+        else:
+            series.setdefault('values', [])
+            series_list.append(series)
+    return [
+        ResultSet({'series': series_list}) for series_list in series_lists
+    ]
+
+
+def _get_timeseries_queries(
+    data, datacenter,
     device_type_mapping={}, device_type_types={},
     device_type_patterns={}, device_type_unit_converters={},
-    result_as_dataframe=None,
     measurement_callback=None,
     data_callback=None
 ):
-    dataframe = database.is_dataframe_session(session)
-    if result_as_dataframe is None:
-        result_as_dataframe = dataframe
-    if convert_timestamp:
-        timestamp_converter = get_timestamp_converter(
-            time_precision, dataframe
-        )
-    else:
-        timestamp_converter = None
-    if format_timestamp:
-        timestamp_formatter = get_timestamp_formatter(
-            time_precision, dataframe
-        )
-    else:
-        timestamp_formatter = None
-    responses = []
+    """Get queries and the formatting info of each query."""
+    queries = []
+    query_infos = []
+    rollup_starts = {}
+    if CONF.timeseries_rollup:
+        rollup_starts = get_rollup_starts(datacenter)
     for device_type, measurements in six.iteritems(device_type_mapping):
         measurement_types = device_type_types.get(device_type) or {}
         measurement_patterns = device_type_patterns.get(device_type) or {}
@@ -869,29 +2364,342 @@ def list_timeseries_internal(
                     data = data_callback(measurement, data)
                 else:
                     data = data_callback
-            query = get_query_from_data(
-                datacenter, device_type, pattern, data
-            )
-            if dataframe:
-                result = session.query(query)
-            else:
-                result = session.query(query, epoch=time_precision)
-            response = timeseries_formatter(
-                result, device_type, measurement, devices,
+            queries.append(get_query_from_data(
+                datacenter, device_type, pattern, data,
                 measurement_type=measurement_type,
-                timestamp_converter=timestamp_converter,
-                timestamp_formatter=timestamp_formatter,
-                dataframe=dataframe,
-                measurement_pattern=measurement_pattern,
-                measurement_unit_converter=measurement_unit_converter,
-                result_as_dataframe=result_as_dataframe
+                rollup_starts=rollup_starts
+            ))
+            query_infos.append((
+                device_type, measurement, devices, measurement_type,
+                measurement_pattern, measurement_unit_converter
+            ))
+    return queries, query_infos
+
+
+def _get_timestamps_functions(
+    time_precision, dataframe, convert_timestamp, format_timestamp
+):
+    if convert_timestamp:
+        timestamps_converter = get_timestamps_converter(
+            time_precision, dataframe
+        )
+    else:
+        timestamps_converter = None
+    if format_timestamp:
+        timestamps_formatter = get_timestamps_formatter(
+            time_precision, dataframe
+        )
+    else:
+        timestamps_formatter = None
+    return timestamps_converter, timestamps_formatter
+
+
+def is_past_time_range(starttime, endtime, margin=None):
+    """Check if [starttime, endtime) ends margin seconds before now.
+
+    Both times should be absolute, starttime may be empty. The margin
+    defaults to CONF.timeseries_result_cache_margin.
+    """
+    if margin is None:
+        margin = CONF.timeseries_result_cache_margin
+    if starttime and _get_epoch_seconds(starttime) is None:
+        return False
+    end_seconds = _get_epoch_seconds(endtime)
+    if end_seconds is None:
+        return False
+    return end_seconds <= time.time() - margin
+
+
+def _get_result_cache():
+    global RESULT_CACHE
+    with RESULT_CACHE_LOCK:
+        if RESULT_CACHE is None:
+            RESULT_CACHE = util.LRUCache(CONF.timeseries_result_cache_size)
+        return RESULT_CACHE
+
+
+def _get_result_cache_key(data, datacenter, dataframe, kwargs):
+    """Get the cache key of a timeseries listing.
+
+    Return None if the listing should not be cached: the cache is
+    disabled, callbacks are callables or the time range is not
+    entirely before now minus CONF.timeseries_result_cache_margin.
+    The cache is per process and only the writing process invalidates
+    it, so cached listings expire after
+    CONF.timeseries_result_cache_expire seconds since past data may be
+    imported or deleted by another process. data should not be mutated
+    yet by listing it.
+    """
+    if not CONF.timeseries_result_cache:
+        return None
+    if (
+        callable(kwargs['measurement_callback']) or
+        callable(kwargs['data_callback'])
+    ):
+        return None
+    where = data.get('where') or {}
+    if not is_past_time_range(
+        where.get('starttime'), where.get('endtime')
+    ):
+        return None
+    device_type_mapping = dict([
+        (device_type, dict([
+            (measurement, sorted(devices or []))
+            for measurement, devices in six.iteritems(measurements)
+        ]))
+        for device_type, measurements in six.iteritems(
+            kwargs['device_type_mapping']
+        )
+    ])
+    normalized = dict(kwargs)
+    normalized.update({
+        'data': data,
+        'dataframe': dataframe,
+        'device_type_mapping': device_type_mapping
+    })
+    return datacenter, json.dumps(normalized, sort_keys=True, default=str)
+
+
+def _copy_response(response, result_as_dataframe=False):
+    if result_as_dataframe:
+        return response.copy()
+    return dict([
+        (key, dict(values)) for key, values in six.iteritems(response)
+    ])
+
+
+def _get_response_size(response):
+    if isinstance(response, pd.DataFrame):
+        return int(response.memory_usage(index=True, deep=True).sum())
+    size = sys.getsizeof(response)
+    for values in six.itervalues(response):
+        size += sys.getsizeof(values)
+        if values:
+            timestamp, value = next(six.iteritems(values))
+            size += len(values) * (
+                sys.getsizeof(timestamp) + sys.getsizeof(value)
+            )
+    return size
+
+
+def add_invalidate_callback(callback):
+    """Call callback(datacenter) when timeseries of datacenter change.
+
+    It lets caches built on timeseries, e.g. the model data cache, be
+    dropped together with the timeseries result cache.
+    """
+    if callback not in INVALIDATE_CALLBACKS:
+        INVALIDATE_CALLBACKS.append(callback)
+
+
+def invalidate_result_cache(datacenter=None):
+    """Drop cached timeseries listings of datacenter or of all."""
+    if datacenter:
+        _get_result_cache().remove(lambda key: key[0] == datacenter)
+    else:
+        _get_result_cache().remove()
+    for callback in INVALIDATE_CALLBACKS:
+        callback(datacenter)
+
+
+def get_result_cache_stats():
+    """Get hits, misses and size of the timeseries result cache."""
+    stats = _get_result_cache().stats()
+    stats['enabled'] = CONF.timeseries_result_cache
+    return stats
+
+
+def merge_timeseries_responses(responses, result_as_dataframe=False):
+    """Merge responses of consecutive time ranges in order."""
+    if result_as_dataframe:
+        responses = [
+            response for response in responses if not response.empty
+        ]
+        if not responses:
+            return pd.DataFrame()
+        if len(responses) == 1:
+            return responses[0]
+        return pd.concat(responses, axis=0)
+    total_response = {}
+    for response in responses:
+        for key, values in six.iteritems(response):
+            total_response.setdefault(key, {}).update(values)
+    return total_response
+
+
+def list_timeseries_internal(
+    session, data, datacenter,
+    time_precision=None,
+    convert_timestamp=False, format_timestamp=True,
+    device_type_mapping={}, device_type_types={},
+    device_type_patterns={}, device_type_unit_converters={},
+    result_as_dataframe=None,
+    measurement_callback=None,
+    data_callback=None,
+    shards=None,
+    use_cache=True,
+    chunk_size=None
+):
+    """List timeseries.
+
+    When the where clause has absolute starttime and endtime, data
+    groups by time() without limit, offset or fill(previous/linear) and
+    shards (default CONF.timeseries_shards) is more than 1, the time
+    range is split by plan_time_ranges and the sub ranges are fetched
+    concurrently, each with its own influx client. use_cache=False
+    neither reads nor fills the per process result cache, whose key is
+    taken from data before it is listed. With chunk_size, the
+    responses are read in chunks of chunk_size points by
+    query_timeseries_chunked.
+    """
+    dataframe = database.is_dataframe_session(session)
+    if result_as_dataframe is None:
+        result_as_dataframe = dataframe
+    kwargs = {
+        'time_precision': time_precision,
+        'convert_timestamp': convert_timestamp,
+        'format_timestamp': format_timestamp,
+        'device_type_mapping': device_type_mapping,
+        'device_type_types': device_type_types,
+        'device_type_patterns': device_type_patterns,
+        'device_type_unit_converters': device_type_unit_converters,
+        'result_as_dataframe': result_as_dataframe,
+        'measurement_callback': measurement_callback,
+        'data_callback': data_callback
+    }
+    cache_key = None
+    if use_cache:
+        cache_key = _get_result_cache_key(
+            data, datacenter, dataframe, kwargs
+        )
+    # listing may mutate data, e.g. by data_callback, so the key and
+    # the caller keep the data as requested.
+    data = copy.deepcopy(data)
+    if cache_key:
+        response = _get_result_cache().get(cache_key)
+        if response is not None:
+            logger.debug('timeseries result cache hit %s', cache_key)
+            return _copy_response(response, result_as_dataframe)
+    where = data.get('where') or {}
+    time_ranges = plan_time_ranges(
+        where.get('starttime'), where.get('endtime'),
+        time_interval=get_split_interval(data),
+        shards=shards
+    )
+    if len(time_ranges) <= 1:
+        response = _list_timeseries_range(
+            session, data, datacenter, chunk_size=chunk_size, **kwargs
+        )
+    else:
+        response = _list_timeseries_shards(
+            data, datacenter, time_ranges, dataframe,
+            chunk_size=chunk_size, **kwargs
+        )
+    if cache_key:
+        _get_result_cache().set(
+            cache_key, _copy_response(response, result_as_dataframe),
+            _get_response_size(response),
+            expire=CONF.timeseries_result_cache_expire
+        )
+    return response
+
+
+def _list_timeseries_shards(
+    data, datacenter, time_ranges, dataframe, chunk_size=None, **kwargs
+):
+
+    def list_time_range(time_range):
+        range_data = copy.deepcopy(data)
+        range_where = range_data.setdefault('where', {})
+        range_where['starttime'], range_where['endtime'] = time_range
+        with database.influx_session(dataframe=dataframe) as range_session:
+            return _list_timeseries_range(
+                range_session, range_data, datacenter,
+                chunk_size=chunk_size, **kwargs
             )
-            responses.append(response)
+
+    # one listing checks out at most influx_pool_size clients, so
+    # sharded listings do not drain the pool shared with other requests.
+    pool = ThreadPool(max(min(
+        len(time_ranges), CONF.timeseries_shard_workers,
+        CONF.influx_pool_size
+    ), 1))
+    try:
+        responses = pool.map(list_time_range, time_ranges)
+    finally:
+        pool.close()
+        pool.join()
+    order_by = data.get('order_by') or []
+    if isinstance(order_by, string_types):
+        order_by = [order_by]
+    if any('desc' in item.lower() for item in order_by):
+        responses.reverse()
+    return merge_timeseries_responses(
+        responses, kwargs['result_as_dataframe']
+    )
+
+
+def _list_timeseries_range(
+    session, data, datacenter,
+    time_precision=None,
+    convert_timestamp=False, format_timestamp=True,
+    device_type_mapping={}, device_type_types={},
+    device_type_patterns={}, device_type_unit_converters={},
+    result_as_dataframe=None,
+    measurement_callback=None,
+    data_callback=None,
+    chunk_size=None
+):
+    dataframe = database.is_dataframe_session(session)
+    if result_as_dataframe is None:
+        result_as_dataframe = dataframe
+    if chunk_size:
+        # chunked results are plain ResultSets for any session.
+        dataframe = False
+    timestamps_converter, timestamps_formatter = _get_timestamps_functions(
+        time_precision, dataframe, convert_timestamp, format_timestamp
+    )
+    queries, query_infos = _get_timeseries_queries(
+        data, datacenter,
+        device_type_mapping=device_type_mapping,
+        device_type_types=device_type_types,
+        device_type_patterns=device_type_patterns,
+        device_type_unit_converters=device_type_unit_converters,
+        measurement_callback=measurement_callback,
+        data_callback=data_callback
+    )
+    if chunk_size:
+        results = query_timeseries_chunked(
+            session, queries, time_precision=time_precision,
+            chunk_size=chunk_size
+        )
+    else:
+        results = query_timeseries(
+            session, queries, time_precision=time_precision
+        )
+    responses = []
+    for query_info, result in zip(query_infos, results):
+        (
+            device_type, measurement, devices, measurement_type,
+            measurement_pattern, measurement_unit_converter
+        ) = query_info
+        response = timeseries_formatter(
+            result, device_type, measurement, devices,
+            measurement_type=measurement_type,
+            timestamps_converter=timestamps_converter,
+            timestamps_formatter=timestamps_formatter,
+            dataframe=dataframe,
+            measurement_pattern=measurement_pattern,
+            measurement_unit_converter=measurement_unit_converter,
+            result_as_dataframe=result_as_dataframe,
+            result_as_series=result_as_dataframe
+        )
+        responses.append(response)
     if result_as_dataframe:
-        if responses:
-            return pd.concat(responses, axis=1)
-        else:
-            return pd.DataFrame()
+        return assemble_timeseries_frame([
+            item for response in responses
+            for item in six.iteritems(response)
+        ])
     else:
         total_response = {}
         for response in responses:
@@ -899,6 +2707,118 @@ def list_timeseries_internal(
         return total_response
 
 
+def stream_timeseries(
+    session, queries, time_precision=None, chunk_size=None
+):
+    """Run queries as one chunked multi statement request.
+
+    Yield (query index, series) for each chunk of series as it is read
+    from the response. A series longer than chunk_size points is split
+    into several consecutive chunks.
+    """
+    if not queries:
+        return
+    chunk_size = chunk_size or CONF.timeseries_chunk_size
+    params = {
+        'q': '; '.join(queries),
+        'db': session._database,
+        'chunked': 'true',
+        'chunk_size': chunk_size
+    }
+    if time_precision:
+        params['epoch'] = time_precision
+    logger.debug(
+        'stream %s statements in chunks of %s points',
+        len(queries), chunk_size
+    )
+    response = session.request(
+        url='query', method='GET', params=params,
+        stream=True, expected_response_code=200
+    )
+    try:
+        for line in response.iter_lines():
+            if not line:
+                continue
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            chunk = json.loads(line)
+            if 'error' in chunk:
+                raise exception.InvalidResponse(chunk['error'])
+            for result in chunk.get('results', []):
+                if 'error' in result:
+                    raise exception.InvalidResponse(result['error'])
+                statement_id = result.get('statement_id', 0)
+                if statement_id >= len(queries):
+                    raise exception.InvalidResponse(
+                        'got result of statement %s for %s queries' % (
+                            statement_id, len(queries)
+                        )
+                    )
+                for series in result.get('series', []):
+                    yield statement_id, series
+    finally:
+        response.close()
+
+
+def iter_timeseries_internal(
+    session, data, datacenter,
+    time_precision=None,
+    convert_timestamp=False, format_timestamp=True,
+    device_type_mapping={}, device_type_types={},
+    device_type_patterns={}, device_type_unit_converters={},
+    result_as_dataframe=None,
+    measurement_callback=None,
+    data_callback=None,
+    chunk_size=None
+):
+    """Iterate timeseries in blocks instead of one response.
+
+    Each block has the same shape as the response of
+    list_timeseries_internal and holds at most chunk_size points of
+    each (device_type, measurement, device). Blocks of the same key
+    come in the order of the query; values of one timestamp may be
+    split across blocks when measurement_pattern matches several
+    measurements of the device.
+    """
+    if result_as_dataframe is None:
+        result_as_dataframe = database.is_dataframe_session(session)
+    timestamps_converter, timestamps_formatter = _get_timestamps_functions(
+        time_precision, False, convert_timestamp, format_timestamp
+    )
+    queries, query_infos = _get_timeseries_queries(
+        data, datacenter,
+        device_type_mapping=device_type_mapping,
+        device_type_types=device_type_types,
+        device_type_patterns=device_type_patterns,
+        device_type_unit_converters=device_type_unit_converters,
+        measurement_callback=measurement_callback,
+        data_callback=data_callback
+    )
+    for statement_id, series in stream_timeseries(
+        session, queries, time_precision=time_precision,
+        chunk_size=chunk_size
+    ):
+        (
+            device_type, measurement, devices, measurement_type,
+            measurement_pattern, measurement_unit_converter
+        ) = query_infos[statement_id]
+        response = timeseries_formatter(
+            ResultSet({'series': [series]}),
+            device_type, measurement, devices,
+            measurement_type=measurement_type,
+            timestamps_converter=timestamps_converter,
+            timestamps_formatter=timestamps_formatter,
+            measurement_pattern=measurement_pattern,
+            measurement_unit_converter=measurement_unit_converter,
+            result_as_dataframe=result_as_dataframe
+        )
+        if result_as_dataframe:
+            if not response.empty:
+                yield response
+        elif any(six.itervalues(response)):
+            yield response
+
+
 def list_test_result_timeseries(
     session, data, measurement_key,
     time_precision=None,
@@ -938,7 +2858,9 @@ def list_timeseries(
     device_type_units={},
     result_as_dataframe=None,
     measurement_callback=None,
-    data_callback=None
+    data_callback=None,
+    shards=None,
+    chunk_size=None
 ):
     logger.debug('timeseries data: %s', data)
     datacenter = data.pop('datacenter')
@@ -970,8 +2892,248 @@ def list_timeseries(
         device_type_unit_converters=device_type_unit_converters,
         result_as_dataframe=result_as_dataframe,
         measurement_callback=measurement_callback,
-        data_callback=data_callback
+        data_callback=data_callback,
+        shards=shards,
+        chunk_size=chunk_size
+    )
+
+
+def iter_timeseries(
+    session, data,
+    time_precision=None,
+    convert_timestamp=False, format_timestamp=True,
+    device_type_units={},
+    result_as_dataframe=None,
+    measurement_callback=None,
+    data_callback=None,
+    chunk_size=None
+):
+    """Iterate timeseries in blocks of chunk_size points.
+
+    It is the streaming variant of list_timeseries.
+    """
+    logger.debug('iter timeseries data: %s', data)
+    datacenter = data.pop('datacenter')
+    device_types = data.pop('device_type', {})
+    with database.session() as db_session:
+        (
+            device_type_mapping, device_type_types,
+            device_type_patterns, device_type_unit_converters
+        ) = get_device_type_infos(
+            db_session, datacenter, device_types, device_type_units
+        )
+    return iter_timeseries_internal(
+        session, data, datacenter,
+        time_precision=time_precision,
+        convert_timestamp=convert_timestamp,
+        format_timestamp=format_timestamp,
+        device_type_mapping=device_type_mapping,
+        device_type_types=device_type_types,
+        device_type_patterns=device_type_patterns,
+        device_type_unit_converters=device_type_unit_converters,
+        result_as_dataframe=result_as_dataframe,
+        measurement_callback=measurement_callback,
+        data_callback=data_callback,
+        chunk_size=chunk_size
+    )
+
+
+def list_timeseries_keys(session, datacenter, device_types):
+    """Get [(device_type, measurement, device)] known for device_types.
+
+    They are the keys list_timeseries may return, taken from metadata
+    so they are known before any timeseries is read.
+    """
+    device_type_mapping = get_device_type_infos(
+        session, datacenter, device_types
+    )[0]
+    keys = []
+    for device_type, measurement_devices in six.iteritems(
+        device_type_mapping
+    ):
+        for measurement, devices in six.iteritems(measurement_devices):
+            for device in devices:
+                keys.append((device_type, measurement, device))
+    return keys
+
+
+def list_present_timeseries_keys(session, datacenter, device_types, where):
+    """Get the set of keys list_timeseries has points of in where.
+
+    Only the count of points of each series is read.
+    """
+    response = list_timeseries(session, {
+        'datacenter': datacenter,
+        'device_type': device_types,
+        'where': copy.deepcopy(where),
+        'aggregation': 'count'
+    })
+    return set([key for key, values in six.iteritems(response) if values])
+
+
+def plan_time_windows(starttime, endtime, time_interval=None, window=None):
+    """Split [starttime, endtime) into windows of window seconds.
+
+    Windows are aligned to time_interval like plan_time_ranges. Relative
+    or missing times, or a missing time_interval, are not split.
+    """
+    window = window or CONF.timeseries_window
+    start_seconds = _get_epoch_seconds(starttime)
+    end_seconds = _get_epoch_seconds(endtime)
+    if not window or start_seconds is None or end_seconds is None:
+        return [(starttime, endtime)]
+    windows = int(np.ceil(float(end_seconds - start_seconds) / window))
+    return plan_time_ranges(
+        starttime, endtime, time_interval=time_interval, shards=windows
+    )
+
+
+def iter_timeseries_windows(
+    session, data,
+    time_precision=None,
+    convert_timestamp=False, format_timestamp=True,
+    device_type_units={},
+    result_as_dataframe=None,
+    window=None
+):
+    """Iterate list_timeseries responses window by window.
+
+    The time range of data is split by plan_time_windows and each
+    window is listed in ascending time order, so only the timeseries
+    of one window are in memory at a time. Only listings split by
+    get_window_interval, i.e. raw points or grouped by time() without
+    limit, offset or fill(previous/linear), are split, others are
+    listed at once.
+    Windows are read once in chunks of CONF.timeseries_chunk_size
+    points, so they skip the result cache.
+    """
+    logger.debug('iter timeseries windows data: %s', data)
+    datacenter = data.pop('datacenter')
+    device_types = data.pop('device_type', {})
+    with database.session() as db_session:
+        (
+            device_type_mapping, device_type_types,
+            device_type_patterns, device_type_unit_converters
+        ) = get_device_type_infos(
+            db_session, datacenter, device_types, device_type_units
+        )
+    where = data.get('where') or {}
+    time_ranges = plan_time_windows(
+        where.get('starttime'), where.get('endtime'),
+        time_interval=get_window_interval(data),
+        window=window
     )
+    logger.debug('iter timeseries in %s windows', len(time_ranges))
+    for starttime, endtime in time_ranges:
+        window_data = copy.deepcopy(data)
+        window_where = window_data.setdefault('where', {})
+        window_where['starttime'] = starttime
+        window_where['endtime'] = endtime
+        yield list_timeseries_internal(
+            session, window_data, datacenter,
+            time_precision=time_precision,
+            convert_timestamp=convert_timestamp,
+            format_timestamp=format_timestamp,
+            device_type_mapping=device_type_mapping,
+            device_type_types=device_type_types,
+            device_type_patterns=device_type_patterns,
+            device_type_unit_converters=device_type_unit_converters,
+            result_as_dataframe=result_as_dataframe,
+            use_cache=False,
+            chunk_size=CONF.timeseries_chunk_size
+        )
+
+
+def get_timeseries_index(indexes):
+    """Get the sorted union of timestamp indexes.
+
+    Indexes of series grouped by the same time interval are usually
+    equal, in which case the first one is used as is.
+    """
+    indexes = [index for index in indexes if len(index)]
+    if not indexes:
+        return pd.Index([])
+    index = indexes[0]
+    if all(index.equals(other) for other in indexes[1:]):
+        return index
+    names = set(other.name for other in indexes)
+    index = index.append(indexes[1:]).unique()
+    try:
+        index = index.sort_values()
+    except TypeError:
+        pass
+    if len(names) == 1:
+        index.name = names.pop()
+    else:
+        index.name = None
+    return index
+
+
+def assemble_timeseries_frame(items):
+    """Assemble [(column, series)] into one dataframe.
+
+    The common timestamp index is computed once and float series are
+    written into their column of one preallocated matrix, which avoids
+    reindexing and copying each frame against the union index as
+    pd.concat does. Other series (e.g. bool or object) are reindexed
+    and inserted at their position.
+    """
+    if not items:
+        return pd.DataFrame()
+    index = get_timeseries_index([values.index for _, values in items])
+    float_items = []
+    other_items = []
+    for position, (column, values) in enumerate(items):
+        if values.dtype.kind == 'f' or not len(values):
+            float_items.append((column, values))
+        else:
+            other_items.append((position, column, values))
+    if not float_items:
+        return pd.DataFrame(collections.OrderedDict([
+            (column, values) for _, column, values in other_items
+        ]))
+    dtype = np.result_type(*(
+        [values.dtype for _, values in float_items if len(values)] or
+        [np.float64]
+    ))
+    matrix = np.full((len(index), len(float_items)), np.nan, dtype=dtype)
+    for slot, (_, values) in enumerate(float_items):
+        if not len(values):
+            continue
+        if values.index is index or values.index.equals(index):
+            matrix[:, slot] = values.values
+        else:
+            matrix[index.get_indexer(values.index), slot] = values.values
+    columns = [column for column, _ in float_items]
+    if all(isinstance(column, tuple) for column in columns):
+        columns = pd.MultiIndex.from_tuples(columns)
+    frame = pd.DataFrame(matrix, index=index, columns=columns, copy=False)
+    for position, column, values in other_items:
+        frame.insert(
+            position, column, values.reindex(index), allow_duplicates=True
+        )
+    return frame
+
+
+def _get_timeseries_columns(result, dataframe=False):
+    """Get group tags and value series of each series in result.
+
+    The values are indexed by the raw timestamps of the series.
+    """
+    if dataframe:
+        for key, values in six.iteritems(result):
+            _, group_tags = key
+            yield dict(group_tags), values['value']
+    else:
+        for series in result.raw.get('series', []):
+            points = pd.DataFrame(
+                series.get('values') or [],
+                columns=series['columns'], dtype=object
+            )
+            yield series.get('tags') or {}, pd.Series(
+                points['value'].values, index=pd.Index(points['time'].values),
+                dtype=object
+            )
 
 
 def timeseries_formatter(
@@ -979,8 +3141,20 @@ def timeseries_formatter(
     timestamp_converter=None, timestamp_formatter=None,
     dataframe=False, measurement_pattern=None,
     measurement_unit_converter=None,
-    result_as_dataframe=False
+    result_as_dataframe=False,
+    timestamps_converter=None, timestamps_formatter=None,
+    result_as_series=False
 ):
+    """Format the timeseries result of one measurement.
+
+    Values are converted, rounded and unit converted per series.
+    Series of the same device (e.g. matched by measurement_pattern)
+    are merged on timestamp by the aggregator of measurement_type.
+    timestamps_converter/timestamps_formatter are applied to the whole
+    timestamp index, timestamp_converter/timestamp_formatter to each
+    timestamp. With result_as_series the ordered {key: series} is
+    returned as is so several measurements can be assembled at once.
+    """
     logger.debug(
         'format timeseries device_type %s '
         'measurement %s devices %s measurement_type %s '
@@ -990,60 +3164,73 @@ def timeseries_formatter(
         measurement_type, dataframe, measurement_pattern,
         measurement_unit_converter, result_as_dataframe
     )
-    response = {}
     unit_converter = None
     if measurement_unit_converter:
         unit_converter = tuple(reversed(measurement_unit_converter))
         unit_converter = get_unit_converter(unit_converter)
     logger.debug('unit converter: %s', unit_converter)
-    for key, values in result.items():
-        _, group_tags = key
-        group_tags = dict(group_tags)
+    device_values = {}
+    for group_tags, values in _get_timeseries_columns(result, dataframe):
         device = group_tags['device']
         if devices and device not in devices:
             logger.debug('ignore device %s', device)
             continue
-        device_response = {}
-        response.setdefault(
-            (device_type, measurement, device),
-            device_response
-        )
-        if dataframe:
-            for timestamp, value in six.iteritems(dict(values['value'])):
-                if timestamp_formatter:
-                    timestamp = timestamp_formatter(
-                        timestamp
-                    )
-                if value is not None:
-                    if unit_converter:
-                        value = unit_converter(value)
-                    device_response[timestamp] = format_timeseries_value(
-                        value, measurement_type,
-                        base_value=device_response.get(timestamp)
-                    )
+        values = values.dropna()
+        if values.dtype == object:
+            values = values.infer_objects()
+        timestamps = values.index
+        if not dataframe:
+            if timestamps_converter:
+                timestamps = timestamps_converter(timestamps)
+            elif timestamp_converter:
+                timestamps = timestamps.map(timestamp_converter)
+        if timestamps_formatter:
+            timestamps = timestamps_formatter(timestamps)
+        elif timestamp_formatter:
+            timestamps = timestamps.map(timestamp_formatter)
+        values.index = timestamps
+        if unit_converter and len(values):
+            values = unit_converter(values)
+        values = format_timeseries_values(values, measurement_type)
+        device_values.setdefault(
+            (device_type, measurement, device), []
+        ).append(values)
+    aggregator = TIMESERIES_VALUES_AGGREGATORS.get(measurement_type, 'last')
+    response = collections.OrderedDict()
+    for key, series in six.iteritems(device_values):
+        if len(series) == 1:
+            values = series[0]
         else:
-            for item in values:
-                timestamp = item['time']
-                if timestamp_converter:
-                    timestamp = timestamp_converter(
-                        timestamp
-                    )
-                if timestamp_formatter:
-                    timestamp = timestamp_formatter(
-                        timestamp
-                    )
-                value = item['value']
-                if value is not None:
-                    if unit_converter:
-                        value = unit_converter(value)
-                    device_response[timestamp] = format_timeseries_value(
-                        value, measurement_type,
-                        base_value=device_response.get(timestamp)
-                    )
+            values = pd.concat(series)
+        if not values.index.is_unique:
+            values = values.groupby(level=0, sort=False).agg(aggregator)
+        response[key] = values
+    if result_as_series:
+        return response
     if result_as_dataframe:
-        return pd.DataFrame(response)
+        return assemble_timeseries_frame(list(six.iteritems(response)))
     else:
-        return response
+        return dict([
+            (key, dict(zip(values.index.tolist(), values.tolist())))
+            for key, values in six.iteritems(response)
+        ])
+
+
+def _get_measurement_matcher(
+    device_type, device_type_patterns, metadata_index=None
+):
+    """Get (matcher, measurements to match) of device_type."""
+    measurement_patterns = {}
+    if device_type_patterns:
+        measurement_patterns = device_type_patterns.get(device_type) or {}
+    if not measurement_patterns:
+        return None, None
+    if metadata_index and device_type in metadata_index:
+        return (
+            metadata_index[device_type]['measurement_matcher'],
+            measurement_patterns
+        )
+    return MeasurementMatcher(measurement_patterns), None
 
 
 def generate_device_type_timeseries(
@@ -1051,8 +3238,18 @@ def generate_device_type_timeseries(
     device_type_types={},
     timestamp_converter=None,
     dataframe=False, device_type_patterns={},
-    device_type_unit_converters={}
+    device_type_unit_converters={},
+    timestamps_converter=None, as_series=False,
+    metadata_index=None
 ):
+    """Generate the converted timeseries of each writable column.
+
+    Yield ((device_type, measurement, device), timeseries) where
+    timeseries is a dict or a pandas series if as_series. The measurement
+    matchers are taken from metadata_index if given.
+    """
+    device_type_matchers = {}
+    device_sets = {}
     for key, device_data in six.iteritems(data):
         device_type, measurement, device = key
         if device_type not in device_type_mapping:
@@ -1062,27 +3259,34 @@ def generate_device_type_timeseries(
         measurement_types = None
         if device_type_types:
             measurement_types = device_type_types.get(device_type)
-        measurement_patterns = None
-        if device_type_patterns:
-            measurement_patterns = device_type_patterns.get(device_type)
+        if device_type not in device_type_matchers:
+            device_type_matchers[device_type] = _get_measurement_matcher(
+                device_type, device_type_patterns, metadata_index
+            )
+        measurement_matcher, pattern_measurements = device_type_matchers[
+            device_type
+        ]
         measurement_unit_converters = None
         if device_type_unit_converters:
             measurement_unit_converters = device_type_unit_converters.get(
                 device_type
             )
-        real_measurement = measurement
-        if measurement_patterns:
-            for try_measurement, pattern in six.iteritems(
-                measurement_patterns
-            ):
-                if re.match(r'^%s$' % pattern, measurement):
-                    real_measurement = try_measurement
-                    break
+        real_measurement = None
+        if measurement_matcher:
+            real_measurement = measurement_matcher.match(
+                measurement, pattern_measurements
+            )
+        if real_measurement is None:
+            real_measurement = measurement
         if real_measurement not in measurement_mapping:
             logger.debug('ignore measurement %s', real_measurement)
             continue
-        devices = measurement_mapping[real_measurement]
-        if device not in devices:
+        device_set_key = (device_type, real_measurement)
+        if device_set_key not in device_sets:
+            device_sets[device_set_key] = frozenset(
+                measurement_mapping[real_measurement]
+            )
+        if device not in device_sets[device_set_key]:
             logger.debug('ignore device %s', device)
             continue
         measurement_type = None
@@ -1093,20 +3297,196 @@ def generate_device_type_timeseries(
             unit_converter = measurement_unit_converters.get(real_measurement)
         if unit_converter:
             unit_converter = get_unit_converter(unit_converter)
-        generated = {}
-        for timestamp, value in six.iteritems(device_data):
-            if timestamp_converter:
-                timestamp = timestamp_converter(timestamp)
-            if value is not None:
-                value = convert_timeseries_value(
-                    value, measurement_type,
-                    False
-                )
-            if value is not None:
-                if unit_converter:
-                    value = unit_converter(value)
-                generated[timestamp] = value
-        yield (device_type, measurement, device), generated
+        if isinstance(device_data, pd.Series):
+            generated = device_data.dropna()
+        else:
+            generated = pd.Series(
+                list(device_data.values()),
+                index=list(device_data.keys()), dtype=object
+            ).dropna()
+        if timestamps_converter:
+            generated.index = timestamps_converter(generated.index)
+        elif timestamp_converter:
+            generated.index = generated.index.map(timestamp_converter)
+        generated = convert_timeseries_values(generated, measurement_type)
+        if unit_converter and len(generated):
+            generated = unit_converter(generated)
+        if as_series:
+            yield (device_type, measurement, device), generated
+        else:
+            yield (device_type, measurement, device), dict(zip(
+                generated.index.tolist(), generated.tolist()
+            ))
+
+
+WRITE_PRECISIONS = {
+    'ns': 'n'
+}
+PRECISION_NANOSECONDS = {
+    'n': 1,
+    'ns': 1,
+    'u': 10 ** 3,
+    'ms': 10 ** 6,
+    's': 10 ** 9,
+    'm': 60 * 10 ** 9,
+    'h': 3600 * 10 ** 9
+}
+
+
+def _escape_line_protocol_key(key):
+    return six.text_type(key).replace(
+        '\\', '\\\\'
+    ).replace(
+        ',', '\\,'
+    ).replace(
+        '=', '\\='
+    ).replace(
+        ' ', '\\ '
+    ).replace(
+        '\n', '\\n'
+    )
+
+
+def get_line_protocol_series_key(measurement, tags={}):
+    """Get the escaped measurement,tag=value,... prefix of a series."""
+    series_key = [_escape_line_protocol_key(measurement)]
+    for tag_key, tag_value in sorted(six.iteritems(tags)):
+        if tag_value is None or tag_value == '':
+            continue
+        series_key.append('%s=%s' % (
+            _escape_line_protocol_key(tag_key),
+            _escape_line_protocol_key(tag_value)
+        ))
+    return ','.join(series_key)
+
+
+def get_line_protocol_fields(values):
+    """Get line protocol field values of a pandas series."""
+    if pd.api.types.is_bool_dtype(values.dtype):
+        return pd.Series(
+            np.where(values.values, 'true', 'false'), index=values.index
+        )
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return values.astype(str) + 'i'
+    if pd.api.types.is_float_dtype(values.dtype):
+        return values[np.isfinite(values.values)].astype(str)
+    values = values.astype(six.text_type)
+    return '"' + values.str.replace(
+        '\\', '\\\\', regex=False
+    ).str.replace(
+        '"', '\\"', regex=False
+    ).str.replace(
+        '\n', '\\n', regex=False
+    ) + '"'
+
+
+def get_line_protocol_timestamps(timestamps, time_precision=None):
+    """Get integer timestamps in time_precision (default ns)."""
+    if isinstance(timestamps, pd.DatetimeIndex) or (
+        len(timestamps) and
+        not pd.api.types.is_numeric_dtype(timestamps.dtype)
+    ):
+        timestamps = pd.to_datetime(timestamps, utc=True)
+        nanoseconds = timestamps.values.astype(
+            'datetime64[ns]'
+        ).astype(np.int64)
+        return nanoseconds // PRECISION_NANOSECONDS[time_precision or 'n']
+    return pd.Index(timestamps).astype(np.int64).values
+
+
+def get_line_protocol(measurement, values, tags={}, time_precision=None):
+    """Encode a pandas series of one series as line protocol lines."""
+    fields = get_line_protocol_fields(values)
+    timestamps = get_line_protocol_timestamps(fields.index, time_precision)
+    prefix = '%s value=' % get_line_protocol_series_key(measurement, tags)
+    return (
+        prefix + fields.values.astype(object) + ' ' +
+        timestamps.astype(str).astype(object)
+    )
+
+
+def _gzip_payload(payload):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as gzip_file:
+        gzip_file.write(payload)
+    return buf.getvalue()
+
+
+def write_lines(session, lines, time_precision=None, compress=False):
+    """Write line protocol lines in one influx request."""
+    params = {'db': session._database}
+    if time_precision:
+        params['precision'] = WRITE_PRECISIONS.get(
+            time_precision, time_precision
+        )
+    else:
+        params['precision'] = 'n'
+    payload = ('\n'.join(lines) + '\n').encode('utf-8')
+    headers = {'Content-Type': 'application/octet-stream'}
+    if compress:
+        payload = _gzip_payload(payload)
+        headers['Content-Encoding'] = 'gzip'
+    session.request(
+        url='write', method='POST', params=params, data=payload,
+        expected_response_code=204, headers=headers
+    )
+    return True
+
+
+def _iter_line_batches(line_arrays, batch_size):
+    pending = []
+    pending_size = 0
+    for lines in line_arrays:
+        while len(lines):
+            needed = batch_size - pending_size
+            pending.append(lines[:needed])
+            pending_size += len(pending[-1])
+            lines = lines[needed:]
+            if pending_size >= batch_size:
+                yield np.concatenate(pending)
+                pending = []
+                pending_size = 0
+    if pending_size:
+        yield np.concatenate(pending)
+
+
+def write_line_batches(
+    session, line_arrays, time_precision=None,
+    batch_size=None, compress=None, batch_callback=None
+):
+    """Write arrays of lines in batches of batch_size lines.
+
+    batch_callback(batch_index, lines, status) is called after each
+    batch, so the lines of a failed batch can be written again with
+    write_lines. Return whether all batches were written.
+    """
+    batch_size = batch_size or CONF.timeseries_write_batch_size
+    if compress is None:
+        compress = CONF.timeseries_write_gzip
+    status = True
+    for batch_index, lines in enumerate(
+        _iter_line_batches(line_arrays, batch_size)
+    ):
+        try:
+            batch_status = write_lines(
+                session, lines.tolist(), time_precision=time_precision,
+                compress=compress
+            )
+        except Exception as error:
+            logger.exception(error)
+            logger.error(
+                'failed to write batch %s of %s points: %s',
+                batch_index, len(lines), error
+            )
+            batch_status = False
+        logger.debug(
+            'write batch %s of %s points status: %s',
+            batch_index, len(lines), batch_status
+        )
+        if batch_callback:
+            batch_callback(batch_index, lines, batch_status)
+        status &= batch_status
+    return status
 
 
 def write_points(
@@ -1142,16 +3522,28 @@ def create_timeseries_internal(
     device_type_mapping={}, device_type_types={},
     device_type_patterns={}, device_type_unit_converters={},
     measurement_callback=None,
-    tags_callback=None
+    tags_callback=None,
+    batch_size=None, compress=None, batch_callback=None,
+    metadata_index=None
 ):
+    """Write timeseries as batched line protocol requests.
+
+    See write_line_batches for batch_size, compress and batch_callback.
+    metadata_index gives the measurement matchers if given.
+
+    Rollup tiers miss points written into intervals their continuous
+    queries already rolled up, so such writes move the tier starts of
+    the datacenter past the written points. Other processes see the
+    new starts when their metadata cache expires; run
+    create_timeseries_rollups with starttime to roll them up again.
+    """
     dataframe = database.is_dataframe_session(session)
-    status = True
     if convert_timestamp:
-        timestamp_converter = get_timestamp_converter(
+        timestamps_converter = get_timestamps_converter(
             time_precision, dataframe
         )
     else:
-        timestamp_converter = None
+        timestamps_converter = None
     if dataframe:
         columns = data.columns
     else:
@@ -1160,12 +3552,64 @@ def create_timeseries_internal(
         'create timeseries %s tags %s data: %s',
         datacenter, extra_tags, columns
     )
+    rollup_ends = {}
+    if CONF.timeseries_rollup:
+        now = time.time()
+        rollup_ends = dict([
+            (interval, now // interval * interval)
+            for interval in get_rollup_starts(datacenter)
+        ])
+    rollup_late_seconds = {}
+    status = write_line_batches(
+        session, _generate_line_protocol(
+            data, datacenter, extra_tags,
+            time_precision=time_precision,
+            timestamps_converter=timestamps_converter,
+            device_type_mapping=device_type_mapping,
+            device_type_types=device_type_types,
+            device_type_patterns=device_type_patterns,
+            device_type_unit_converters=device_type_unit_converters,
+            measurement_callback=measurement_callback,
+            tags_callback=tags_callback,
+            metadata_index=metadata_index,
+            rollup_ends=rollup_ends,
+            rollup_late_seconds=rollup_late_seconds
+        ),
+        time_precision=time_precision, batch_size=batch_size,
+        compress=compress, batch_callback=batch_callback
+    )
+    if rollup_late_seconds:
+        _update_rollup_starts(datacenter, rollup_late_seconds)
+    invalidate_result_cache(datacenter)
+    logger.debug(
+        'create timeseries status: %s', status
+    )
+    return status
+
+
+def _generate_line_protocol(
+    data, datacenter, extra_tags,
+    time_precision=None, timestamps_converter=None,
+    device_type_mapping={}, device_type_types={},
+    device_type_patterns={}, device_type_unit_converters={},
+    measurement_callback=None,
+    tags_callback=None,
+    metadata_index=None,
+    rollup_ends={},
+    rollup_late_seconds=None
+):
+    """Generate line protocol lines of each series in data.
+
+    For each interval in rollup_ends, the latest written epoch seconds
+    before its end are kept in rollup_late_seconds.
+    """
     for generated_tags, tag_data in generate_device_type_timeseries(
         data, device_type_mapping,
         device_type_types=device_type_types,
-        timestamp_converter=timestamp_converter,
-        dataframe=dataframe, device_type_patterns=device_type_patterns,
-        device_type_unit_converters=device_type_unit_converters
+        device_type_patterns=device_type_patterns,
+        device_type_unit_converters=device_type_unit_converters,
+        timestamps_converter=timestamps_converter,
+        as_series=True, metadata_index=metadata_index
     ):
         device_type, measurement, device = generated_tags
         tags = {
@@ -1184,22 +3628,66 @@ def create_timeseries_internal(
                 measurement = measurement_callback(measurement)
             else:
                 measurement = measurement_callback
-        status &= write_points(
-            session, measurement, tag_data,
-            tags, time_precision,
-            dataframe=dataframe
+        if rollup_ends and len(tag_data):
+            _update_rollup_late_seconds(
+                tag_data.index, time_precision,
+                rollup_ends, rollup_late_seconds
+            )
+        yield get_line_protocol(
+            measurement, tag_data, tags, time_precision
         )
-    logger.debug(
-        'create timeseries status: %s', status
+
+
+def _update_rollup_late_seconds(
+    timestamps, time_precision, rollup_ends, rollup_late_seconds
+):
+    seconds = get_line_protocol_timestamps(
+        timestamps, time_precision
+    ).astype(float) * (
+        PRECISION_NANOSECONDS[time_precision or 'n'] / 1e9
     )
-    return status
+    for interval, rollup_end in six.iteritems(rollup_ends):
+        late_seconds = seconds[seconds < rollup_end]
+        if len(late_seconds):
+            rollup_late_seconds[interval] = max(
+                rollup_late_seconds.get(interval, late_seconds[0]),
+                late_seconds.max()
+            )
+
+
+def _update_rollup_starts(datacenter_name, rollup_late_seconds):
+    """Move rollup tier starts after the latest late written points."""
+    with database.session(exception_when_in_session=False) as session:
+        datacenter = session.query(
+            models.Datacenter
+        ).filter_by(name=datacenter_name).first()
+        if not datacenter:
+            return
+        rollup_starts = _get_rollup_starts(datacenter)
+        updated = False
+        for interval, late_seconds in six.iteritems(rollup_late_seconds):
+            rollup_start = rollup_starts.get(interval)
+            if rollup_start is None:
+                continue
+            late_start = (late_seconds // interval + 1) * interval
+            if late_start > rollup_start:
+                logger.debug(
+                    'datacenter %s rollup tier %ss starts from %s '
+                    'after late writes',
+                    datacenter_name, interval, late_start
+                )
+                rollup_starts[interval] = late_start
+                updated = True
+        if updated:
+            _set_rollup_starts(session, datacenter, rollup_starts)
 
 
 def create_test_result_timeseries(
     session, data, tags, measurement_key,
     time_precision=None,
     convert_timestamp=True,
-    device_type_mapping={}, device_type_types={}
+    device_type_mapping={}, device_type_types={},
+    batch_callback=None
 ):
     def generate_test_result_tags(measurement, tags):
         tags['measurement_name'] = measurement
@@ -1219,7 +3707,8 @@ def create_test_result_timeseries(
         device_type_mapping=device_type_mapping,
         device_type_types=device_type_types,
         measurement_callback=measurement_key,
-        tags_callback=generate_test_result_tags
+        tags_callback=generate_test_result_tags,
+        batch_callback=batch_callback
     )
 
 
@@ -1229,7 +3718,8 @@ def create_timeseries(
     convert_timestamp=True,
     device_type_units={},
     measurement_callback=None,
-    tags_callback=None
+    tags_callback=None,
+    batch_size=None, compress=None, batch_callback=None
 ):
     logger.debug('create timeseries tags: %s', tags)
     datacenter = tags.pop('datacenter')
@@ -1241,6 +3731,9 @@ def create_timeseries(
         ) = get_device_type_infos(
             db_session, datacenter, device_types, device_type_units, False
         )
+        metadata_index = get_datacenter_metadata_index(
+            db_session, datacenter
+        )
     logger.debug(
         'device_type_mapping %s device_type_types %s '
         'time_precision %s '
@@ -1256,29 +3749,133 @@ def create_timeseries(
         device_type_patterns=device_type_patterns,
         device_type_unit_converters=device_type_unit_converters,
         measurement_callback=measurement_callback,
-        tags_callback=tags_callback
+        tags_callback=tags_callback,
+        batch_size=batch_size, compress=compress,
+        batch_callback=batch_callback, metadata_index=metadata_index
     )
 
 
-def delete_timeseries_internal(
-    session, datacenter,
-    device_type_mapping={}
+def create_timeseries_stream(
+    session, data_iter, tags, time_precision=None,
+    convert_timestamp=True,
+    device_type_units={},
+    batch_size=None, compress=None
+):
+    """Write each data of data_iter like create_timeseries.
+
+    Device type infos are resolved once. Each data is written by a
+    worker thread while data_iter produces the next one, so at most one
+    data is written at a time.
+    """
+    logger.debug('create timeseries stream tags: %s', tags)
+    tags = dict(tags)
+    datacenter = tags.pop('datacenter')
+    device_types = tags.pop('device_type', {})
+    with database.session() as db_session:
+        (
+            device_type_mapping, device_type_types, device_type_patterns,
+            device_type_unit_converters
+        ) = get_device_type_infos(
+            db_session, datacenter, device_types, device_type_units, False
+        )
+        metadata_index = get_datacenter_metadata_index(
+            db_session, datacenter
+        )
+    kwargs = {
+        'time_precision': time_precision,
+        'convert_timestamp': convert_timestamp,
+        'device_type_mapping': device_type_mapping,
+        'device_type_types': device_type_types,
+        'device_type_patterns': device_type_patterns,
+        'device_type_unit_converters': device_type_unit_converters,
+        'batch_size': batch_size,
+        'compress': compress,
+        'metadata_index': metadata_index
+    }
+    status = True
+    pending = None
+    pool = ThreadPool(1)
+    try:
+        for data in data_iter:
+            if pending is not None:
+                status &= pending.get()
+            pending = pool.apply_async(
+                create_timeseries_internal,
+                (session, data, datacenter, tags), kwargs
+            )
+        if pending is not None:
+            status &= pending.get()
+    finally:
+        pool.close()
+        pool.join()
+    return status
+
+
+def get_delete_timeseries_statements(
+    datacenter, device_type_mapping={}, dry_run=False
 ):
+    """Get statements to drop the series of device_type_mapping.
+
+    Measurements of a device type with the same devices share one
+    drop series statement which matches each device exactly. A
+    measurement without devices drops all its series of the device
+    type. If dry_run, the statements count the series instead.
+    """
+    if dry_run:
+        statement = 'show series exact cardinality from %s where %s'
+    else:
+        statement = 'drop series from %s where %s'
+    statements = []
     for device_type, measurement_mapping in six.iteritems(
         device_type_mapping
     ):
+        device_measurements = {}
         for measurement, devices in six.iteritems(measurement_mapping):
-            for device in devices:
-                session.delete_series(
-                    measurement=measurement, tags={
-                        'datacenter': datacenter,
-                        'device_type': device_type,
-                        'device': device
-                    }
+            device_measurements.setdefault(
+                tuple(sorted(set(devices or []))), []
+            ).append(measurement)
+        for devices, measurements in sorted(
+            six.iteritems(device_measurements)
+        ):
+            statements.append(statement % (
+                ', '.join(sorted(measurements)), get_where(
+                    datacenter=datacenter, device_type=device_type,
+                    device=list(devices)
                 )
+            ))
+    return statements
 
 
-def delete_timeseries(session, tags):
+def delete_timeseries_internal(
+    session, datacenter,
+    device_type_mapping={}, dry_run=False
+):
+    """Drop the series of device_type_mapping in one request.
+
+    If dry_run, nothing is dropped and {measurement: series count} of
+    the series which would be dropped is returned.
+    """
+    statements = get_delete_timeseries_statements(
+        datacenter, device_type_mapping=device_type_mapping,
+        dry_run=dry_run
+    )
+    logger.debug(
+        'delete timeseries of %s in %s statements dry run %s',
+        datacenter, len(statements), dry_run
+    )
+    results = execute_timeseries_statements(session, statements)
+    if dry_run:
+        cardinality = {}
+        for result in results:
+            for series in result.get('series', []):
+                name = series.get('name')
+                for row in series.get('values') or []:
+                    cardinality[name] = cardinality.get(name, 0) + row[0]
+        return cardinality
+    invalidate_result_cache(datacenter)
+
+
+def delete_timeseries(session, tags, dry_run=False):
     logger.debug('delete timeseries tags: %s', tags)
     datacenter = tags.pop('datacenter')
     device_types = tags.pop('device_type')
@@ -1293,8 +3890,9 @@ def delete_timeseries(session, tags):
         'device_type_mapping %s',
         device_type_mapping
     )
-    delete_timeseries_internal(
-        session, datacenter, device_type_mapping=device_type_mapping
+    return delete_timeseries_internal(
+        session, datacenter, device_type_mapping=device_type_mapping,
+        dry_run=dry_run
     )
 
 
@@ -1303,25 +3901,183 @@ TIMEDELTA_MAP = {
     'm': lambda t: long(t) // 60,
     's': lambda t: long(t),
     'ms': lambda t: long(t) * 1000,
-    'u': lambda t: long(t) * 1e6,
-    'ns': lambda t: long(t) * 1e9
+    'u': lambda t: long(t) * 10 ** 6,
+    'ns': lambda t: long(t) * 10 ** 9
 }
 
 
 def get_timedelta(time_precision, seconds):
+    """Get seconds as a timedelta or an integer in time_precision.
+
+    If seconds is an array, return a TimedeltaIndex or an int64 array.
+    """
+    if np.ndim(seconds):
+        if not time_precision:
+            return pd.to_timedelta(seconds, unit='s')
+        return (
+            np.asarray(seconds, dtype=np.int64) * 10 ** 9 //
+            PRECISION_NANOSECONDS[time_precision]
+        )
     if not time_precision:
         return datetime.timedelta(0, seconds)
     return TIMEDELTA_MAP[time_precision](seconds)
 
 
-UNIT_CONVERTERS = {
-    ('w', 'kw'): lambda x: x / 1000,
-    ('kw', 'w'): lambda x: x * 1000
+def shift_same_timestamps(timestamps, seconds, time_precision=None, seen=None):
+    """Shift each timestamp already taken by seconds until it is free.
+
+    Same as taking timestamps in order and shifting each one by seconds
+    while it equals a timestamp taken before, without a loop per point:
+    the n-th occurrence of a timestamp, counted from 0, is first shifted
+    by n * seconds with one grouped cumulative count, then only the
+    timestamps still colliding with an earlier one or with seen are
+    shifted again until none collides. Timestamps without collisions
+    are returned as they are.
+
+    seen is an index of the timestamps taken before timestamps, e.g. by
+    an earlier chunk of the series. Chunks of a series should come in
+    ascending time order, so only the taken timestamps at or after the
+    latest of timestamps, which later chunks may collide with, are
+    kept. Return the shifted timestamps and the new seen.
+    """
+    timestamps = pd.Index(timestamps)
+    if not len(timestamps):
+        return timestamps, seen
+    if seen is not None:
+        seen = seen[seen >= timestamps.min()]
+    colliding = np.array(timestamps.duplicated())
+    if seen is not None and len(seen):
+        colliding |= np.array(timestamps.isin(seen))
+    latest = timestamps.max()
+    if colliding.any():
+        codes, _ = pd.factorize(timestamps)
+        counts = pd.Series(codes).groupby(codes).cumcount().values
+        if counts.any():
+            timestamps = timestamps + get_timedelta(
+                time_precision, counts * seconds
+            )
+        timestamps = pd.Series(timestamps)
+        delta = get_timedelta(time_precision, seconds)
+        positions = np.arange(len(timestamps))
+        while len(positions):
+            colliding = np.array(timestamps.duplicated())
+            if seen is not None and len(seen):
+                colliding |= np.array(timestamps.isin(seen))
+            positions = np.flatnonzero(colliding)
+            if len(positions):
+                timestamps.iloc[positions] = (
+                    timestamps.iloc[positions] + delta
+                )
+        timestamps = pd.Index(timestamps)
+    taken = timestamps[timestamps >= latest]
+    if seen is not None and len(seen):
+        taken = taken.append(seen[seen >= latest])
+    return timestamps, taken
+
+
+# unit: (dimension, scale, offset) where value * scale + offset is the
+# value in the base unit of the dimension.
+UNITS = {
+    'W': ('power', 1.0, 0.0),
+    'kW': ('power', 1e3, 0.0),
+    'MW': ('power', 1e6, 0.0),
+    'Wh': ('energy', 1.0, 0.0),
+    'kWh': ('energy', 1e3, 0.0),
+    'MWh': ('energy', 1e6, 0.0),
+    'C': ('temperature', 1.0, 0.0),
+    'K': ('temperature', 1.0, -273.15),
+    'F': ('temperature', 5.0 / 9, -160.0 / 9),
+    'Pa': ('pressure', 1.0, 0.0),
+    'kPa': ('pressure', 1e3, 0.0),
+    'bar': ('pressure', 1e5, 0.0),
+    'ratio': ('ratio', 1.0, 0.0),
+    '%': ('ratio', 0.01, 0.0)
 }
+UNIT_ALIASES = {
+    u'\u00b0C': 'C',
+    u'\u2103': 'C',
+    'degC': 'C',
+    'celsius': 'C',
+    u'\u00b0F': 'F',
+    u'\u2109': 'F',
+    'degF': 'F',
+    'fahrenheit': 'F',
+    'kelvin': 'K',
+    'percent': '%'
+}
+UNITS_IGNORE_CASE = dict([
+    (unit.lower(), unit)
+    for unit in list(UNITS.keys()) + list(UNIT_ALIASES.keys())
+])
+# (from unit, to unit): converter overriding the unit registry.
+UNIT_CONVERTERS = {}
+UNIT_CONVERTERS_CACHE = {}
+
+
+def get_unit(unit):
+    """Get (dimension, scale, offset) of unit, None if it is unknown.
+
+    unit is looked up case sensitively first, so MW is megawatt, then
+    case insensitively.
+    """
+    if not unit:
+        return None
+    unit = unit.strip()
+    if unit not in UNITS and unit not in UNIT_ALIASES:
+        unit = UNITS_IGNORE_CASE.get(unit.lower())
+    unit = UNIT_ALIASES.get(unit, unit)
+    return UNITS.get(unit)
+
+
+def get_unit_scale_offset(from_unit, to_unit):
+    """Get (scale, offset) converting from_unit to to_unit.
+
+    The converted value is value * scale + offset. Return None if any
+    unit is unknown or they have different dimensions.
+    """
+    from_info = get_unit(from_unit)
+    to_info = get_unit(to_unit)
+    if not from_info or not to_info or from_info[0] != to_info[0]:
+        return None
+    _, from_scale, from_offset = from_info
+    _, to_scale, to_offset = to_info
+    # round off float errors of composing, e.g. 1.7999999999999998.
+    scale = float('%.15g' % (from_scale / to_scale))
+    offset = float('%.15g' % ((from_offset - to_offset) / to_scale))
+    if scale.is_integer():
+        scale = int(scale)
+    if offset.is_integer():
+        offset = int(offset)
+    return scale, offset
+
+
+def _convert_unit(values, scale=1, offset=0):
+    if scale != 1:
+        values = values * scale
+    if offset:
+        values = values + offset
+    return values
 
 
 def get_unit_converter(unit_converter):
+    """Get the converter of (from unit, to unit).
+
+    The converter takes a value, a numpy array or a pandas series and
+    converts it with one multiply-add. Return None if units are the same
+    or can not be converted.
+    """
     if unit_converter in UNIT_CONVERTERS:
         return UNIT_CONVERTERS[unit_converter]
-    logger.debug('unkown unit converter %s', unit_converter)
-    return None
+    if unit_converter in UNIT_CONVERTERS_CACHE:
+        return UNIT_CONVERTERS_CACHE[unit_converter]
+    converter = None
+    scale_offset = get_unit_scale_offset(*unit_converter)
+    if scale_offset is None:
+        logger.debug('unkown unit converter %s', unit_converter)
+    elif scale_offset != (1, 0):
+        scale, offset = scale_offset
+        converter = functools.partial(
+            _convert_unit, scale=scale, offset=offset
+        )
+    UNIT_CONVERTERS_CACHE[unit_converter] = converter
+    return converter
@@ -1,13 +1,16 @@
 import abc
 # from abc import abstractmethod
 import datetime
+import hashlib
 import logging
+import numpy as np
 import os
 import os.path
 import pandas as pd
 import shutil
 import simplejson as json
 import six
+import tempfile
 
 from oslo_config import cfg
 
@@ -23,6 +26,32 @@ opts = [
         'model_dir',
         help='model directory',
         default=settings.DATA_DIR
+    ),
+    cfg.IntOpt(
+        'model_timeseries_shards',
+        help=(
+            'split the time range of model data into '
+            'that many sub ranges fetched concurrently'
+        ),
+        default=settings.DEFAULT_MODEL_TIMESERIES_SHARDS
+    ),
+    cfg.BoolOpt(
+        'model_data_cache',
+        help=(
+            'cache model data of time ranges in the past on disk '
+            'under model_data_cache_dir'
+        ),
+        default=settings.DEFAULT_MODEL_DATA_CACHE
+    ),
+    cfg.StrOpt(
+        'model_data_cache_dir',
+        help='model data cache directory relative to model_dir',
+        default=settings.DEFAULT_MODEL_DATA_CACHE_DIR
+    ),
+    cfg.IntOpt(
+        'model_data_cache_size',
+        help='max bytes of model data cache files',
+        default=settings.DEFAULT_MODEL_DATA_CACHE_SIZE
     )
 ]
 CONF = util.CONF
@@ -31,6 +60,37 @@ logger = logging.getLogger(__name__)
 manager = model_builder_manager.manager
 
 
+def _get_data_cache_dir(datacenter):
+    return os.path.join(
+        CONF.model_dir, CONF.model_data_cache_dir,
+        six.moves.urllib.parse.quote(datacenter, safe='')
+    )
+
+
+def _make_data_cache_dir(cache_dir):
+    try:
+        os.makedirs(cache_dir)
+    except OSError as error:
+        if not os.path.isdir(cache_dir):
+            logger.error(
+                'failed to make data cache dir %s: %s', cache_dir, error
+            )
+
+
+def invalidate_data_cache(datacenter=None):
+    """Remove cached model data of datacenter or of all datacenters."""
+    if datacenter:
+        cache_dir = _get_data_cache_dir(datacenter)
+    else:
+        cache_dir = os.path.join(CONF.model_dir, CONF.model_data_cache_dir)
+    if os.path.exists(cache_dir):
+        logger.debug('remove data cache %s', cache_dir)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+timeseries.add_invalidate_callback(invalidate_data_cache)
+
+
 class BaseModelType(object):
     def __init__(self, datacenter, builder):
         self.SUB_NODES_AGGREGATORS = {
@@ -220,30 +280,34 @@ class BaseModelType(object):
                 measurement_mapping
             ):
                 measurement_metadata = device_type_metadata[measurement]
+                attribute = measurement_metadata['attribute']
+                device_statistics = measurement_metadata.get(
+                    'device_statistics'
+                ) or {}
                 for device in devices:
-                    nodes.append({
+                    statistics = device_statistics.get(device) or {}
+                    node = {
                         'device_type': device_type,
                         'measurement':  measurement,
                         'device': device,
-                        'unit': measurement_metadata[
-                            'attribute'
-                        ]['unit'],
-                        'type': measurement_metadata[
-                            'attribute'
-                        ]['type'],
-                        'mean': measurement_metadata[
-                            'attribute'
-                        ]['mean'],
-                        'deviation': measurement_metadata[
-                            'attribute'
-                        ]['deviation'],
-                        'differentiation_mean': measurement_metadata[
-                            'attribute'
-                        ]['differentiation_mean'],
-                        'differentiation_deviation': measurement_metadata[
-                            'attribute'
-                        ]['differentiation_deviation']
-                    })
+                        'unit': attribute['unit'],
+                        'type': attribute['type']
+                    }
+                    # fall back to the attribute statistics for devices
+                    # without statistics or with constant values.
+                    for prefix in ['', 'differentiation_']:
+                        mean_key = '%smean' % prefix
+                        deviation_key = '%sdeviation' % prefix
+                        if (
+                            statistics.get(mean_key) is not None and
+                            statistics.get(deviation_key)
+                        ):
+                            node_statistics = statistics
+                        else:
+                            node_statistics = attribute
+                        node[mean_key] = node_statistics[mean_key]
+                        node[deviation_key] = node_statistics[deviation_key]
+                    nodes.append(node)
         return nodes
 
     def initialize_nodes_relationship(self):
@@ -394,7 +458,9 @@ class BaseModelType(object):
             convert_timestamp=True,
             format_timestamp=False,
             device_type_mapping=device_type_mapping,
-            device_type_types=device_type_types
+            device_type_types=device_type_types,
+            shards=CONF.model_timeseries_shards,
+            chunk_size=CONF.timeseries_chunk_size
         )
         logger.debug(
             'get data %s from timeseries %s %s: %s',
@@ -420,17 +486,175 @@ class BaseModelType(object):
         )
         return data
 
+    def _get_data_cache_path(self, starttime, endtime, nodes):
+        """Get the cache path of data of nodes in a time range.
+
+        Entries of a datacenter are kept in one directory so that
+        invalidate_data_cache can drop them when its timeseries change.
+        """
+        node_keys = sorted(set([
+            (self.get_node_key(node), node['type']) for node in nodes
+        ]))
+        cache_key = json.dumps([
+            self.datacenter, self.metadata['time_interval'],
+            str(starttime), str(endtime), node_keys
+        ])
+        return os.path.join(
+            _get_data_cache_dir(self.datacenter),
+            hashlib.sha1(cache_key.encode('utf-8')).hexdigest()
+        )
+
+    def _load_cached_data(self, cache_path):
+        """Load data saved by _save_cached_data.
+
+        The values are memory mapped read only, so float columns are
+        served without copying and the returned frame must not be
+        modified in place.
+        """
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with open(os.path.join(cache_path, 'columns.json')) as f:
+                meta = json.load(f)
+            values = np.load(
+                os.path.join(cache_path, 'values.npy'), mmap_mode='r'
+            )
+            index = np.load(os.path.join(cache_path, 'index.npy'))
+        except Exception as error:
+            logger.error(
+                'failed to load data cache %s: %s', cache_path, error
+            )
+            return None
+        index = pd.DatetimeIndex(
+            index.astype('datetime64[ns]')
+        ).tz_localize('UTC')
+        if meta['tz'] != 'UTC':
+            index = index.tz_convert(meta['tz'])
+        data = pd.DataFrame(
+            values.T, index=index,
+            columns=pd.MultiIndex.from_tuples(
+                [tuple(column) for column in meta['columns']]
+            ),
+            copy=False
+        )
+        for column, dtype in zip(data.columns, meta['dtypes']):
+            if dtype != str(values.dtype):
+                data[column] = data[column].astype(dtype)
+        os.utime(cache_path, None)
+        logger.debug('load data cache %s', cache_path)
+        return data
+
+    def _save_cached_data(self, cache_path, data):
+        if data.empty or not isinstance(data.index, pd.DatetimeIndex):
+            return
+        try:
+            values = data.values.astype(np.float64).T
+        except (TypeError, ValueError):
+            logger.debug('ignore non numeric data cache %s', cache_path)
+            return
+        index = data.index
+        tz = str(index.tz) if index.tz is not None else 'UTC'
+        if index.tz is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+        cache_dir = os.path.dirname(cache_path)
+        if not os.path.exists(cache_dir):
+            logger.debug('data cache %s is invalidated', cache_path)
+            return
+        tmp_path = None
+        try:
+            tmp_path = tempfile.mkdtemp(
+                prefix='%s.' % os.path.basename(cache_path),
+                suffix='.tmp', dir=cache_dir
+            )
+            np.save(os.path.join(tmp_path, 'values.npy'), values)
+            np.save(
+                os.path.join(tmp_path, 'index.npy'),
+                index.values.astype('datetime64[ns]').astype(np.int64)
+            )
+            with open(os.path.join(tmp_path, 'columns.json'), 'w') as f:
+                json.dump({
+                    'columns': [list(column) for column in data.columns],
+                    'dtypes': [str(dtype) for dtype in data.dtypes],
+                    'tz': tz
+                }, f)
+            os.rename(tmp_path, cache_path)
+        except Exception as error:
+            if tmp_path:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+            if os.path.exists(cache_path):
+                logger.debug(
+                    'data cache %s is saved by another writer', cache_path
+                )
+            else:
+                logger.error(
+                    'failed to save data cache %s: %s', cache_path, error
+                )
+            return
+        logger.debug('save data cache %s', cache_path)
+        self._prune_data_cache(
+            os.path.join(CONF.model_dir, CONF.model_data_cache_dir)
+        )
+
+    def _prune_data_cache(self, cache_dir):
+        entries = []
+        total_size = 0
+        for datacenter_name in os.listdir(cache_dir):
+            datacenter_dir = os.path.join(cache_dir, datacenter_name)
+            if not os.path.isdir(datacenter_dir):
+                continue
+            for name in os.listdir(datacenter_dir):
+                path = os.path.join(datacenter_dir, name)
+                if name.endswith('.tmp') or not os.path.isdir(path):
+                    continue
+                try:
+                    size = sum([
+                        os.path.getsize(os.path.join(path, filename))
+                        for filename in os.listdir(path)
+                    ])
+                    entries.append((os.path.getmtime(path), size, path))
+                except OSError:
+                    continue
+                total_size += size
+        for _, size, path in sorted(entries):
+            if total_size <= CONF.model_data_cache_size:
+                break
+            logger.debug('remove data cache %s', path)
+            shutil.rmtree(path, ignore_errors=True)
+            total_size -= size
+
     def get_data_by_nodes(
         self, nodes, starttime=None, endtime=None, data=None
     ):
+        """Get data of nodes in a time range or from data.
+
+        Data of a past time range may be loaded read only from the model
+        data cache, so it should be copied before being modified in
+        place. The processing steps build new frames and never do.
+        """
         logger.debug('get data nodes: %s', nodes)
         if starttime is not None and endtime is not None:
-            with database.influx_session(dataframe=True) as session:
-                data = self._get_data_from_timeseries(
-                    session,
-                    starttime, endtime,
-                    nodes
+            cache_path = None
+            data = None
+            if CONF.model_data_cache and timeseries.is_past_time_range(
+                starttime, endtime
+            ):
+                cache_path = self._get_data_cache_path(
+                    starttime, endtime, nodes
                 )
+                data = self._load_cached_data(cache_path)
+                if data is None:
+                    # created before fetching so data fetched while the
+                    # cache is invalidated is not saved.
+                    _make_data_cache_dir(os.path.dirname(cache_path))
+            if data is None:
+                with database.influx_session(dataframe=True) as session:
+                    data = self._get_data_from_timeseries(
+                        session,
+                        starttime, endtime,
+                        nodes
+                    )
+                if cache_path:
+                    self._save_cached_data(cache_path, data)
         elif data is not None:
             data = self._get_data_direct(
                 data
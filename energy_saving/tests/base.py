@@ -0,0 +1,190 @@
+"""Base test case with an in memory database and a fake influx."""
+import contextlib
+import json
+import unittest
+
+from influxdb import DataFrameClient
+from influxdb import InfluxDBClient
+
+from energy_saving.api import api  # noqa: register all options first
+from energy_saving.db import database
+from energy_saving.db import models
+from energy_saving.db import timeseries
+from energy_saving.utils import util
+
+
+util.init([])
+CONF = util.CONF
+
+
+class FakeResponse(object):
+    def __init__(self, data, status_code=200, chunks=None):
+        self.status_code = status_code
+        self._msgpack = None
+        self.content = json.dumps(data).encode('utf-8')
+        self.headers = {}
+        self.data = data
+        self.chunks = chunks or [data]
+
+    def json(self):
+        return self.data
+
+    def iter_lines(self, *args, **kwargs):
+        for chunk in self.chunks:
+            yield json.dumps(chunk).encode('utf-8')
+
+    def close(self):
+        pass
+
+
+class FakeInfluxMixin(object):
+    """Influx client answering queries by a handler instead of http.
+
+    handler(statement) returns the series of one statement. Every
+    statement and written line is recorded.
+    """
+
+    def setup(self, handler, statements, lines):
+        self.handler = handler
+        self.statements = statements
+        self.lines = lines
+
+    def request(
+        self, url, method='GET', params=None, data=None, stream=False,
+        expected_response_code=200, headers=None
+    ):
+        if url == 'write':
+            if isinstance(data, bytes):
+                data = data.decode('utf-8')
+            self.lines.extend(data.splitlines())
+            return FakeResponse({}, 204)
+        results = []
+        for statement_id, statement in enumerate(params['q'].split(';')):
+            statement = statement.strip()
+            self.statements.append(statement)
+            results.append({
+                'statement_id': statement_id,
+                'series': self.handler(statement)
+            })
+        chunk_size = int(params.get('chunk_size') or 0)
+        if params.get('chunked') != 'true' or not chunk_size:
+            return FakeResponse({'results': results})
+        chunks = []
+        for result in results:
+            for series in result['series']:
+                values = series['values']
+                for start in range(0, len(values) or 1, chunk_size):
+                    chunk_series = dict(series)
+                    chunk_series['values'] = values[start:start + chunk_size]
+                    chunks.append({'results': [{
+                        'statement_id': result['statement_id'],
+                        'series': [chunk_series]
+                    }]})
+        return FakeResponse({'results': results}, chunks=chunks)
+
+
+class FakeInfluxClient(FakeInfluxMixin, InfluxDBClient):
+    pass
+
+
+class FakeDataFrameClient(FakeInfluxMixin, DataFrameClient):
+    pass
+
+
+def series(name, device, values, columns=('time', 'value')):
+    return {
+        'name': name, 'tags': {'device': device},
+        'columns': list(columns), 'values': values
+    }
+
+
+class TestCase(unittest.TestCase):
+    """Test case on a fresh sqlite database and a fake influx.
+
+    Influx queries are answered by influx_handler, which returns no
+    series unless a test overrides it.
+    """
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        self.flags(database_uri='sqlite://', database_pool_type='static')
+        database.init('sqlite://')
+        database.create_db()
+        self.addCleanup(database.drop_db)
+        timeseries.invalidate_metadata_cache()
+        timeseries.invalidate_result_cache()
+        self.statements = []
+        self.lines = []
+        self.patch(database, 'influx_session', self.fake_influx_session)
+
+    def flags(self, **kwargs):
+        for name, value in kwargs.items():
+            CONF.set_override(name, value)
+            self.addCleanup(CONF.clear_override, name)
+
+    def patch(self, obj, name, value):
+        self.addCleanup(setattr, obj, name, getattr(obj, name))
+        setattr(obj, name, value)
+
+    def influx_handler(self, statement):
+        return []
+
+    @contextlib.contextmanager
+    def fake_influx_session(self, dataframe=False):
+        if dataframe:
+            client = FakeDataFrameClient(database='energy_saving')
+        else:
+            client = FakeInfluxClient(database='energy_saving')
+        client.setup(self.influx_handler, self.statements, self.lines)
+        yield client
+
+    def add_datacenter(
+        self, name='dc', devices=1, attributes=('temperature',)
+    ):
+        """Add a datacenter with sensors, controllers and power supplies.
+
+        Each device has data of every attribute.
+        """
+        with database.session() as session:
+            session.add(models.Datacenter(
+                name=name, type='lab', time_interval=300,
+                models={}, properties={}
+            ))
+            session.flush()
+            for attribute in attributes:
+                session.add(models.SensorAttr(
+                    datacenter_name=name, name=attribute, unit='C'
+                ))
+                session.add(models.ControllerAttr(
+                    datacenter_name=name, name=attribute, unit='C'
+                ))
+                session.add(models.PowerSupplyAttr(
+                    datacenter_name=name, name=attribute, unit='W'
+                ))
+            session.flush()
+            for index in range(devices):
+                session.add(models.Sensor(
+                    datacenter_name=name, name='TH%02d' % index
+                ))
+                session.add(models.Controller(
+                    datacenter_name=name, name='CRAC%02d' % index
+                ))
+                session.add(models.PowerSupply(
+                    datacenter_name=name, name='PDF%02d' % index
+                ))
+            session.flush()
+            for index in range(devices):
+                for attribute in attributes:
+                    session.add(models.SensorAttrData(
+                        datacenter_name=name,
+                        sensor_name='TH%02d' % index, name=attribute
+                    ))
+                    session.add(models.ControllerAttrData(
+                        datacenter_name=name,
+                        controller_name='CRAC%02d' % index, name=attribute
+                    ))
+                    session.add(models.PowerSupplyAttrData(
+                        datacenter_name=name,
+                        power_supply_name='PDF%02d' % index, name=attribute
+                    ))
+        timeseries.invalidate_metadata_cache(name)
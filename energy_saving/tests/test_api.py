@@ -0,0 +1,95 @@
+import io
+import re
+import unittest
+
+from energy_saving.api import api
+from energy_saving.tests import base
+
+
+class TestExportTimeseries(base.TestCase):
+
+    def setUp(self):
+        super(TestExportTimeseries, self).setUp()
+        self.add_datacenter(devices=2)
+        self.client = api.app.test_client()
+
+    def influx_handler(self, statement):
+        starttime = re.search(r"time >= '([^']*)'", statement).group(1)
+        return [base.series('temperature', 'TH00', [[starttime, 1.0]])]
+
+    def export(self, **data):
+        data.update({
+            'starttime': '2017-01-01T00:00:00Z',
+            'endtime': '2017-01-04T00:00:00Z'
+        })
+        response = self.client.post(
+            '/export/timeseries/dc/sensor_attribute/temperature', json=data
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.get_data(as_text=True).splitlines()
+
+    def test_raw_export_is_windowed(self):
+        self.flags(timeseries_window=86400)
+        rows = self.export(full_header=True)
+        self.assertEqual(len(self.statements), 3)
+        self.assertEqual(len(rows), 4)
+
+    def test_header_has_present_series(self):
+        self.assertEqual(self.export()[0], 'time,TH00')
+
+    def test_full_header_has_every_device(self):
+        self.assertEqual(self.export(full_header=True)[0], 'time,TH00,TH01')
+
+
+class NonSeekableUpload(object):
+
+    def __init__(self, data):
+        self.stream = io.BufferedReader(NonSeekableStream(data))
+
+
+class NonSeekableStream(io.RawIOBase):
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        data = self.data.read(len(buf))
+        buf[:len(data)] = data
+        return len(data)
+
+
+@unittest.skipIf(api.pa is None, 'pyarrow is not installed')
+class TestArrowUpload(base.TestCase):
+
+    def setUp(self):
+        super(TestArrowUpload, self).setUp()
+        self.table = api.pa.table({'value': list(range(10))})
+
+    def read_batches(self, file_format, data):
+        return [
+            batch.num_rows for batch in api._iter_arrow_batches(
+                file_format, NonSeekableUpload(data), 4
+            )
+        ]
+
+    def test_arrow_stream_is_read_from_stream(self):
+        sink = api.pa.BufferOutputStream()
+        writer = api.pa.ipc.new_stream(sink, self.table.schema)
+        for batch in self.table.to_batches(max_chunksize=4):
+            writer.write_batch(batch)
+        writer.close()
+        self.assertEqual(
+            self.read_batches('arrow', sink.getvalue().to_pybytes()),
+            [4, 4, 2]
+        )
+
+    def test_parquet_is_spooled_and_read_in_batches(self):
+        sink = api.pa.BufferOutputStream()
+        api.pq.write_table(self.table, sink)
+        self.assertEqual(
+            self.read_batches('parquet', sink.getvalue().to_pybytes()),
+            [4, 4, 2]
+        )
@@ -0,0 +1,30 @@
+from energy_saving.db import database
+from energy_saving.db import timeseries
+from energy_saving.tests import base
+
+
+class TestDatacenterQuery(base.TestCase):
+
+    def count_metadata_queries(self, name):
+        with database.session() as session:
+            database.reset_query_count()
+            datacenter = timeseries._get_datacenter_query(
+                session
+            ).filter_by(name=name).first()
+            metadata = timeseries._get_datacenter_metadata(datacenter)
+            return database.get_query_count(), metadata
+
+    def test_query_count_does_not_grow_with_devices(self):
+        self.add_datacenter('small', devices=1, attributes=['temperature'])
+        self.add_datacenter(
+            'large', devices=6, attributes=['temperature', 'humidity']
+        )
+        small_count, small_metadata = self.count_metadata_queries('small')
+        large_count, large_metadata = self.count_metadata_queries('large')
+        self.assertEqual(
+            large_metadata['device_types']['sensor_attribute'][
+                'humidity'
+            ]['devices'],
+            ['TH%02d' % index for index in range(6)]
+        )
+        self.assertEqual(small_count, large_count)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import shutil
+import tempfile
+
+from energy_saving.db import timeseries
+from energy_saving.models import base_model_type_builder
+from energy_saving.tests import base
+
+
+class TestModelDataCache(base.TestCase):
+
+    def setUp(self):
+        super(TestModelDataCache, self).setUp()
+        model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, model_dir, True)
+        self.flags(model_dir=model_dir, model_data_cache=True)
+        self.model_type = object.__new__(
+            base_model_type_builder.BaseModelType
+        )
+        self.model_type.datacenter = 'dc'
+        self.model_type.metadata = {'time_interval': 300}
+        self.fetches = []
+        self.model_type._get_data_from_timeseries = self.fetch
+        self.nodes = [{
+            'device_type': 'sensor_attribute', 'measurement': 'temperature',
+            'device': 'TH00', 'type': 'continuous'
+        }]
+
+    def fetch(self, session, starttime, endtime, nodes):
+        self.fetches.append((starttime, endtime))
+        return pd.DataFrame(
+            {('sensor_attribute', 'temperature', 'TH00'): [1.5, np.nan]},
+            index=pd.to_datetime(
+                ['2017-01-01 00:00:00', '2017-01-01 00:05:00'], utc=True
+            )
+        )
+
+    def get_data(self):
+        return self.model_type.get_data_by_nodes(
+            self.nodes, '2017-01-01', '2017-01-02'
+        )
+
+    def test_disabled_by_default(self):
+        base.CONF.clear_override('model_data_cache')
+        self.get_data()
+        self.get_data()
+        self.assertEqual(len(self.fetches), 2)
+
+    def test_cached_data_is_memory_mapped(self):
+        expected = self.get_data()
+        data = self.get_data()
+        self.assertEqual(len(self.fetches), 1)
+        self.assertTrue(expected.equals(data))
+        values = data[('sensor_attribute', 'temperature', 'TH00')].values
+        self.assertFalse(values.flags.writeable)
+        while values.base is not None and not isinstance(values, np.memmap):
+            values = values.base
+        self.assertIsInstance(values, np.memmap)
+
+    def test_invalidated_by_timeseries_change(self):
+        self.get_data()
+        timeseries.invalidate_result_cache('dc')
+        self.get_data()
+        self.get_data()
+        self.assertEqual(len(self.fetches), 2)
@@ -0,0 +1,339 @@
+import numpy as np
+import re
+
+from energy_saving.db import timeseries
+from energy_saving.tests import base
+
+
+class TestChunkedReads(base.TestCase):
+
+    def setUp(self):
+        super(TestChunkedReads, self).setUp()
+        self.add_datacenter(devices=2)
+
+    def influx_handler(self, statement):
+        return [
+            base.series('temperature', 'TH00', [
+                ['2017-01-01T00:%02d:00Z' % minute, float(minute)]
+                for minute in range(0, 25, 5)
+            ]),
+            base.series('temperature', 'TH01', [
+                ['2017-01-01T00:00:00Z', 1.0]
+            ])
+        ]
+
+    def list_timeseries(self, **kwargs):
+        with base.database.influx_session() as session:
+            return timeseries.list_timeseries(
+                session, {
+                    'datacenter': 'dc',
+                    'device_type': {'sensor_attribute': ['temperature']},
+                    'where': {
+                        'starttime': '2017-01-01T00:00:00Z',
+                        'endtime': '2017-01-01T01:00:00Z'
+                    }
+                }, **kwargs
+            )
+
+    def test_chunked_read_equals_whole_read(self):
+        self.flags(timeseries_result_cache=False)
+        expected = self.list_timeseries()
+        response = self.list_timeseries(chunk_size=2)
+        self.assertEqual(expected, response)
+        self.assertEqual(
+            len(response[('sensor_attribute', 'temperature', 'TH00')]), 5
+        )
+
+    def test_iter_timeseries_yields_chunks(self):
+        with base.database.influx_session() as session:
+            blocks = list(timeseries.iter_timeseries(
+                session, {
+                    'datacenter': 'dc',
+                    'device_type': {'sensor_attribute': ['temperature']},
+                    'where': {
+                        'starttime': '2017-01-01T00:00:00Z',
+                        'endtime': '2017-01-01T01:00:00Z'
+                    }
+                }, chunk_size=2
+            ))
+        self.assertEqual(len(blocks), 4)
+
+
+class TestResultCache(base.TestCase):
+
+    def setUp(self):
+        super(TestResultCache, self).setUp()
+        self.add_datacenter()
+
+    def influx_handler(self, statement):
+        return [base.series('temperature', 'TH00', [
+            ['2017-01-01T00:00:00Z', 1.0]
+        ])]
+
+    def list_timeseries_internal(self, data):
+        with base.database.influx_session() as session:
+            return timeseries.list_timeseries_internal(
+                session, data, 'dc',
+                device_type_mapping={
+                    'sensor_attribute': {'temperature': ['TH00']}
+                },
+                device_type_types={
+                    'sensor_attribute': {'temperature': 'continuous'}
+                }
+            )
+
+    def test_disabled_by_default(self):
+        data = {'where': {
+            'starttime': '2017-01-01T00:00:00Z',
+            'endtime': '2017-01-02T00:00:00Z'
+        }}
+        self.list_timeseries_internal(data)
+        self.list_timeseries_internal(data)
+        self.assertEqual(len(self.statements), 2)
+
+    def test_same_data_hits_cache(self):
+        self.flags(timeseries_result_cache=True)
+        data = {'where': {
+            'starttime': '2017-01-01T00:00:00Z',
+            'endtime': '2017-01-02T00:00:00Z'
+        }}
+        expected = self.list_timeseries_internal(data)
+        self.assertEqual(data, {'where': {
+            'starttime': '2017-01-01T00:00:00Z',
+            'endtime': '2017-01-02T00:00:00Z'
+        }})
+        self.assertEqual(self.list_timeseries_internal(data), expected)
+        self.assertEqual(len(self.statements), 1)
+
+
+class TestIncrementalStatistics(base.TestCase):
+    """Statistics queries are answered from self.points of TH00."""
+
+    def setUp(self):
+        super(TestIncrementalStatistics, self).setUp()
+        self.add_datacenter()
+        self.points = {}
+
+    def add_points(self, starttime, values):
+        start_seconds = timeseries._get_epoch_seconds(starttime)
+        for index, value in enumerate(values):
+            self.points[start_seconds + index * 300] = value
+
+    def influx_handler(self, statement):
+        if "device_type = 'sensor_attribute'" not in statement:
+            return []
+        start_seconds, end_seconds = [
+            timeseries._get_epoch_seconds(
+                re.search(r"time %s '([^']*)'" % operator, statement).group(1)
+            ) for operator in ['>=', '<']
+        ]
+        values = np.array([
+            value for timestamp, value in sorted(self.points.items())
+            if start_seconds <= timestamp < end_seconds
+        ])
+        if 'difference' in statement:
+            values = np.diff(values)
+        if not len(values):
+            return []
+        deviation = values.std(ddof=1) if len(values) > 1 else None
+        return [base.series(
+            'temperature', 'TH00',
+            [[0, len(values), values.mean(), deviation]],
+            columns=['time', 'count', 'mean', 'deviation']
+        )]
+
+    def update(self, starttime, endtime, **kwargs):
+        with base.database.influx_session() as session:
+            timeseries.update_timeseries_metadata(
+                session, 'dc', starttime, endtime, **kwargs
+            )
+        with base.database.session() as session:
+            attribute = session.query(base.models.SensorAttr).filter_by(
+                datacenter_name='dc', name='temperature'
+            ).one()
+            return attribute.moments_count, attribute.mean
+
+    def test_incremental_is_opt_in(self):
+        self.assertFalse(base.CONF.timeseries_statistics_incremental)
+
+    def test_incremental_update_scans_after_watermark(self):
+        self.add_points('2017-01-01T00:00:00Z', [1.0, 2.0, 3.0])
+        self.assertEqual(self.update(
+            '2017-01-01T00:00:00Z', '2017-01-01T00:15:00Z',
+            incremental=True
+        ), (3, 2.0))
+        self.add_points('2017-01-01T00:15:00Z', [6.0])
+        self.assertEqual(self.update(
+            '2017-01-01T00:15:00Z', '2017-01-01T00:20:00Z',
+            incremental=True
+        ), (4, 3.0))
+
+    def test_backfill_before_watermark_is_counted(self):
+        self.add_points('2017-01-01T00:00:00Z', [1.0, 2.0, 3.0])
+        self.update(
+            '2017-01-01T00:00:00Z', '2017-01-01T00:15:00Z',
+            incremental=True
+        )
+        self.add_points('2016-12-31T23:55:00Z', [6.0])
+        self.assertEqual(self.update(
+            '2016-12-31T23:00:00Z', '2017-01-01T00:15:00Z',
+            incremental=True
+        ), (4, 3.0))
+
+
+class TestRollups(base.TestCase):
+
+    def setUp(self):
+        super(TestRollups, self).setUp()
+        self.add_datacenter()
+        self.flags(timeseries_rollup=True)
+        with base.database.influx_session() as session:
+            timeseries.create_timeseries_rollups(
+                session, starttime='2017-01-01T00:00:00Z'
+            )
+        self.statements[:] = []
+
+    def list_daily_means(self, starttime, endtime):
+        with base.database.influx_session() as session:
+            timeseries.list_timeseries(
+                session, {
+                    'datacenter': 'dc',
+                    'device_type': {'sensor_attribute': ['temperature']},
+                    'where': {'starttime': starttime, 'endtime': endtime},
+                    'group_by': ['time(1d)'],
+                    'aggregation': 'mean'
+                }
+            )
+        return self.statements.pop()
+
+    def test_rolled_up_range_reads_tier(self):
+        statement = self.list_daily_means(
+            '2017-01-01T00:00:00Z', '2017-01-03T00:00:00Z'
+        )
+        self.assertIn('"rollup_86400s"', statement)
+
+    def test_range_before_backfill_reads_raw(self):
+        statement = self.list_daily_means(
+            '2016-12-31T00:00:00Z', '2017-01-03T00:00:00Z'
+        )
+        self.assertNotIn('rollup_', statement)
+
+    def test_write_into_closed_interval_reads_raw(self):
+        with base.database.influx_session() as session:
+            timeseries.create_timeseries(session, {
+                ('sensor_attribute', 'temperature', 'TH00'): {
+                    '2017-01-02T12:00:00Z': 1.0
+                }
+            }, {'datacenter': 'dc'})
+        self.assertEqual(len(self.lines), 1)
+        statement = self.list_daily_means(
+            '2017-01-01T00:00:00Z', '2017-01-03T00:00:00Z'
+        )
+        self.assertNotIn('rollup_', statement)
+        statement = self.list_daily_means(
+            '2017-01-03T00:00:00Z', '2017-01-05T00:00:00Z'
+        )
+        self.assertIn('"rollup_86400s"', statement)
+
+
+class TestDeleteTimeseries(base.TestCase):
+
+    def setUp(self):
+        super(TestDeleteTimeseries, self).setUp()
+        self.add_datacenter(devices=2)
+
+    def influx_handler(self, statement):
+        return [{
+            'name': 'temperature', 'columns': ['count'], 'values': [[2]]
+        }]
+
+    def test_dry_run_matches_devices_exactly(self):
+        with base.database.influx_session() as session:
+            cardinality = timeseries.delete_timeseries(session, {
+                'datacenter': 'dc',
+                'device_type': {
+                    'sensor_attribute': {'temperature': ['TH00', 'TH01']}
+                }
+            }, dry_run=True)
+        self.assertEqual(cardinality, {'temperature': 2})
+        self.assertEqual(self.statements, [
+            "show series exact cardinality from temperature "
+            "where datacenter = 'dc' and device_type = 'sensor_attribute' "
+            "and (device = 'TH00' or device = 'TH01')"
+        ])
+
+    def test_dry_run_without_devices_matches_measurement(self):
+        with base.database.influx_session() as session:
+            timeseries.delete_timeseries_internal(
+                session, 'dc', device_type_mapping={
+                    'sensor_attribute': {'temperature': []}
+                }, dry_run=True
+            )
+        self.assertEqual(self.statements, [
+            "show series exact cardinality from temperature "
+            "where datacenter = 'dc' and device_type = 'sensor_attribute'"
+        ])
+
+
+class TestTimeseriesWindows(base.TestCase):
+
+    def setUp(self):
+        super(TestTimeseriesWindows, self).setUp()
+        self.add_datacenter()
+
+    def iter_windows(self, **data):
+        data.update({
+            'datacenter': 'dc',
+            'device_type': {'sensor_attribute': ['temperature']},
+            'where': {
+                'starttime': '2017-01-01T00:00:00Z',
+                'endtime': '2017-01-04T00:00:00Z'
+            }
+        })
+        with base.database.influx_session() as session:
+            return list(timeseries.iter_timeseries_windows(
+                session, data, window=86400
+            ))
+
+    def test_raw_points_are_windowed(self):
+        self.assertEqual(len(self.iter_windows()), 3)
+        self.assertEqual(len(self.statements), 3)
+        self.assertNotIn('mean', self.statements[0])
+
+    def test_grouped_by_time_is_windowed(self):
+        self.assertEqual(len(self.iter_windows(
+            group_by=['time(1h)'], aggregation='mean'
+        )), 3)
+
+    def test_whole_range_aggregation_is_one_window(self):
+        self.assertEqual(len(self.iter_windows(aggregation='mean')), 1)
+
+    def test_limit_is_one_window(self):
+        self.assertEqual(len(self.iter_windows(limit=10)), 1)
+
+
+class TestShiftSameTimestamps(base.TestCase):
+
+    def shift(self, timestamps, seen=None):
+        timestamps, seen = timeseries.shift_same_timestamps(
+            timestamps, 1, 's', seen
+        )
+        return list(timestamps), seen
+
+    def test_same_timestamps_are_shifted(self):
+        timestamps, seen = self.shift([0, 0, 0, 5])
+        self.assertEqual(timestamps, [0, 1, 2, 5])
+        self.assertEqual(list(seen), [5])
+
+    def test_chunks_shift_past_taken_timestamps(self):
+        timestamps, seen = self.shift([0, 0])
+        self.assertEqual(timestamps, [0, 1])
+        timestamps, seen = self.shift([1, 2], seen)
+        self.assertEqual(timestamps, [2, 3])
+
+    def test_seen_is_bounded(self):
+        seen = None
+        for start in range(0, 1000, 100):
+            timestamps, seen = self.shift(range(start, start + 100), seen)
+            self.assertEqual(timestamps, list(range(start, start + 100)))
+        self.assertEqual(list(seen), [999])
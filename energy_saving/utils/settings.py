@@ -66,6 +66,9 @@ INFLUX_URI = lazypy.delay(
     )
 )
 INFLUX_TIMEOUT = 5
+INFLUX_POOL_SIZE = 10
+INFLUX_CONNECTION_POOL_SIZE = 10
+INFLUX_RETRIES = 3
 DEFAULT_TIME_PRECISION = None
 DEFAULT_INFLUX_VALUE = ''
 IGNORABLE_INFLUX_VALUES = ['', '-']
@@ -74,6 +77,27 @@ DEFAULT_EXPORT_DEVICE_TYPE_COLUMN = 'device_type'
 DEFAULT_EXPORT_DEVICE_COLUMN = 'device'
 DEFAULT_EXPORT_MEASUREMENT_COLUMN = ''
 DEFAULT_IMPORT_ADD_SECONDS_SAME_TIMESTAMP = 10
+DEFAULT_IMPORT_CHUNK_SIZE = 10000
+DEFAULT_METADATA_CACHE = True
+DEFAULT_METADATA_CACHE_EXPIRE = 60
+DEFAULT_TIMESERIES_CHUNK_SIZE = 10000
+DEFAULT_TIMESERIES_SHARDS = 1
+DEFAULT_TIMESERIES_SHARD_WORKERS = 4
+DEFAULT_TIMESERIES_WINDOW = 86400
+DEFAULT_MODEL_TIMESERIES_SHARDS = 1
+DEFAULT_TIMESERIES_WRITE_BATCH_SIZE = 5000
+DEFAULT_TIMESERIES_WRITE_GZIP = False
+DEFAULT_TIMESERIES_RESULT_CACHE = False
+DEFAULT_TIMESERIES_RESULT_CACHE_SIZE = 256 * 1024 * 1024
+DEFAULT_TIMESERIES_RESULT_CACHE_MARGIN = 600
+DEFAULT_TIMESERIES_RESULT_CACHE_EXPIRE = 60
+DEFAULT_MODEL_DATA_CACHE = False
+DEFAULT_MODEL_DATA_CACHE_DIR = 'data_cache'
+DEFAULT_MODEL_DATA_CACHE_SIZE = 2 * 1024 * 1024 * 1024
+DEFAULT_TIMESERIES_STATISTICS_IN_INFLUX = True
+DEFAULT_TIMESERIES_STATISTICS_INCREMENTAL = False
+DEFAULT_TIMESERIES_ROLLUP = False
+DEFAULT_TIMESERIES_ROLLUP_INTERVALS = ['5m', '1h', '1d']
 
 if (
     'ENERGY_SAVING_SETTINGS' in os.environ and
@@ -1,5 +1,8 @@
+import collections
 import logging
 import sys
+import threading
+import time
 
 from oslo_config import cfg
 
@@ -18,3 +21,73 @@ def init(argv=None):
         'energy_saving',
         default_config_dirs=[settings.CONFIG_DIR]
     )
+
+
+class LRUCache(object):
+    """Thread safe least recently used cache bounded by bytes.
+
+    The size of each value is given by the caller when it is set, with
+    the seconds it is valid for if it should expire.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return default
+            entry = self.entries.pop(key)
+            value, size, expire_at = entry
+            if expire_at is not None and expire_at < time.time():
+                self.size -= size
+                self.misses += 1
+                return default
+            self.entries[key] = entry
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size, expire=None):
+        """Set value of key, return False if it is too large to cache."""
+        with self.lock:
+            if key in self.entries:
+                _, old_size, _ = self.entries.pop(key)
+                self.size -= old_size
+            if size > self.max_bytes:
+                return False
+            if expire:
+                expire_at = time.time() + expire
+            else:
+                expire_at = None
+            self.entries[key] = (value, size, expire_at)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size, _) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+            return True
+
+    def remove(self, predicate=None):
+        """Remove entries whose key matches predicate, or all entries."""
+        with self.lock:
+            for key in list(self.entries.keys()):
+                if predicate is None or predicate(key):
+                    _, size, _ = self.entries.pop(key)
+                    self.size -= size
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }